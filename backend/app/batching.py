@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from fastapi.concurrency import run_in_threadpool
+
+
+RequestT = TypeVar("RequestT")
+ResultT = TypeVar("ResultT")
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+@dataclass
+class MicroBatchStats:
+    batches: int = 0
+    items: int = 0
+    rejected: int = 0
+    failed_batches: int = 0
+    max_batch_size: int = 0
+    last_batch_size: int = 0
+    total_wait_s: float = 0.0
+    max_wait_s: float = 0.0
+    batch_size_counts: Dict[str, int] = field(
+        default_factory=lambda: {f"le_{bucket}": 0 for bucket in BATCH_SIZE_BUCKETS} | {"gt_512": 0}
+    )
+
+    def record(self, size: int, waits: List[float]) -> None:
+        self.batches += 1
+        self.items += size
+        self.last_batch_size = size
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.total_wait_s += sum(waits)
+        self.max_wait_s = max([self.max_wait_s, *waits])
+        bucket = next((f"le_{limit}" for limit in BATCH_SIZE_BUCKETS if size <= limit), "gt_512")
+        self.batch_size_counts[bucket] += 1
+
+
+class MicroBatcher(Generic[RequestT, ResultT]):
+    def __init__(
+        self,
+        score: Callable[[List[RequestT]], List[ResultT]],
+        window_ms: float = 2.0,
+        max_batch_size: int = 64,
+        max_queue: int = 1024,
+    ) -> None:
+        self.score = score
+        self.window_s = max(window_ms, 0.0) / 1000.0
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_queue = max(max_queue, 1)
+        self.stats = MicroBatchStats()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue[Tuple[RequestT, asyncio.Future, float]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _ensure_started(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._queue is None:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = loop.create_task(self._run(self._queue))
+        return self._queue
+
+    async def submit(self, request: RequestT) -> ResultT:
+        queue = self._ensure_started()
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        try:
+            queue.put_nowait((request, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.stats.rejected += 1
+            raise QueueFullError(f"micro-batch queue is full ({self.max_queue} pending)") from None
+        return await future
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._loop, self._queue, self._task = None, None, None
+
+    async def _collect(self, queue: asyncio.Queue) -> List[Tuple[RequestT, asyncio.Future, float]]:
+        batch = [await queue.get()]
+        deadline = time.perf_counter() + self.window_s
+        while len(batch) < self.max_batch_size:
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        while True:
+            batch = await self._collect(queue)
+            started = time.perf_counter()
+            self.stats.record(len(batch), [started - queued_at for _, _, queued_at in batch])
+            try:
+                results = await run_in_threadpool(self.score, [request for request, _, _ in batch])
+            except Exception as exc:
+                self.stats.failed_batches += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def status(self) -> Dict[str, Any]:
+        stats = self.stats
+        return {
+            "enabled": True,
+            "window_ms": self.window_s * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "max_queue": self.max_queue,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches": stats.batches,
+            "items": stats.items,
+            "rejected": stats.rejected,
+            "failed_batches": stats.failed_batches,
+            "mean_batch_size": round(stats.items / stats.batches, 2) if stats.batches else 0.0,
+            "last_batch_size": stats.last_batch_size,
+            "max_batch_size_seen": stats.max_batch_size,
+            "batch_size_counts": dict(stats.batch_size_counts),
+            "mean_wait_ms": round(stats.total_wait_s / stats.items * 1000.0, 3) if stats.items else 0.0,
+            "max_wait_ms": round(stats.max_wait_s * 1000.0, 3),
+        }
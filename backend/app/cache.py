@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+
+def row_keys(matrix: np.ndarray) -> List[bytes]:
+    # The raw float64 bytes of a row are its canonical key: cheaper to build
+    # and hash than a tuple of floats, and identical for identical rows.
+    rows = np.ascontiguousarray(matrix, dtype=np.float64)
+    if rows.shape[0] == 0:
+        return []
+    return rows.view(np.dtype((np.void, rows.itemsize * rows.shape[1]))).ravel().tolist()
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int = 16384, ttl_s: Optional[float] = None) -> None:
+        self.max_entries = max(max_entries, 1)
+        self.ttl_s = ttl_s if ttl_s and ttl_s > 0 else None
+        self.stats = CacheStats()
+        self._entries: OrderedDict[bytes, Tuple[float, float]] = OrderedDict()
+        self._generation = 0
+        self._lock = Lock()
+
+    def _accepts(self, generation: int) -> bool:
+        # Entries belong to one immune model generation. A newer one drops them
+        # all; lookups from an older snapshot still in flight bypass the cache.
+        if generation > self._generation:
+            if self._entries:
+                self.stats.invalidations += 1
+            self._entries.clear()
+            self._generation = generation
+        return generation == self._generation
+
+    def get_many(self, generation: int, keys: Sequence[bytes]) -> Tuple[np.ndarray, List[int]]:
+        values = np.full(len(keys), np.nan)
+        missing: List[int] = []
+        with self._lock:
+            if not self._accepts(generation):
+                self.stats.misses += len(keys)
+                return values, list(range(len(keys)))
+            now = time.monotonic()
+            entries = self._entries
+            for index, key in enumerate(keys):
+                entry = entries.get(key)
+                if entry is not None and entry[1] < now:
+                    del entries[key]
+                    self.stats.expirations += 1
+                    entry = None
+                if entry is None:
+                    missing.append(index)
+                    continue
+                entries.move_to_end(key)
+                values[index] = entry[0]
+            self.stats.hits += len(keys) - len(missing)
+            self.stats.misses += len(missing)
+        return values, missing
+
+    def put_many(self, generation: int, keys: Sequence[bytes], values: np.ndarray) -> None:
+        expires_at = time.monotonic() + self.ttl_s if self.ttl_s else float("inf")
+        with self._lock:
+            if not self._accepts(generation):
+                return
+            entries = self._entries
+            for key, value in zip(keys, values.tolist()):
+                entries[key] = (value, expires_at)
+                entries.move_to_end(key)
+            overflow = len(entries) - self.max_entries
+            for _ in range(max(overflow, 0)):
+                entries.popitem(last=False)
+            self.stats.evictions += max(overflow, 0)
+
+    def status(self) -> Dict[str, Any]:
+        stats = self.stats
+        lookups = stats.hits + stats.misses
+        return {
+            "enabled": True,
+            "generation": self._generation,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "hits": stats.hits,
+            "misses": stats.misses,
+            "hit_rate": round(stats.hits / lookups, 4) if lookups else 0.0,
+            "evictions": stats.evictions,
+            "expirations": stats.expirations,
+            "invalidations": stats.invalidations,
+        }
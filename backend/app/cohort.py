@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .features import ImmuneFeaturePipeline
+from .predictors import RISK_LEVEL_EDGES, RISK_LEVELS, ImmunePredictor, ImmuneScores
+from .schemas import ImmuneCohortItem, ImmuneCohortRequest
+
+
+UNASSIGNED = "unassigned"
+RISK_LEVEL_NAMES: List[str] = RISK_LEVELS.tolist()
+
+
+class Cohort:
+    # One roster's latest DIVS scores held as columns (resident, group code,
+    # raw inputs, divs_score), so a dashboard can ask for per-group statistics
+    # and a single resident's change only rescores that resident and
+    # re-aggregates the groups it left and joined.
+    def __init__(self, name: str, group_by: str, top_k: int, percentiles: Sequence[float]) -> None:
+        self.name = name
+        self.group_by = group_by
+        self.top_k = top_k
+        self.percentiles = [float(value) for value in percentiles]
+        self.generation = 0
+        self.lock = Lock()
+        # Set under `lock` once the registry holds another cohort by this name.
+        self.retired = False
+        self.resident_ids = np.empty(0, dtype=object)
+        self.codes = np.empty(0, dtype=np.intp)
+        self.inputs = np.empty((0, 0), dtype=np.float64)
+        self.divs = np.empty(0, dtype=np.float64)
+        self._rows: Dict[str, int] = {}
+        self._groups: List[str] = []
+        self._group_codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.resident_ids)
+
+    def _code(self, group: Optional[str]) -> int:
+        name = group or UNASSIGNED
+        code = self._group_codes.get(name)
+        if code is None:
+            code = self._group_codes[name] = len(self._groups)
+            self._groups.append(name)
+        return code
+
+    def load(
+        self,
+        resident_ids: Sequence[str],
+        groups: Sequence[Optional[str]],
+        inputs: np.ndarray,
+        scores: ImmuneScores,
+    ) -> None:
+        # A resident listed twice keeps its last row, as if upserted in order.
+        last = {resident_id: index for index, resident_id in enumerate(resident_ids)}
+        keep = np.fromiter(sorted(last.values()), dtype=np.intp, count=len(last))
+        self.resident_ids = np.array([resident_ids[index] for index in keep.tolist()], dtype=object)
+        self.codes = np.array([self._code(groups[index]) for index in keep.tolist()], dtype=np.intp)
+        self.inputs = inputs[keep]
+        self.divs = scores.divs_score[keep]
+        self.generation = scores.generation
+        self._rows = {resident_id: row for row, resident_id in enumerate(self.resident_ids.tolist())}
+
+    def rescore(self, predictor: ImmunePredictor) -> ImmuneScores:
+        scores = predictor.score_inputs(self.inputs, resident_ids=self.resident_ids.tolist())
+        self.divs = scores.divs_score
+        self.generation = scores.generation
+        return scores
+
+    def upsert(self, resident_id: str, group: Optional[str], inputs: np.ndarray, scores: ImmuneScores) -> List[str]:
+        # Returns the groups whose statistics changed.
+        code = self._code(group)
+        row = self._rows.get(resident_id)
+        if row is None:
+            self._rows[resident_id] = len(self.resident_ids)
+            self.resident_ids = np.append(self.resident_ids, np.array([resident_id], dtype=object))
+            self.codes = np.append(self.codes, code)
+            self.inputs = np.concatenate([self.inputs.reshape(-1, inputs.shape[1]), inputs])
+            self.divs = np.append(self.divs, scores.divs_score)
+            return [self._groups[code]]
+        previous = int(self.codes[row])
+        self.codes[row] = code
+        self.inputs[row] = inputs[0]
+        self.divs[row] = scores.divs_score[0]
+        return sorted({self._groups[previous], self._groups[code]})
+
+    def summary(self, groups: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        if groups is None:
+            codes, divs, resident_ids = self.codes, self.divs, self.resident_ids
+        else:
+            wanted = [self._group_codes[name] for name in groups if name in self._group_codes]
+            rows = np.isin(self.codes, wanted)
+            codes, divs, resident_ids = self.codes[rows], self.divs[rows], self.resident_ids[rows]
+
+        # Group-major, most at risk (lowest divs_score) first inside each group.
+        order = np.lexsort((divs, codes))
+        codes, divs, resident_ids = codes[order], divs[order], resident_ids[order]
+        levels = np.digitize(divs, RISK_LEVEL_EDGES)
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.empty(0, dtype=np.intp)
+        stops = np.r_[starts[1:], len(codes)]
+
+        summaries = []
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            segment = divs[start:stop]
+            counts = np.bincount(levels[start:stop], minlength=len(RISK_LEVELS)).tolist()
+            top = min(self.top_k, stop - start)
+            summaries.append(
+                {
+                    "group": self._groups[int(codes[start])],
+                    "residents": stop - start,
+                    "risk_levels": dict(zip(RISK_LEVEL_NAMES, counts)),
+                    "divs_mean": round(float(segment.mean()), 2),
+                    "divs_percentiles": {
+                        _percentile_name(q): round(value, 2)
+                        for q, value in zip(self.percentiles, np.percentile(segment, self.percentiles).tolist())
+                    },
+                    "top_risk": [
+                        {
+                            "resident_id": resident_ids[start + index],
+                            "divs_score": round(float(segment[index]), 2),
+                            "risk_level": RISK_LEVEL_NAMES[levels[start + index]],
+                        }
+                        for index in range(top)
+                    ],
+                }
+            )
+        if groups is not None:
+            # A group the last resident just left is still reported, as empty.
+            found = {item["group"] for item in summaries}
+            summaries.extend(self._empty_group(name) for name in dict.fromkeys(groups) if name not in found)
+        summaries.sort(key=lambda item: item["group"])
+        return summaries
+
+    def _empty_group(self, name: str) -> Dict[str, Any]:
+        return {
+            "group": name,
+            "residents": 0,
+            "risk_levels": dict.fromkeys(RISK_LEVEL_NAMES, 0),
+            "divs_mean": None,
+            "divs_percentiles": dict.fromkeys((_percentile_name(q) for q in self.percentiles), None),
+            "top_risk": [],
+        }
+
+
+def _percentile_name(value: float) -> str:
+    return f"p{value:g}"
+
+
+def _group(item: ImmuneCohortItem, group_by: str) -> Optional[str]:
+    return item.ward if group_by == "ward" else item.room
+
+
+def build_cohort(predictor: ImmunePredictor, request: ImmuneCohortRequest) -> Tuple[Cohort, ImmuneScores]:
+    resident_ids = [item.resident_id for item in request.items]
+    inputs = ImmuneFeaturePipeline.inputs([item.features for item in request.items])
+    scores = predictor.score_inputs(inputs, resident_ids=resident_ids)
+    cohort = Cohort(request.cohort, request.group_by, request.top_k, request.percentiles)
+    cohort.load(resident_ids, [_group(item, request.group_by) for item in request.items], inputs, scores)
+    return cohort, scores
+
+
+def refresh_cohort(predictor: ImmunePredictor, cohort: Cohort) -> bool:
+    # Scores computed under an older model generation are redone for the whole
+    # roster (through the result store when enabled). Call with cohort.lock held.
+    if cohort.generation == predictor.registry.artifacts.generation:
+        return False
+    cohort.rescore(predictor)
+    return True
+
+
+def update_cohort(predictor: ImmunePredictor, cohort: Cohort, item: ImmuneCohortItem) -> Optional[List[str]]:
+    # Groups to report after one resident changed, or None when the model
+    # changed since the roster was scored and every group moved. Call with
+    # cohort.lock held.
+    refreshed = refresh_cohort(predictor, cohort)
+    inputs = ImmuneFeaturePipeline.inputs([item.features])
+    scores = predictor.score_inputs(inputs, resident_ids=[item.resident_id])
+    changed = cohort.upsert(item.resident_id, _group(item, cohort.group_by), inputs, scores)
+    return None if refreshed else changed
+
+
+class CohortRegistry:
+    # Most recently used cohorts, bounded so rosters posted once and never
+    # updated do not accumulate.
+    def __init__(self, max_cohorts: int = 16) -> None:
+        self.max_cohorts = max(max_cohorts, 1)
+        self._cohorts: OrderedDict[str, Cohort] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, name: str) -> Optional[Cohort]:
+        with self._lock:
+            cohort = self._cohorts.get(name)
+            if cohort is not None:
+                self._cohorts.move_to_end(name)
+            return cohort
+
+    @contextmanager
+    def locked(self, name: str) -> Iterator[Optional[Cohort]]:
+        # The named cohort with its lock held (None if unknown). A cohort
+        # replaced while we waited for its lock is retired; look again.
+        while True:
+            cohort = self.get(name)
+            if cohort is None:
+                yield None
+                return
+            with cohort.lock:
+                if not cohort.retired:
+                    yield cohort
+                    return
+
+    def put(self, cohort: Cohort) -> None:
+        # The cohort being replaced is retired under its own lock, so an
+        # update running on it finishes first and any waiting one is sent on
+        # to the new roster by locked().
+        evicted: List[Cohort] = []
+        while True:
+            previous = self.get(cohort.name)
+            with previous.lock if previous is not None else nullcontext():
+                with self._lock:
+                    if self._cohorts.get(cohort.name) is not previous:
+                        continue
+                    self._cohorts[cohort.name] = cohort
+                    self._cohorts.move_to_end(cohort.name)
+                    while len(self._cohorts) > self.max_cohorts:
+                        evicted.append(self._cohorts.popitem(last=False)[1])
+                if previous is not None:
+                    previous.retired = True
+            break
+        # Evicted cohorts are retired the same way, each under its own lock
+        # once the replaced one's is released, so no thread holds two.
+        for stale in evicted:
+            with stale.lock:
+                stale.retired = True
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": True,
+                "max_cohorts": self.max_cohorts,
+                "cohorts": {name: len(cohort) for name, cohort in self._cohorts.items()},
+            }
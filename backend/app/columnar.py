@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import io
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import Any, Dict, List, Literal, Mapping, Optional, Tuple, Type, Union, get_args, get_origin
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+
+OutputFormat = Literal["csv", "parquet", "ndjson", "arrow", "msgpack"]
+WireFormat = Literal["arrow", "msgpack"]
+
+MAX_REPORTED_ERRORS = 50
+TRUE_VALUES = frozenset({"1", "1.0", "true", "t", "yes", "y", "on"})
+FALSE_VALUES = frozenset({"0", "0.0", "false", "f", "no", "n", "off"})
+MEDIA_TYPES: Dict[str, str] = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "msgpack": "application/msgpack",
+}
+WIRE_FORMATS: Tuple[WireFormat, ...] = ("arrow", "msgpack")
+FORMAT_MODULES: Dict[str, str] = {"parquet": "pyarrow", "arrow": "pyarrow", "msgpack": "msgpack"}
+# Every Arrow IPC stream message starts with this continuation marker.
+ARROW_STREAM_MAGIC = b"\xff\xff\xff\xff"
+
+
+class ColumnValidationError(ValueError):
+    def __init__(self, errors: List[Dict[str, Any]], error_count: int) -> None:
+        super().__init__(f"{error_count} invalid value(s)")
+        self.errors = errors
+        self.error_count = error_count
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    name: str
+    kind: str
+    required: bool
+    nullable: bool
+    default: Any = None
+    choices: Tuple[str, ...] = ()
+    ge: Optional[float] = None
+    gt: Optional[float] = None
+    le: Optional[float] = None
+    lt: Optional[float] = None
+
+
+@lru_cache(maxsize=None)
+def field_specs(model: Type[BaseModel]) -> Tuple[FieldSpec, ...]:
+    specs = []
+    for name, info in model.model_fields.items():
+        annotation = info.annotation
+        nullable = False
+        if get_origin(annotation) is Union:
+            args = [arg for arg in get_args(annotation) if arg is not type(None)]
+            nullable = len(args) < len(get_args(annotation))
+            annotation = args[0]
+
+        choices: Tuple[str, ...] = ()
+        if get_origin(annotation) is Literal:
+            kind = "literal"
+            choices = tuple(str(arg) for arg in get_args(annotation))
+        elif annotation is bool:
+            kind = "bool"
+        elif annotation is int:
+            kind = "int"
+        else:
+            kind = "float"
+
+        bounds = {key: None for key in ("ge", "gt", "le", "lt")}
+        for meta in info.metadata:
+            for key in bounds:
+                if getattr(meta, key, None) is not None:
+                    bounds[key] = float(getattr(meta, key))
+
+        specs.append(
+            FieldSpec(
+                name=name,
+                kind=kind,
+                required=info.is_required(),
+                nullable=nullable,
+                default=None if info.is_required() else info.default,
+                choices=choices,
+                **bounds,
+            )
+        )
+    return tuple(specs)
+
+
+def _bound_violations(spec: FieldSpec, values: np.ndarray) -> List[Tuple[np.ndarray, str]]:
+    violations = []
+    if spec.ge is not None:
+        violations.append((values < spec.ge, f"Input should be greater than or equal to {spec.ge:g}"))
+    if spec.gt is not None:
+        violations.append((values <= spec.gt, f"Input should be greater than {spec.gt:g}"))
+    if spec.le is not None:
+        violations.append((values > spec.le, f"Input should be less than or equal to {spec.le:g}"))
+    if spec.lt is not None:
+        violations.append((values >= spec.lt, f"Input should be less than {spec.lt:g}"))
+    return violations
+
+
+def _validate_column(
+    spec: FieldSpec, raw: Optional[pd.Series], n_rows: int
+) -> Tuple[np.ndarray, List[Tuple[np.ndarray, str]]]:
+    problems: List[Tuple[np.ndarray, str]] = []
+    if raw is None:
+        if spec.required:
+            return np.full(n_rows, np.nan), [(np.ones(n_rows, dtype=bool), "Field required")]
+        raw = pd.Series([None] * n_rows, dtype=object)
+
+    missing = raw.isna().to_numpy()
+    if spec.kind == "literal":
+        text = raw.astype(str).str.strip().to_numpy(dtype=object)
+        text[missing] = spec.default
+        invalid = ~missing & ~np.isin(text, spec.choices)
+        problems.append((invalid, f"Input should be {', '.join(repr(choice) for choice in spec.choices)}"))
+        values = text
+    elif spec.kind == "bool":
+        text = raw.astype(str).str.strip().str.lower()
+        truthy = text.isin(TRUE_VALUES).to_numpy()
+        falsy = text.isin(FALSE_VALUES).to_numpy()
+        problems.append((~missing & ~truthy & ~falsy, "Input should be a valid boolean"))
+        values = np.where(missing, bool(spec.default), truthy)
+    else:
+        values = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        kind = "integer" if spec.kind == "int" else "number"
+        problems.append((~missing & np.isnan(values), f"Input should be a valid {kind}"))
+        if spec.kind == "int":
+            with np.errstate(invalid="ignore"):
+                fractional = np.isfinite(values) & (values != np.floor(values))
+            problems.append((fractional, "Input should be a valid integer"))
+        if not spec.nullable and spec.default is not None:
+            values = np.where(missing, float(spec.default), values)
+        problems.extend(_bound_violations(spec, values))
+
+    if not spec.nullable and (spec.required or spec.default is None):
+        problems.append((missing, "Field required"))
+    return values, problems
+
+
+def validate_columns(
+    source: Union[pd.DataFrame, Mapping[str, Any]], model: Type[BaseModel]
+) -> Dict[str, np.ndarray]:
+    frame = source if isinstance(source, pd.DataFrame) else pd.DataFrame(dict(source))
+    n_rows = len(frame)
+    columns: Dict[str, np.ndarray] = {}
+    errors: List[Dict[str, Any]] = []
+    error_count = 0
+
+    for spec in field_specs(model):
+        raw = frame[spec.name] if spec.name in frame.columns else None
+        values, problems = _validate_column(spec, raw, n_rows)
+        columns[spec.name] = values
+        for mask, message in problems:
+            rows = np.flatnonzero(mask)
+            error_count += int(rows.size)
+            for row in rows[: max(MAX_REPORTED_ERRORS - len(errors), 0)].tolist():
+                errors.append({"row": row, "column": spec.name, "message": message})
+
+    if error_count:
+        raise ColumnValidationError(errors, error_count)
+    return columns
+
+
+def resident_ids(frame: pd.DataFrame) -> List[Optional[str]]:
+    if "resident_id" not in frame.columns:
+        return [None] * len(frame)
+    ids = frame["resident_id"].astype(object).where(frame["resident_id"].notna(), None)
+    return [None if value is None else str(value) for value in ids.tolist()]
+
+
+def read_table(body: bytes, content_type: Optional[str] = None) -> pd.DataFrame:
+    if not body.strip():
+        raise ValueError("empty upload")
+    if body[:4] == b"PAR1" or "parquet" in (content_type or ""):
+        return pd.read_parquet(io.BytesIO(body))
+    if body[:4] == ARROW_STREAM_MAGIC or MEDIA_TYPES["arrow"] in (content_type or ""):
+        return read_arrow(body)
+    if MEDIA_TYPES["msgpack"] in (content_type or ""):
+        return columns_frame(unpack(body))
+    return pd.read_csv(
+        io.BytesIO(body), dtype={"resident_id": str}, encoding="utf-8-sig", float_precision="round_trip"
+    )
+
+
+def _json_column(values: List[Any], identifier: bool = False) -> np.ndarray:
+    # Numeric columns (null for missing) convert straight to float64; anything
+    # else stays object and is parsed by validate_columns like CSV text.
+    # Identifiers are kept as text, as read_csv does, so 101 never becomes 101.0.
+    if identifier:
+        column = np.empty(len(values), dtype=object)
+        column[:] = [None if value is None else str(value) for value in values]
+        return column
+    first = next((value for value in values if value is not None), None)
+    if isinstance(first, (int, float)) and not isinstance(first, bool):
+        try:
+            return np.array(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            pass
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def read_json_columns(body: bytes) -> pd.DataFrame:
+    return columns_frame(json.loads(body))
+
+
+def columns_frame(payload: Any) -> pd.DataFrame:
+    # Either {"age": [...], "gender": [...], ...} or a header plus rows:
+    # {"columns": ["age", ...], "rows": [[80, ...], ...]}.
+    if not isinstance(payload, dict):
+        raise ValueError("expected a JSON object")
+    if "rows" in payload:
+        header, rows = payload.get("columns"), payload["rows"]
+        if not isinstance(header, list) or not all(isinstance(name, str) for name in header):
+            raise ValueError('"columns" must be a list of column names')
+        if not isinstance(rows, list) or not all(isinstance(row, list) and len(row) == len(header) for row in rows):
+            raise ValueError(f'"rows" must be a list of rows with {len(header)} values each')
+        payload = dict(zip(header, map(list, zip(*rows)))) if rows else {name: [] for name in header}
+    if not all(isinstance(values, list) for values in payload.values()):
+        raise ValueError("every column must be a list of values")
+    lengths = {len(values) for values in payload.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"columns have different lengths: {sorted(lengths)}")
+    return pd.DataFrame(
+        {name: _json_column(values, name == "resident_id") for name, values in payload.items()}, copy=False
+    )
+
+
+def output_format(accept: Optional[str], requested: Optional[str] = None) -> OutputFormat:
+    if requested:
+        return requested  # type: ignore[return-value]
+    for name, media_type in MEDIA_TYPES.items():
+        if media_type in (accept or ""):
+            return name  # type: ignore[return-value]
+    return "csv"
+
+
+def write_table(frame: pd.DataFrame, fmt: OutputFormat) -> Tuple[bytes, str]:
+    if fmt == "parquet":
+        buffer = io.BytesIO()
+        frame.to_parquet(buffer, index=False)
+        return buffer.getvalue(), MEDIA_TYPES[fmt]
+    if fmt == "arrow":
+        import pyarrow as pa
+
+        return write_arrow(pa.Table.from_pandas(frame, preserve_index=False)), MEDIA_TYPES[fmt]
+    if fmt == "msgpack":
+        # Column-oriented, the same shape read_table accepts back.
+        columns = {name: frame[name].astype(object).where(frame[name].notna(), None).tolist() for name in frame}
+        return pack(columns), MEDIA_TYPES[fmt]
+    if fmt == "ndjson":
+        records = frame.astype(object).where(frame.notna(), None).to_dict(orient="records")
+        lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        return lines.encode("utf-8"), MEDIA_TYPES[fmt]
+    return frame.to_csv(index=False).encode("utf-8"), MEDIA_TYPES[fmt]
+
+
+def wire_format(media_type: Optional[str]) -> Optional[WireFormat]:
+    # The binary format named by a Content-Type or Accept header, if any;
+    # None means JSON.
+    for name in WIRE_FORMATS:
+        if MEDIA_TYPES[name] in (media_type or ""):
+            return name
+    return None
+
+
+def missing_dependency(fmt: OutputFormat) -> Optional[str]:
+    # The package a format needs when it is not installed; msgpack is optional.
+    module = FORMAT_MODULES.get(fmt)
+    return module if module is not None and find_spec(module) is None else None
+
+
+def json_only(value: Any) -> Any:
+    # For request bodies declared as Optional[Model]: FastAPI hands non-JSON
+    # bodies over as raw bytes, which the endpoint decodes itself.
+    return None if isinstance(value, (bytes, bytearray)) else value
+
+
+def read_arrow(body: bytes) -> pd.DataFrame:
+    import pyarrow as pa
+
+    with pa.ipc.open_stream(body) as reader:
+        table = reader.read_all()
+    # Numeric columns convert as whole buffers; strings and dictionaries
+    # become object columns and are validated like CSV text.
+    return table.to_pandas()
+
+
+def _arrow_type(annotation: Any) -> Any:
+    import pyarrow as pa
+
+    origin, args = get_origin(annotation), get_args(annotation)
+    if origin is Union:
+        return _arrow_type(next(arg for arg in args if arg is not type(None)))
+    if origin is Literal or annotation is str:
+        return pa.string()
+    if origin is list:
+        return pa.list_(_arrow_type(args[0]))
+    if origin is dict:
+        return pa.map_(_arrow_type(args[0]), _arrow_type(args[1]))
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return pa.struct([(name, _arrow_type(info.annotation)) for name, info in annotation.model_fields.items()])
+    return {bool: pa.bool_(), int: pa.int64()}.get(annotation, pa.float64())
+
+
+@lru_cache(maxsize=None)
+def arrow_schema(model: Type[BaseModel]) -> Any:
+    # One typed column per field; nested models become structs and
+    # Dict[str, Model] a map, so responses keep their shape in Arrow.
+    import pyarrow as pa
+
+    return pa.schema([(name, _arrow_type(info.annotation)) for name, info in model.model_fields.items()])
+
+
+def records_table(records: List[Dict[str, Any]], model: Type[BaseModel]) -> Any:
+    import pyarrow as pa
+
+    return pa.Table.from_pylist(records, schema=arrow_schema(model))
+
+
+def write_arrow(table: Any) -> bytes:
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def unpack(body: bytes) -> Any:
+    import msgpack
+
+    return msgpack.unpackb(body, raw=False)
+
+
+def pack(value: Any) -> bytes:
+    import msgpack
+
+    return msgpack.packb(value, use_bin_type=True)
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import json
+import math
+from typing import Any, List, Mapping, Optional, Sequence
+
+import numpy as np
+from fastapi.responses import Response
+
+from .features import IMMUNE_COLUMNS
+from .schemas import ImmunePredictResponse
+
+
+JSON_MEDIA_TYPE = "application/json"
+
+# Field order and spelling follow ImmunePredictResponse, and %r is the float
+# repr json.dumps uses, so the bytes equal what JSONResponse would render.
+_IMMUNE_HEAD = (
+    '{"resident_id":%s,"source":"%s","risk_probability":%r,"immunity_score":%r,'
+    '"divs_score":%r,"risk_level":"%s","used_features":'
+)
+_IMMUNE_FEATURES = "{" + ",".join(f'"{name}":%r' for name in IMMUNE_COLUMNS) + "}"
+_IMMUNE_FEATURE_TEXT = "{" + ",".join(f'"{name}":%s' for name in IMMUNE_COLUMNS) + "}"
+_IMMUNE_TAIL = ',"model_generation":%s}'
+
+
+class FastJSONResponse(Response):
+    media_type = JSON_MEDIA_TYPE
+
+
+def _json_string(value: Optional[str]) -> str:
+    return "null" if value is None else json.dumps(value, ensure_ascii=False)
+
+
+def immune_item(
+    resident_id: Optional[str],
+    source: str,
+    risk_probability: float,
+    immunity_score: float,
+    divs_score: float,
+    risk_level: str,
+    features: Optional[Sequence[float]],
+    generation: Optional[int],
+) -> str:
+    head = _IMMUNE_HEAD % (
+        _json_string(resident_id),
+        source,
+        risk_probability,
+        immunity_score,
+        divs_score,
+        risk_level,
+    )
+    used = _IMMUNE_FEATURES % tuple(features) if features is not None else "{}"
+    return head + used + _IMMUNE_TAIL % ("null" if generation is None else generation)
+
+
+def immune_response(response: ImmunePredictResponse) -> str:
+    used = response.used_features
+    features = [used[name] for name in IMMUNE_COLUMNS] if used else None
+    if features is not None and not all(math.isfinite(value) for value in features):
+        raise ValueError("Out of range float values are not JSON compliant")
+    return immune_item(
+        response.resident_id,
+        response.source,
+        response.risk_probability,
+        response.immunity_score,
+        response.divs_score,
+        response.risk_level,
+        features,
+        response.model_generation,
+    )
+
+
+def _float_texts(values: np.ndarray) -> List[str]:
+    # Feature columns hold few distinct values (flags, ages, RR products), so
+    # each distinct float is formatted once. Uniques are taken on the bit
+    # pattern so 0.0 and -0.0 keep their own spelling.
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    unique, inverse = np.unique(values.view(np.int64), return_inverse=True)
+    texts = np.array([repr(value) for value in unique.view(np.float64).tolist()], dtype=object)
+    return texts[inverse.reshape(-1)].tolist()
+
+
+def immune_items(
+    source: str,
+    resident_ids: Sequence[Optional[str]],
+    risk_probability: Sequence[float],
+    immunity_score: Sequence[float],
+    divs_score: Sequence[float],
+    risk_level: Sequence[str],
+    features: Optional[np.ndarray],
+    generation: Optional[int],
+) -> List[str]:
+    # JSONResponse rejects NaN/inf; fail the same way instead of emitting invalid JSON.
+    if features is not None and not np.isfinite(features).all():
+        raise ValueError("Out of range float values are not JSON compliant")
+    if features is None:
+        used = ["{}"] * len(risk_level)
+    else:
+        used = [_IMMUNE_FEATURE_TEXT % row for row in zip(*(_float_texts(column) for column in features.T))]
+    tail = _IMMUNE_TAIL % ("null" if generation is None else generation)
+    return [
+        _IMMUNE_HEAD
+        % (
+            _json_string(resident_ids[index]),
+            source,
+            risk_probability[index],
+            immunity_score[index],
+            divs_score[index],
+            risk_level[index],
+        )
+        + used[index]
+        + tail
+        for index in range(len(risk_level))
+    ]
+
+
+def items_body(items: Sequence[str], extra: Optional[Mapping[str, Any]] = None) -> bytes:
+    # Extra fields follow "items", encoded as JSONResponse would encode them.
+    tail = "".join(f",{_json_string(key)}:{_compact(value)}" for key, value in extra.items()) if extra else ""
+    return ('{"items":[' + ",".join(items) + "]" + tail + "}").encode("utf-8")
+
+
+def _compact(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def ndjson_lines(items: Sequence[str]) -> bytes:
+    return "".join(item + "\n" for item in items).encode("utf-8")
@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .columnar import field_specs
+from .schemas import ImmuneFeatures, NutritionIntervention, NutritionPatient
+
+
+IMMUNE_INPUT_COLUMNS: Tuple[str, ...] = (
+    "age",
+    "gender",
+    "dementia_yn",
+    "parkinson_yn",
+    "chf_yn",
+    "ckd_yn",
+    "copd_yn",
+    "cancer_yn",
+    "steroid_yn",
+    "immunosup_yn",
+    "antipsychotic_yn",
+    "temp_rr",
+    "season_rr",
+    "hum_rr",
+    "outbreak_rr",
+    "room_rr",
+    "epi_rr",
+)
+IMMUNE_RR_COLUMNS: Tuple[str, ...] = IMMUNE_INPUT_COLUMNS[11:]
+IMMUNE_BASE_COLUMNS: Tuple[str, ...] = (
+    "AGE",
+    "GENDER",
+    "DEMENTIA_YN",
+    "PARKINSON_YN",
+    "CHF_YN",
+    "CKD_YN",
+    "COPD_YN",
+    "CANCER_YN",
+    "STEROID_YN",
+    "IMMUNOSUP_YN",
+    "ANTIPSYCHOTIC_YN",
+)
+IMMUNE_DERIVED_COLUMNS: Tuple[str, ...] = (
+    "FRAILTY_INDEX",
+    "SEVERE_IMMUNE_LOW",
+    "DISEASE_BURDEN",
+    "AGE_BIN",
+    "AGE_SQ",
+    "AGE_x_DISEASE",
+    "AGE_x_FRAILTY",
+)
+IMMUNE_FEATURE_COLUMNS = IMMUNE_BASE_COLUMNS + IMMUNE_DERIVED_COLUMNS
+IMMUNE_COLUMNS = IMMUNE_FEATURE_COLUMNS + ("ENV_RR",)
+IMMUNE_COLUMN_INDEX = {name: index for index, name in enumerate(IMMUNE_COLUMNS)}
+MALE_GENDERS = frozenset({"M", "남"})
+
+ALBUMIN_LAB_DEFAULTS: Dict[str, float] = {
+    "hemoglobin": 13.0,
+    "bun": 20.0,
+    "creatinine": 1.0,
+    "glucose": 100.0,
+    "sodium": 140.0,
+    "potassium": 4.0,
+    "chloride": 105.0,
+    "bicarbonate": 24.0,
+    "wbc": 8.0,
+    "platelet": 250.0,
+}
+ALBUMIN_COLUMNS: Tuple[str, ...] = (
+    # Legacy lab-driven features (if model expects them)
+    "age",
+    "sex_M",
+    *ALBUMIN_LAB_DEFAULTS,
+    "bun_creatinine_ratio",
+    # Albumin-change model features (uppercase)
+    "AGE",
+    "GENDER",
+    "CKD",
+    "DIABETES",
+    "CCI",
+    "INITIAL_ALBUMIN",
+    "PROTEIN_INTAKE",
+    # Derived features (match notebook)
+    "protein_per_kg",
+    "high_protein",
+    "low_protein",
+    "low_baseline_albumin",
+    "very_low_baseline",
+    "CKD_protein",
+    "DIABETES_protein",
+    "baseline_protein",
+    "CKD_baseline",
+    "elderly",
+    "AGE_CKD",
+    "high_risk",
+    "comorbidity_count",
+    "protein_squared",
+    "protein_log",
+    "albumin_squared",
+    "albumin_log",
+    # Lowercase/alternate aliases for compatibility
+    "cci",
+    "ckd_protein",
+    "diabetes_protein",
+    "ckd_baseline",
+    "age_ckd",
+)
+ALBUMIN_COLUMN_INDEX = {name: index for index, name in enumerate(ALBUMIN_COLUMNS)}
+
+
+def nutrition_columns(
+    patients: Sequence[NutritionPatient], interventions: Sequence[NutritionIntervention]
+) -> Dict[str, np.ndarray]:
+    # Same layout as columnar.validate_columns: float64 with NaN for missing
+    # numbers, bool arrays for flags and object arrays for literals.
+    columns: Dict[str, np.ndarray] = {}
+    for items, model in ((patients, NutritionPatient), (interventions, NutritionIntervention)):
+        for spec in field_specs(model):
+            values = [getattr(item, spec.name) for item in items]
+            if spec.kind == "literal":
+                columns[spec.name] = np.array(values, dtype=object)
+            elif spec.kind == "bool":
+                columns[spec.name] = np.array(values, dtype=bool)
+            else:
+                columns[spec.name] = np.array(
+                    [np.nan if value is None else value for value in values], dtype=np.float64
+                )
+    return columns
+
+
+def exact_power(values: np.ndarray, exponent: float) -> np.ndarray:
+    # numpy's vectorized pow (and its x**2 -> x*x shortcut) can differ from
+    # Python's float pow by 1 ulp, so evaluate Python's pow once per distinct value.
+    unique, inverse = np.unique(values, return_inverse=True)
+    powered = np.array([value**exponent for value in unique.tolist()], dtype=np.float64)
+    return powered[inverse.reshape(-1)]
+
+
+def environment_rr_from_columns(rr: np.ndarray) -> np.ndarray:
+    product = rr[:, 0].copy()
+    for column in range(1, rr.shape[1]):
+        product *= rr[:, column]
+    return np.clip(exact_power(product, 1.0 / rr.shape[1]), 0.5, 2.5)
+
+
+class _ModelColumns:
+    def __init__(
+        self, feature_names: Optional[Sequence[str]], columns: Tuple[str, ...], index: Dict[str, int]
+    ) -> None:
+        names = list(feature_names) if feature_names is not None else []
+        self.feature_names: List[str] = names or list(columns)
+        positions = [(out, index[name]) for out, name in enumerate(self.feature_names) if name in index]
+        self._targets = np.array([out for out, _ in positions], dtype=np.intp)
+        self._sources = np.array([source for _, source in positions], dtype=np.intp)
+        self._complete = len(positions) == len(self.feature_names)
+
+    def model_input(self, matrix: np.ndarray) -> np.ndarray:
+        if self._complete:
+            return matrix.take(self._sources, axis=1)
+        out = np.zeros((matrix.shape[0], len(self.feature_names)), dtype=np.float64)
+        out[:, self._targets] = matrix[:, self._sources]
+        return out
+
+
+class ImmuneFeaturePipeline(_ModelColumns):
+    columns = IMMUNE_COLUMNS
+
+    def __init__(self, feature_names: Optional[Sequence[str]] = None) -> None:
+        # ENV_RR is an output column, never a model input.
+        model_index = {name: index for name, index in IMMUNE_COLUMN_INDEX.items() if name != "ENV_RR"}
+        super().__init__(feature_names, IMMUNE_FEATURE_COLUMNS, model_index)
+
+    @staticmethod
+    def inputs(features: Sequence[ImmuneFeatures]) -> np.ndarray:
+        rows = [
+            (
+                item.age,
+                1.0 if item.gender in MALE_GENDERS else 0.0,
+                item.dementia_yn,
+                item.parkinson_yn,
+                item.chf_yn,
+                item.ckd_yn,
+                item.copd_yn,
+                item.cancer_yn,
+                item.steroid_yn,
+                item.immunosup_yn,
+                item.antipsychotic_yn,
+                item.temp_rr,
+                item.season_rr,
+                item.hum_rr,
+                item.outbreak_rr,
+                item.room_rr,
+                item.epi_rr,
+            )
+            for item in features
+        ]
+        return np.array(rows, dtype=np.float64).reshape(len(rows), len(IMMUNE_INPUT_COLUMNS))
+
+    @staticmethod
+    def inputs_from_columns(columns: Mapping[str, np.ndarray]) -> np.ndarray:
+        inputs = np.empty((len(columns["age"]), len(IMMUNE_INPUT_COLUMNS)), dtype=np.float64)
+        for index, name in enumerate(IMMUNE_INPUT_COLUMNS):
+            if name == "gender":
+                inputs[:, index] = np.isin(columns[name], list(MALE_GENDERS))
+            else:
+                inputs[:, index] = columns[name]
+        return inputs
+
+    def transform(self, inputs: np.ndarray) -> np.ndarray:
+        matrix = np.empty((inputs.shape[0], len(IMMUNE_COLUMNS)), dtype=np.float64)
+        base_width = len(IMMUNE_BASE_COLUMNS)
+        matrix[:, :base_width] = inputs[:, :base_width]
+
+        column = IMMUNE_COLUMN_INDEX
+        age = matrix[:, column["AGE"]]
+        frailty_index = (age >= 75) & (
+            (matrix[:, column["DEMENTIA_YN"]] == 1.0) | (matrix[:, column["PARKINSON_YN"]] == 1.0)
+        )
+        severe_immune_low = (matrix[:, column["CANCER_YN"]] == 1.0) & (
+            (matrix[:, column["STEROID_YN"]] == 1.0) | (matrix[:, column["IMMUNOSUP_YN"]] == 1.0)
+        )
+        disease_burden = (
+            matrix[:, column["CHF_YN"]]
+            + matrix[:, column["CKD_YN"]]
+            + matrix[:, column["COPD_YN"]]
+            + matrix[:, column["CANCER_YN"]]
+        )
+
+        matrix[:, column["FRAILTY_INDEX"]] = frailty_index
+        matrix[:, column["SEVERE_IMMUNE_LOW"]] = severe_immune_low
+        matrix[:, column["DISEASE_BURDEN"]] = disease_burden
+        matrix[:, column["AGE_BIN"]] = np.digitize(age, [65.0, 75.0, 85.0])
+        matrix[:, column["AGE_SQ"]] = exact_power(age, 2)
+        matrix[:, column["AGE_x_DISEASE"]] = age * disease_burden
+        matrix[:, column["AGE_x_FRAILTY"]] = age * matrix[:, column["FRAILTY_INDEX"]]
+        matrix[:, column["ENV_RR"]] = environment_rr_from_columns(inputs[:, base_width:])
+        return matrix
+
+
+class AlbuminFeaturePipeline(_ModelColumns):
+    columns = ALBUMIN_COLUMNS
+
+    def __init__(self, feature_names: Optional[Sequence[str]] = None) -> None:
+        super().__init__(feature_names, ALBUMIN_COLUMNS, ALBUMIN_COLUMN_INDEX)
+
+    def transform(self, columns: Mapping[str, np.ndarray]) -> np.ndarray:
+        rows = len(columns["age"])
+        matrix = np.empty((rows, len(ALBUMIN_COLUMNS)), dtype=np.float64)
+        column = ALBUMIN_COLUMN_INDEX
+
+        age = np.asarray(columns["age"], dtype=np.float64)
+        sex_m = np.asarray(columns["sex"]) == "M"
+        for name, default in ALBUMIN_LAB_DEFAULTS.items():
+            matrix[:, column[name]] = np.where(np.isnan(columns[name]), default, columns[name])
+        bun = matrix[:, column["bun"]]
+        creatinine = matrix[:, column["creatinine"]]
+        ckd = (np.asarray(columns["ckd_stage"]) >= 3).astype(np.float64)
+        diabetes = (matrix[:, column["glucose"]] >= 126.0).astype(np.float64)
+        initial_albumin = np.where(np.isnan(columns["albumin"]), 3.5, columns["albumin"])
+        protein_intake = np.where(np.isnan(columns["protein_g"]), 50.0, columns["protein_g"])
+        cci = ckd + diabetes
+
+        matrix[:, column["age"]] = age
+        matrix[:, column["sex_M"]] = sex_m
+        matrix[:, column["bun_creatinine_ratio"]] = bun / np.maximum(creatinine, 0.1)
+        matrix[:, column["AGE"]] = age
+        matrix[:, column["GENDER"]] = sex_m
+        matrix[:, column["CKD"]] = ckd
+        matrix[:, column["DIABETES"]] = diabetes
+        matrix[:, column["CCI"]] = cci
+        matrix[:, column["INITIAL_ALBUMIN"]] = initial_albumin
+        matrix[:, column["low_baseline_albumin"]] = initial_albumin < 3.5
+        matrix[:, column["very_low_baseline"]] = initial_albumin < 3.0
+        matrix[:, column["CKD_baseline"]] = ckd * initial_albumin
+        matrix[:, column["elderly"]] = age > 75.0
+        matrix[:, column["AGE_CKD"]] = age * ckd
+        matrix[:, column["high_risk"]] = (ckd == 1.0) | (diabetes == 1.0) | (initial_albumin < 3.0)
+        matrix[:, column["comorbidity_count"]] = cci
+        matrix[:, column["albumin_squared"]] = exact_power(initial_albumin, 2)
+        matrix[:, column["albumin_log"]] = np.log(np.maximum(initial_albumin, 0.1))
+        matrix[:, column["cci"]] = cci
+        matrix[:, column["ckd_baseline"]] = matrix[:, column["CKD_baseline"]]
+        matrix[:, column["age_ckd"]] = matrix[:, column["AGE_CKD"]]
+        self._fill_protein_columns(matrix, protein_intake)
+        return matrix
+
+    @staticmethod
+    def _fill_protein_columns(matrix: np.ndarray, protein_intake: np.ndarray) -> None:
+        # The only albumin features that depend on the intervention; everything
+        # else is a function of the patient alone.
+        column = ALBUMIN_COLUMN_INDEX
+        age = matrix[:, column["AGE"]]
+        ckd = matrix[:, column["CKD"]]
+        diabetes = matrix[:, column["DIABETES"]]
+        initial_albumin = matrix[:, column["INITIAL_ALBUMIN"]]
+
+        matrix[:, column["PROTEIN_INTAKE"]] = protein_intake
+        matrix[:, column["protein_per_kg"]] = protein_intake / (age * 0.5 + 50.0)
+        matrix[:, column["high_protein"]] = protein_intake > 60.0
+        matrix[:, column["low_protein"]] = protein_intake < 40.0
+        matrix[:, column["CKD_protein"]] = ckd * protein_intake
+        matrix[:, column["DIABETES_protein"]] = diabetes * protein_intake
+        matrix[:, column["baseline_protein"]] = initial_albumin * protein_intake
+        matrix[:, column["protein_squared"]] = exact_power(protein_intake, 2)
+        matrix[:, column["protein_log"]] = np.log1p(protein_intake)
+        matrix[:, column["ckd_protein"]] = matrix[:, column["CKD_protein"]]
+        matrix[:, column["diabetes_protein"]] = matrix[:, column["DIABETES_protein"]]
+
+    def vary_protein(self, row: np.ndarray, protein_intake: np.ndarray) -> np.ndarray:
+        matrix = np.repeat(row.reshape(1, -1), len(protein_intake), axis=0)
+        self._fill_protein_columns(matrix, protein_intake)
+        return matrix
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True, slots=True)
+class IronRules:
+    baseline_hgb_increase: float
+    ckd_absorption_factor: float
+    inflammation_factor: float
+
+
+@dataclass(frozen=True, slots=True)
+class VitaminDRules:
+    increase_per_1000iu: float
+    upper_limit_iu: float
+    upper_limit_label: str
+
+
+@dataclass(frozen=True, slots=True)
+class CalciumRules:
+    fracture_risk_reduction: float
+
+
+@dataclass(frozen=True, slots=True)
+class Omega3Rules:
+    cvd_risk_reduction: float
+
+
+@dataclass(frozen=True, slots=True)
+class VitaminCRules:
+    upper_limit_label: str
+    kidney_stone_threshold_male: float
+    # searchsorted(band_edges, dose, side="right") gives the interpretation
+    # band: < rni, < optimal low, <= optimal high, <= upper limit, above.
+    band_edges: np.ndarray
+
+
+@dataclass(frozen=True, slots=True)
+class Guidelines:
+    iron: IronRules
+    vitamin_d: VitaminDRules
+    calcium: CalciumRules
+    omega3: Omega3Rules
+    vitamin_c: VitaminCRules
+
+
+class _Reader:
+    def __init__(self, raw: Mapping[str, Any]) -> None:
+        self.raw = raw
+        self.errors: List[str] = []
+
+    def section(self, name: str) -> None:
+        value = self.raw.get(name)
+        if not isinstance(value, Mapping):
+            self.errors.append(f"{name}: expected an object, got {value!r}")
+
+    def number(self, section: str, key: str, maximum: Optional[float] = None) -> float:
+        values = self.raw.get(section)
+        if not isinstance(values, Mapping):
+            return math.nan
+        value = values.get(key)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            self.errors.append(f"{section}.{key}: expected a number, got {value!r}")
+            return math.nan
+        if value < 0 or (maximum is not None and value > maximum):
+            bounds = f"[0, {maximum}]" if maximum is not None else ">= 0"
+            self.errors.append(f"{section}.{key}: {value!r} is outside {bounds}")
+        return float(value)
+
+    def label(self, section: str, key: str) -> str:
+        # Interpretation strings quote the file's own spelling (4000, not 4000.0).
+        values = self.raw.get(section)
+        return f"{values.get(key)}" if isinstance(values, Mapping) else ""
+
+
+def _vitamin_c_rules(reader: _Reader) -> VitaminCRules:
+    values = reader.raw.get("vitamin_c")
+    optimal_range = values.get("optimal_range") if isinstance(values, Mapping) else None
+    optimal_low = optimal_high = math.nan
+    if (
+        isinstance(optimal_range, (list, tuple))
+        and len(optimal_range) == 2
+        and all(not isinstance(value, bool) and isinstance(value, (int, float)) for value in optimal_range)
+    ):
+        optimal_low, optimal_high = (float(value) for value in optimal_range)
+    elif isinstance(values, Mapping):
+        reader.errors.append(f"vitamin_c.optimal_range: expected [low, high], got {optimal_range!r}")
+
+    rni = reader.number("vitamin_c", "rni")
+    upper_limit = reader.number("vitamin_c", "upper_limit")
+    edges = np.array([rni, optimal_low, optimal_high, upper_limit], dtype=np.float64)
+    if not np.isnan(edges).any() and np.any(np.diff(edges) < 0):
+        reader.errors.append("vitamin_c: expected rni <= optimal_range[0] <= optimal_range[1] <= upper_limit")
+    # The last two bands are closed on the right (dose <= edge); moving those
+    # edges up by one ulp lets a single right-sided searchsorted cover all four.
+    edges[2:] = np.nextafter(edges[2:], np.inf)
+    edges.setflags(write=False)
+    return VitaminCRules(
+        upper_limit_label=reader.label("vitamin_c", "upper_limit"),
+        kidney_stone_threshold_male=reader.number("vitamin_c", "kidney_stone_risk_threshold_male"),
+        band_edges=edges,
+    )
+
+
+def compile_guidelines(raw: Mapping[str, Any]) -> Tuple[Guidelines, List[str]]:
+    # Every value the rule engine reads is checked and converted once here, so a
+    # malformed guideline file is reported at load time instead of per request.
+    reader = _Reader(raw)
+    for name in ("iron", "vitamin_d", "calcium", "omega3", "vitamin_c"):
+        reader.section(name)
+
+    guidelines = Guidelines(
+        iron=IronRules(
+            baseline_hgb_increase=reader.number("iron", "baseline_hgb_increase"),
+            ckd_absorption_factor=reader.number("iron", "ckd_absorption_factor", maximum=1.0),
+            inflammation_factor=reader.number("iron", "inflammation_factor", maximum=1.0),
+        ),
+        vitamin_d=VitaminDRules(
+            increase_per_1000iu=reader.number("vitamin_d", "increase_per_1000iu"),
+            upper_limit_iu=reader.number("vitamin_d", "upper_limit_iu"),
+            upper_limit_label=reader.label("vitamin_d", "upper_limit_iu"),
+        ),
+        calcium=CalciumRules(
+            fracture_risk_reduction=reader.number("calcium", "fracture_risk_reduction", maximum=1.0),
+        ),
+        omega3=Omega3Rules(
+            cvd_risk_reduction=reader.number("omega3", "cvd_risk_reduction", maximum=1.0),
+        ),
+        vitamin_c=_vitamin_c_rules(reader),
+    )
+    return guidelines, reader.errors
@@ -1,23 +1,97 @@
 from __future__ import annotations
 
-from fastapi import FastAPI
+import os
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import Annotated, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Type, TypeVar, Union
+
+import numpy as np
+import pandas as pd
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, BeforeValidator, ValidationError
 
-from .model_registry import ModelRegistry
-from .predictors import ImmunePredictor, NutritionPredictor
+from .batching import MicroBatcher, QueueFullError
+from .cache import PredictionCache
+from .cohort import Cohort, CohortRegistry, build_cohort, refresh_cohort, update_cohort
+from .columnar import (
+    MEDIA_TYPES,
+    WIRE_FORMATS,
+    ColumnValidationError,
+    OutputFormat,
+    WireFormat,
+    json_only,
+    missing_dependency,
+    output_format,
+    pack,
+    read_json_columns,
+    read_table,
+    records_table,
+    resident_ids,
+    unpack,
+    validate_columns,
+    wire_format,
+    write_arrow,
+    write_table,
+)
+from .encoding import FastJSONResponse, immune_response, items_body, ndjson_lines
+from .features import IMMUNE_RR_COLUMNS
+from .metrics import PROMETHEUS_MEDIA_TYPE, Metrics, MetricsMiddleware, TimedRoute
+from .model_registry import ArtifactLoadError, ModelRegistry
+from .pool import InferencePool
+from .predictors import ImmunePredictor, ImmuneScores, NutritionPredictor
 from .schemas import (
+    ImmuneCohortItem,
+    ImmuneCohortRequest,
+    ImmuneEnvironmentRequest,
+    ImmuneFeatures,
     ImmunePredictBatchRequest,
     ImmunePredictRequest,
     ImmunePredictResponse,
+    NutritionIntervention,
+    NutritionOptimizeRequest,
+    NutritionPatient,
+    NutritionSimBatchRequest,
     NutritionSimRequest,
     NutritionSimResponse,
+    NutritionSweepRequest,
 )
+from .store import ResultStore
+from .watcher import ArtifactWatcher
+
+
+Payload = TypeVar("Payload", bound=BaseModel)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    # Runs once per worker process, after any fork, so each worker's load
+    # happens in its own address space (sharing mmap-ed pages via the OS).
+    if MODEL_PRELOAD == "startup":
+        await run_in_threadpool(registry.ensure_loaded)
+    elif MODEL_PRELOAD == "background":
+        registry.reload_in_background()
+    if artifact_watcher is not None:
+        artifact_watcher.start()
+    yield
+    if artifact_watcher is not None:
+        artifact_watcher.stop()
+    if immune_batcher is not None:
+        await immune_batcher.stop()
+    if inference_pool is not None:
+        await run_in_threadpool(inference_pool.shutdown)
+    if result_store is not None:
+        result_store.close()
 
 
 app = FastAPI(
     title="Immune/Nutrition Model Backend",
     version="1.0.0",
     description="Backend service for DIVS immune and integrated nutrition model inference.",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -28,9 +102,258 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-registry = ModelRegistry()
-immune_predictor = ImmunePredictor(registry)
-nutrition_predictor = NutritionPredictor(registry)
+IMMUNE_STREAM_CHUNK_SIZE = 1000
+IMMUNE_MICROBATCH_ENABLED = os.getenv("IMMUNE_MICROBATCH_ENABLED", "0").lower() in {"1", "true", "yes"}
+MODEL_WATCH_INTERVAL_S = float(os.getenv("MODEL_WATCH_INTERVAL_S", "0"))
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "lazy").lower()
+IMMUNE_CACHE_SIZE = int(os.getenv("IMMUNE_CACHE_SIZE", "16384"))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0").lower() in {"1", "true", "yes"}
+IMMUNE_RESULT_STORE = os.getenv("IMMUNE_RESULT_STORE", "")
+IMMUNE_COHORT_LIMIT = int(os.getenv("IMMUNE_COHORT_LIMIT", "16"))
+# Endpoints listed here encode responses straight to JSON bytes instead of
+# validating and serializing pydantic models; the output bytes are the same.
+FAST_JSON_ENDPOINTS = frozenset(
+    name.strip() for name in os.getenv("FAST_JSON_ENDPOINTS", "immune.predict,immune.batch").split(",") if name.strip()
+)
+
+# Disabled metrics install nothing: no middleware, no route wrapper, and the
+# predictors' stage timers reduce to a None check.
+metrics: Optional[Metrics] = Metrics() if METRICS_ENABLED else None
+if metrics is not None:
+    app.router.route_class = TimedRoute
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+registry = ModelRegistry(
+    # A file the watcher picks up may have been overwritten in place, which
+    # changes arrays live snapshots still map; with it on, mapping is opt-in.
+    mmap_mode=os.getenv("MODEL_MMAP_MODE", "" if MODEL_WATCH_INTERVAL_S > 0 else "r") or None,
+    compile_trees=os.getenv("MODEL_COMPILE_TREES", "1").lower() in {"1", "true", "yes"},
+)
+immune_cache: Optional[PredictionCache] = (
+    PredictionCache(IMMUNE_CACHE_SIZE, ttl_s=float(os.getenv("IMMUNE_CACHE_TTL_S", "0")))
+    if IMMUNE_CACHE_SIZE > 0
+    else None
+)
+inference_pool: Optional[InferencePool] = (
+    InferencePool(
+        registry.project_root,
+        INFERENCE_WORKERS,
+        mmap_mode=registry.mmap_mode,
+        min_rows=int(os.getenv("INFERENCE_MIN_ROWS", "4096")),
+        shard_rows=int(os.getenv("INFERENCE_SHARD_ROWS", "2048")),
+        start_method=os.getenv("INFERENCE_START_METHOD", "spawn"),
+    )
+    if INFERENCE_WORKERS > 0
+    else None
+)
+result_store: Optional[ResultStore] = ResultStore(Path(IMMUNE_RESULT_STORE)) if IMMUNE_RESULT_STORE else None
+immune_predictor = ImmunePredictor(registry, immune_cache, inference_pool, metrics, result_store)
+nutrition_predictor = NutritionPredictor(registry, metrics)
+registry.register_warmup(immune_predictor.warm_up)
+registry.register_warmup(nutrition_predictor.warm_up)
+if inference_pool is not None:
+    registry.register_warmup(inference_pool.warm_up)
+cohorts = CohortRegistry(IMMUNE_COHORT_LIMIT)
+artifact_watcher: Optional[ArtifactWatcher] = (
+    ArtifactWatcher(registry, MODEL_WATCH_INTERVAL_S) if MODEL_WATCH_INTERVAL_S > 0 else None
+)
+
+
+def _predict_immune_items(items: List[ImmunePredictRequest]) -> List[ImmunePredictResponse]:
+    return immune_predictor.predict_batch([(item.resident_id, item.features) for item in items])
+
+
+immune_batcher: Optional[MicroBatcher[ImmunePredictRequest, ImmunePredictResponse]] = (
+    MicroBatcher(
+        _predict_immune_items,
+        window_ms=float(os.getenv("IMMUNE_MICROBATCH_WINDOW_MS", "2")),
+        max_batch_size=int(os.getenv("IMMUNE_MICROBATCH_MAX_BATCH", "64")),
+        max_queue=int(os.getenv("IMMUNE_MICROBATCH_MAX_QUEUE", "1024")),
+    )
+    if IMMUNE_MICROBATCH_ENABLED
+    else None
+)
+
+
+@app.exception_handler(ColumnValidationError)
+def column_validation_error(_: Request, exc: ColumnValidationError) -> JSONResponse:
+    return JSONResponse(status_code=422, content={"detail": exc.errors, "error_count": exc.error_count})
+
+
+def _read_upload(body: bytes, content_type: Optional[str]) -> pd.DataFrame:
+    try:
+        return read_table(body, content_type)
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=f"could not read upload: {exc}") from exc
+
+
+# Batch endpoints keep their JSON body schema and also take Arrow IPC streams
+# and MessagePack; FastAPI passes those through as bytes (see json_only).
+WIRE_REQUEST_BODY = {
+    "requestBody": {
+        "content": {MEDIA_TYPES[fmt]: {"schema": {"type": "string", "format": "binary"}} for fmt in WIRE_FORMATS}
+    }
+}
+
+
+async def _request_body(request: Request) -> bytes:
+    # Starlette caches the body FastAPI already read, so this is not a second read.
+    return await request.body()
+
+
+def _wire_formats(
+    request: Request, payload: Optional[BaseModel]
+) -> Tuple[Optional[WireFormat], Optional[WireFormat]]:
+    # (request format, response format); None means JSON.
+    content = wire_format(request.headers.get("content-type"))
+    if payload is None and content is None:
+        raise HTTPException(status_code=415, detail=f"send JSON, {MEDIA_TYPES['arrow']} or {MEDIA_TYPES['msgpack']}")
+    accept = wire_format(request.headers.get("accept"))
+    _require_format(content, 415)
+    _require_format(accept, 406)
+    return content, accept
+
+
+def _require_format(fmt: Optional[OutputFormat], status_code: int) -> None:
+    missing = missing_dependency(fmt) if fmt is not None else None
+    if fmt is not None and missing is not None:
+        raise HTTPException(status_code=status_code, detail=f"{MEDIA_TYPES[fmt]} needs the {missing} package")
+
+
+def _file_format(request: Request, requested: Optional[OutputFormat]) -> OutputFormat:
+    _require_format(wire_format(request.headers.get("content-type")), 415)
+    fmt = output_format(request.headers.get("accept"), requested)
+    _require_format(fmt, 406)
+    return fmt
+
+
+def _unpack_payload(body: bytes, model: Type[Payload]) -> Payload:
+    try:
+        data = unpack(body)
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=f"could not read MessagePack body: {exc}") from exc
+    try:
+        return model.model_validate(data)
+    except ValidationError as exc:
+        # Same 422 body FastAPI gives for an invalid JSON payload.
+        errors = [{**error, "loc": ("body", *error["loc"])} for error in exc.errors(include_url=False)]
+        raise RequestValidationError(errors) from exc
+
+
+def _batch_payload(payload: Optional[Payload], body: bytes, model: Type[Payload]) -> Payload:
+    # The JSON body FastAPI validated, or the same document sent as MessagePack.
+    return payload if payload is not None else _unpack_payload(body, model)
+
+
+def _store_counts(scores: ImmuneScores) -> Dict[str, int]:
+    return {"scored": scores.scored, "reused": scores.reused}
+
+
+def _store_headers(scores: ImmuneScores) -> Dict[str, str]:
+    return {"X-Immune-Scored": str(scores.scored), "X-Immune-Reused": str(scores.reused)}
+
+
+def _stream_scores(
+    scores: ImmuneScores, ids: List[Optional[str]], include_features: bool, fast: bool
+) -> Iterator[bytes]:
+    for start in range(0, len(scores), IMMUNE_STREAM_CHUNK_SIZE):
+        chunk = scores.take(start, start + IMMUNE_STREAM_CHUNK_SIZE)
+        chunk_ids = ids[start : start + IMMUNE_STREAM_CHUNK_SIZE]
+        if fast:
+            yield ndjson_lines(immune_predictor.batch_json(chunk, chunk_ids, include_features))
+            continue
+        responses = immune_predictor.batch_responses(chunk, chunk_ids, include_features)
+        yield "".join(response.model_dump_json() + "\n" for response in responses).encode("utf-8")
+
+
+def _stream_immune_batch(
+    items: List[ImmunePredictRequest], include_features: bool, fast: bool
+) -> Iterator[bytes]:
+    for start in range(0, len(items), IMMUNE_STREAM_CHUNK_SIZE):
+        chunk = [(item.resident_id, item.features) for item in items[start : start + IMMUNE_STREAM_CHUNK_SIZE]]
+        if fast:
+            yield ndjson_lines(immune_predictor.predict_batch_json(chunk, include_features))
+            continue
+        responses = immune_predictor.predict_batch(chunk, include_features)
+        yield "".join(response.model_dump_json() + "\n" for response in responses).encode("utf-8")
+
+
+def _score_immune_frame(frame: pd.DataFrame) -> Tuple[ImmuneScores, List[Optional[str]]]:
+    columns = validate_columns(frame, ImmuneFeatures)
+    ids = resident_ids(frame)
+    scores = immune_predictor.score_inputs(immune_predictor.input_matrix_from_columns(columns), resident_ids=ids)
+    return scores, ids
+
+
+def _score_immune_file(body: bytes, content_type: Optional[str], fmt: OutputFormat) -> Response:
+    scores, ids = _score_immune_frame(_read_upload(body, content_type))
+    content, media_type = write_table(scores.frame(ids), fmt)
+    headers = _store_headers(scores) if result_store is not None else None
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+def _immune_scores_response(
+    scores: ImmuneScores, ids: List[Optional[str]], accept: str, include_features: bool
+) -> Response:
+    if result_store is None:
+        headers, counts = None, None
+    else:
+        headers, counts = _store_headers(scores), _store_counts(scores)
+    fmt = wire_format(accept)
+    if fmt == "arrow":
+        # Typed columns, one per response field and (optionally) feature.
+        content, media_type = write_table(scores.frame(ids, include_features), fmt)
+        return Response(content=content, media_type=media_type, headers=headers)
+    if fmt == "msgpack":
+        body = pack({"items": scores.records(ids, include_features), **(counts or {})})
+        return Response(content=body, media_type=MEDIA_TYPES[fmt], headers=headers)
+    items = immune_predictor.batch_json(scores, ids, include_features)
+    if MEDIA_TYPES["ndjson"] in accept:
+        return Response(content=ndjson_lines(items), media_type=MEDIA_TYPES["ndjson"], headers=headers)
+    return FastJSONResponse(items_body(items, counts), headers=headers)
+
+
+def _score_immune_columns(body: bytes, accept: str, include_features: bool) -> Response:
+    try:
+        frame = read_json_columns(body)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"could not read columns: {exc}") from exc
+    scores, ids = _score_immune_frame(frame)
+    return _immune_scores_response(scores, ids, accept, include_features)
+
+
+@contextmanager
+def _cohort(name: str) -> Iterator[Cohort]:
+    # Yields with the cohort's lock held.
+    with cohorts.locked(name) as cohort:
+        if cohort is None:
+            raise HTTPException(status_code=404, detail=f"unknown cohort {name!r}; post its roster first")
+        yield cohort
+
+
+def _cohort_body(cohort: Cohort, groups: List[dict]) -> dict:
+    return {
+        "cohort": cohort.name,
+        "group_by": cohort.group_by,
+        "model_generation": cohort.generation,
+        "residents": len(cohort),
+        "groups": groups,
+    }
+
+
+def _nutrition_columns(frame: pd.DataFrame) -> Dict[str, np.ndarray]:
+    columns = validate_columns(frame, NutritionPatient)
+    columns.update(validate_columns(frame, NutritionIntervention))
+    return columns
+
+
+def _score_nutrition_file(body: bytes, content_type: Optional[str], fmt: OutputFormat) -> Response:
+    # Same engine and values as /api/nutrition/simulate, one row per patient.
+    frame = _read_upload(body, content_type)
+    responses = nutrition_predictor.simulate_columns(_nutrition_columns(frame))
+    content, media_type = write_table(NutritionPredictor.responses_frame(responses, resident_ids(frame)), fmt)
+    return Response(content=content, media_type=media_type)
 
 
 @app.get("/")
@@ -40,27 +363,209 @@ def root() -> dict:
 
 @app.get("/api/health")
 def health() -> dict:
-    return {"status": "ok", "models": registry.status()}
+    return {
+        "status": "ok",
+        "models": registry.status(),
+        "microbatch": immune_batcher.status() if immune_batcher is not None else {"enabled": False},
+        "immune_cache": immune_cache.status() if immune_cache is not None else {"enabled": False},
+        "inference_pool": inference_pool.status() if inference_pool is not None else {"enabled": False},
+        "result_store": result_store.status() if result_store is not None else {"enabled": False},
+        "cohorts": cohorts.status(),
+        "watcher": artifact_watcher.status() if artifact_watcher is not None else {"enabled": False},
+    }
+
+
+@app.get("/metrics")
+def prometheus_metrics() -> Response:
+    if metrics is None:
+        raise HTTPException(status_code=503, detail="metrics are disabled; set METRICS_ENABLED=1")
+    return Response(content=metrics.render(), media_type=PROMETHEUS_MEDIA_TYPE)
+
+
+@app.post("/api/admin/warm-up")
+def warm_up_models() -> dict:
+    registry.ensure_loaded()
+    return {"status": "loaded", "models": registry.status()}
 
 
 @app.post("/api/admin/reload-models")
-def reload_models() -> dict:
-    registry.reload()
-    return {"status": "reloaded", "models": registry.status()}
+def reload_models(response: Response, wait: bool = False, changed_only: bool = False) -> dict:
+    if wait:
+        try:
+            refreshed = (registry.refresh() if changed_only else registry.reload()) is not None
+        except ArtifactLoadError as exc:
+            raise HTTPException(status_code=409, detail=str(exc)) from exc
+        return {"status": "reloaded" if refreshed else "unchanged", "models": registry.status()}
+    started = registry.reload_in_background(incremental=changed_only)
+    response.status_code = 202
+    return {"status": "reloading" if started else "already-reloading", "models": registry.status()}
 
 
 @app.post("/api/immune/predict", response_model=ImmunePredictResponse)
-def predict_immune(payload: ImmunePredictRequest) -> ImmunePredictResponse:
-    return immune_predictor.predict(payload.resident_id, payload.features)
+async def predict_immune(payload: ImmunePredictRequest) -> Union[ImmunePredictResponse, Response]:
+    if immune_batcher is None:
+        result = await run_in_threadpool(immune_predictor.predict, payload.resident_id, payload.features)
+    else:
+        try:
+            result = await immune_batcher.submit(payload)
+        except QueueFullError as exc:
+            raise HTTPException(status_code=503, detail=str(exc)) from exc
+    if "immune.predict" in FAST_JSON_ENDPOINTS:
+        return FastJSONResponse(immune_response(result).encode("utf-8"))
+    return result
 
 
-@app.post("/api/immune/predict/batch")
-def predict_immune_batch(payload: ImmunePredictBatchRequest) -> dict:
-    items = [immune_predictor.predict(item.resident_id, item.features) for item in payload.items]
+@app.post("/api/immune/predict/batch", response_model=None, openapi_extra=WIRE_REQUEST_BODY)
+def predict_immune_batch(
+    payload: Annotated[Optional[ImmunePredictBatchRequest], BeforeValidator(json_only)],
+    request: Request,
+    response: Response,
+    include_features: bool = True,
+    body: bytes = Depends(_request_body),
+) -> Union[dict, Response]:
+    content, accept = _wire_formats(request, payload)
+    if content == "arrow":
+        # One column per ImmuneFeatures field plus resident_id, validated
+        # column-wise straight into the input matrix.
+        scores, ids = _score_immune_frame(_read_upload(body, MEDIA_TYPES["arrow"]))
+        return _immune_scores_response(scores, ids, request.headers.get("accept", ""), include_features)
+    payload = _batch_payload(payload, body, ImmunePredictBatchRequest)
+    if accept is not None:
+        ids = [item.resident_id for item in payload.items]
+        scores = immune_predictor.score_batch([item.features for item in payload.items], ids)
+        return _immune_scores_response(scores, ids, request.headers.get("accept", ""), include_features)
+    fast = "immune.batch" in FAST_JSON_ENDPOINTS
+    ndjson = MEDIA_TYPES["ndjson"] in request.headers.get("accept", "")
+    if result_store is not None:
+        # The counts go in headers and body, so the whole batch is scored
+        # before anything is sent; streaming then only chunks the encoding.
+        ids = [item.resident_id for item in payload.items]
+        scores = immune_predictor.score_batch([item.features for item in payload.items], ids)
+        headers = _store_headers(scores)
+        if ndjson:
+            return StreamingResponse(
+                _stream_scores(scores, ids, include_features, fast), media_type=MEDIA_TYPES["ndjson"], headers=headers
+            )
+        if fast:
+            encoded = items_body(immune_predictor.batch_json(scores, ids, include_features), _store_counts(scores))
+            return FastJSONResponse(encoded, headers=headers)
+        response.headers.update(headers)
+        return {"items": immune_predictor.batch_responses(scores, ids, include_features), **_store_counts(scores)}
+    if ndjson:
+        return StreamingResponse(
+            _stream_immune_batch(payload.items, include_features, fast), media_type=MEDIA_TYPES["ndjson"]
+        )
+    pairs = [(item.resident_id, item.features) for item in payload.items]
+    if fast:
+        return FastJSONResponse(items_body(immune_predictor.predict_batch_json(pairs, include_features)))
+    items = immune_predictor.predict_batch(pairs, include_features)
     return {"items": items}
 
 
+@app.post("/api/immune/predict/columns")
+async def predict_immune_columns(request: Request, include_features: bool = True) -> Response:
+    body = await request.body()
+    return await run_in_threadpool(
+        _score_immune_columns, body, request.headers.get("accept", ""), include_features
+    )
+
+
+@app.post("/api/immune/predict/file")
+async def predict_immune_file(
+    request: Request, fmt: Optional[OutputFormat] = Query(None, alias="format")
+) -> Response:
+    body = await request.body()
+    fmt = _file_format(request, fmt)
+    return await run_in_threadpool(_score_immune_file, body, request.headers.get("content-type"), fmt)
+
+
+@app.post("/api/immune/environment")
+def rescore_immune_environment(payload: ImmuneEnvironmentRequest) -> Response:
+    if result_store is None:
+        raise HTTPException(status_code=503, detail="environment rescoring needs IMMUNE_RESULT_STORE")
+    environment = payload.environment
+    rr_factors = np.array([getattr(environment, name) for name in IMMUNE_RR_COLUMNS], dtype=np.float64)
+    scores, found, missing = immune_predictor.rescore_environment(payload.resident_ids, rr_factors)
+    items = immune_predictor.batch_json(scores, found, include_features=False)
+    return FastJSONResponse(items_body(items, {"missing": missing}))
+
+
+@app.post("/api/immune/cohort")
+def immune_cohort(payload: ImmuneCohortRequest) -> dict:
+    cohort, scores = build_cohort(immune_predictor, payload)
+    with cohort.lock:
+        body = _cohort_body(cohort, cohort.summary())
+    cohorts.put(cohort)
+    return {**body, "scored": scores.scored, "reused": scores.reused}
+
+
+@app.get("/api/immune/cohort/{name}")
+def immune_cohort_summary(name: str) -> dict:
+    with _cohort(name) as cohort:
+        refresh_cohort(immune_predictor, cohort)
+        return _cohort_body(cohort, cohort.summary())
+
+
+@app.post("/api/immune/cohort/{name}/residents")
+def update_immune_cohort(name: str, payload: ImmuneCohortItem) -> dict:
+    # Answers only the groups the resident left or joined, unless a model
+    # reload forced the whole roster to be rescored.
+    with _cohort(name) as cohort:
+        changed = update_cohort(immune_predictor, cohort, payload)
+        return {**_cohort_body(cohort, cohort.summary(changed)), "partial": changed is not None}
+
+
 @app.post("/api/nutrition/simulate", response_model=NutritionSimResponse)
 def simulate_nutrition(payload: NutritionSimRequest) -> NutritionSimResponse:
     return nutrition_predictor.simulate(payload.patient, payload.intervention)
 
+
+@app.post("/api/nutrition/simulate/batch", response_model=None, openapi_extra=WIRE_REQUEST_BODY)
+def simulate_nutrition_batch(
+    payload: Annotated[Optional[NutritionSimBatchRequest], BeforeValidator(json_only)],
+    request: Request,
+    body: bytes = Depends(_request_body),
+) -> Union[dict, Response]:
+    content, accept = _wire_formats(request, payload)
+    if content == "arrow":
+        # Patient and intervention fields side by side, one row per item.
+        items = nutrition_predictor.simulate_columns(_nutrition_columns(_read_upload(body, MEDIA_TYPES["arrow"])))
+    else:
+        payload = _batch_payload(payload, body, NutritionSimBatchRequest)
+        items = nutrition_predictor.simulate_batch([(item.patient, item.intervention) for item in payload.items])
+    if accept is None:
+        return {"items": items}
+    records = [item.model_dump() for item in items]
+    if accept == "arrow":
+        encoded = write_arrow(records_table(records, NutritionSimResponse))
+    else:
+        encoded = pack({"items": records})
+    return Response(content=encoded, media_type=MEDIA_TYPES[accept])
+
+
+@app.post("/api/nutrition/sweep")
+def sweep_nutrition(payload: NutritionSweepRequest) -> dict:
+    grid = {name: axis.points() for name, axis in payload.grid.items()}
+    return nutrition_predictor.sweep(payload.patient, payload.intervention, grid)
+
+
+@app.post("/api/nutrition/optimize")
+def optimize_nutrition(payload: NutritionOptimizeRequest) -> dict:
+    grid = {name: axis.points() for name, axis in payload.grid.items()}
+    return nutrition_predictor.optimize(
+        payload.patient,
+        payload.intervention,
+        grid,
+        payload.targets,
+        max_evaluations=payload.max_evaluations,
+        max_seconds=payload.max_seconds,
+    )
+
+
+@app.post("/api/nutrition/simulate/file")
+async def simulate_nutrition_file(
+    request: Request, fmt: Optional[OutputFormat] = Query(None, alias="format")
+) -> Response:
+    body = await request.body()
+    fmt = _file_format(request, fmt)
+    return await run_in_threadpool(_score_nutrition_file, body, request.headers.get("content-type"), fmt)
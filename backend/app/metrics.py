@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from inspect import iscoroutinefunction
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; fine-grained at the low end because single-row stages take microseconds.
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+FAMILIES: Dict[str, Tuple[str, str]] = {
+    "stage_seconds": ("histogram", "Time spent in each inference stage, by model."),
+    "http_stage_seconds": ("histogram", "Request time split into validation, handler, render and total."),
+    "http_requests_total": ("counter", "Requests answered, by route and status code."),
+    "predictions_total": ("counter", "Rows scored, by model and result source."),
+    "model_errors_total": ("counter", "Model calls that raised and were answered by the fallback instead."),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("counts", "total")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+
+
+class Metrics:
+    def __init__(self, namespace: str = "model_backend") -> None:
+        self.namespace = namespace
+        self._lock = Lock()
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+
+    def lap(self, model: str, stage: str, started: float) -> float:
+        # Records the stage that began at `started` and returns the current
+        # time, so consecutive stages can be chained.
+        now = time.perf_counter()
+        self.observe("stage_seconds", (("model", model), ("stage", stage)), now - started)
+        return now
+
+    def count_source(self, model: str, source: str, rows: int) -> None:
+        self.count("predictions_total", (("model", model), ("source", source)), rows)
+
+    def count_error(self, model: str, exc: BaseException) -> None:
+        self.count("model_errors_total", (("model", model), ("error", type(exc).__name__)))
+
+    def observe(self, name: str, labels: Labels, seconds: float) -> None:
+        # le is inclusive in Prometheus, so a value equal to a bound lands in that bucket.
+        index = bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = Histogram()
+            histogram.counts[index] += 1
+            histogram.total += seconds
+
+    def count(self, name: str, labels: Labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0.0) + amount
+
+    def render(self) -> str:
+        with self._lock:
+            histograms = {key: (list(value.counts), value.total) for key, value in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines: List[str] = []
+        for family, (kind, description) in FAMILIES.items():
+            name = f"{self.namespace}_{family}"
+            if kind == "histogram":
+                series = sorted((labels, values) for (key, labels), values in histograms.items() if key == family)
+            else:
+                series = sorted((labels, value) for (key, labels), value in counters.items() if key == family)
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, values in series:
+                if kind == "counter":
+                    lines.append(f"{name}{_labels(labels)} {_number(values)}")
+                    continue
+                counts, total = values
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+@dataclass
+class RequestTiming:
+    started: float
+    handler_started: float = 0.0
+    handler_finished: float = 0.0
+    response_started: float = 0.0
+    status: int = 0
+
+
+_REQUEST_TIMING: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def _timed_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    # FastAPI reads the signature through __wrapped__, so validation and
+    # dependency injection see the original endpoint. The timing object is
+    # shared by reference, so marks set in the threadpool reach the middleware.
+    if iscoroutinefunction(endpoint):
+
+        @wraps(endpoint)
+        async def run_async(*args: Any, **kwargs: Any) -> Any:
+            timing = _REQUEST_TIMING.get()
+            if timing is None:
+                return await endpoint(*args, **kwargs)
+            timing.handler_started = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                timing.handler_finished = time.perf_counter()
+
+        return run_async
+
+    @wraps(endpoint)
+    def run(*args: Any, **kwargs: Any) -> Any:
+        timing = _REQUEST_TIMING.get()
+        if timing is None:
+            return endpoint(*args, **kwargs)
+        timing.handler_started = time.perf_counter()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            timing.handler_finished = time.perf_counter()
+
+    return run
+
+
+class TimedRoute(APIRoute):
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+
+class MetricsMiddleware:
+    # Splits each request into validation (body read, parsing and pydantic
+    # validation up to the endpoint call), handler, and render (response model
+    # serialization up to the first response byte).
+    def __init__(self, app: ASGIApp, metrics: Metrics) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming(started=time.perf_counter())
+        token = _REQUEST_TIMING.set(timing)
+
+        async def send_timed(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                timing.response_started = time.perf_counter()
+                timing.status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            _REQUEST_TIMING.reset(token)
+            self._record(scope, timing, time.perf_counter())
+
+    def _record(self, scope: Scope, timing: RequestTiming, finished: float) -> None:
+        # Template paths only: raw URLs would give every resident id its own series.
+        route = getattr(scope.get("route"), "path", None) or "unmatched"
+        metrics = self.metrics
+        metrics.count("http_requests_total", (("route", route), ("status", str(timing.status or 500))))
+        metrics.observe("http_stage_seconds", (("route", route), ("stage", "total")), finished - timing.started)
+        if not timing.handler_started:
+            return
+        stages = (
+            ("validation", timing.handler_started - timing.started),
+            ("handler", timing.handler_finished - timing.handler_started),
+        )
+        if timing.response_started >= timing.handler_finished:
+            stages += (("render", timing.response_started - timing.handler_finished),)
+        for name, seconds in stages:
+            metrics.observe("http_stage_seconds", (("route", route), ("stage", name)), seconds)
@@ -1,29 +1,88 @@
 from __future__ import annotations
 
+import hashlib
 import json
-from dataclasses import dataclass, field
+import time
+import warnings
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from threading import Lock
-from typing import Any, Dict, Optional
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import joblib
 
+from .features import AlbuminFeaturePipeline, ImmuneFeaturePipeline
+from .guidelines import Guidelines, compile_guidelines
+from .native import NativeModel, native_model
+from .trees import CompiledTrees, check_parity, compile_trees
 
-@dataclass
+
+HASH_CHUNK_SIZE = 1 << 20
+# Prefix of artifact keys built from size and mtime instead of a content hash.
+STAT_KEY_PREFIX = "stat:"
+ARTIFACT_FIELDS = {"immune": "immune_bundle", "albumin": "albumin_bundle", "guidelines": "guidelines"}
+
+
+class ArtifactLoadError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
 class LoadedArtifacts:
+    generation: int = 0
+    # The generation that last changed the immune artifact; the immune cache
+    # and result store key on it, so albumin or guideline reloads keep them.
+    immune_generation: int = 0
+    loaded_at: Optional[float] = None
     immune_bundle: Optional[Dict[str, Any]] = None
     albumin_bundle: Optional[Dict[str, Any]] = None
-    guidelines: Dict[str, Any] = field(default_factory=dict)
+    guidelines: Guidelines = field(default_factory=lambda: ModelRegistry.compiled_default_guidelines())
     errors: Dict[str, str] = field(default_factory=dict)
     paths: Dict[str, Optional[str]] = field(default_factory=dict)
+    hashes: Dict[str, Optional[str]] = field(default_factory=dict)
+    stat_keys: Dict[str, Optional[str]] = field(default_factory=dict)
+    load_seconds: Dict[str, float] = field(default_factory=dict)
+    changed: Tuple[str, ...] = ()
+    immune_pipeline: ImmuneFeaturePipeline = field(default_factory=ImmuneFeaturePipeline)
+    albumin_pipeline: AlbuminFeaturePipeline = field(default_factory=AlbuminFeaturePipeline)
+    immune_native: Optional[NativeModel] = None
+    albumin_compiled: Optional[CompiledTrees] = None
 
 
 class ModelRegistry:
-    def __init__(self, project_root: Optional[Path] = None) -> None:
+    def __init__(
+        self, project_root: Optional[Path] = None, mmap_mode: Optional[str] = "r", compile_trees: bool = True
+    ) -> None:
         self.project_root = project_root or Path(__file__).resolve().parents[2]
+        self.mmap_mode = mmap_mode
+        self.compile_trees = compile_trees
         self._lock = Lock()
-        self.artifacts = LoadedArtifacts(guidelines=self.default_guidelines())
-        self.reload()
+        self._thread_lock = Lock()
+        self._reload_thread: Optional[Thread] = None
+        self._warmups: List[Callable[[LoadedArtifacts], None]] = []
+        self.last_reload_error: Optional[str] = None
+        # Nothing is unpickled until the first request (or an explicit
+        # ensure_loaded() warm-up) needs the artifacts.
+        self._artifacts: Optional[LoadedArtifacts] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._artifacts is not None
+
+    @property
+    def artifacts(self) -> LoadedArtifacts:
+        artifacts = self._artifacts
+        if artifacts is None:
+            artifacts = self.ensure_loaded()
+        return artifacts
+
+    def ensure_loaded(self) -> LoadedArtifacts:
+        with self._lock:
+            if self._artifacts is None:
+                artifacts, _ = self._load_artifacts(1)
+                self._warm_up(artifacts)
+                self._artifacts = artifacts
+            return self._artifacts
 
     @staticmethod
     def default_guidelines() -> Dict[str, Any]:
@@ -51,6 +110,10 @@ class ModelRegistry:
             },
         }
 
+    @classmethod
+    def compiled_default_guidelines(cls) -> Guidelines:
+        return compile_guidelines(cls.default_guidelines())[0]
+
     def _first_existing(self, *paths: Path) -> Optional[Path]:
         for path in paths:
             if path.exists():
@@ -58,79 +121,306 @@ class ModelRegistry:
         return None
 
     def _load_joblib_bundle(self, path: Path) -> Dict[str, Any]:
-        loaded = joblib.load(path)
+        # Memory-mapping lets worker processes share the pages of large numpy
+        # arrays; joblib ignores it (with a warning) for compressed dumps.
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message=".*mmap_mode.*", category=UserWarning)
+            loaded = joblib.load(path, mmap_mode=self.mmap_mode)
         if isinstance(loaded, dict):
             return loaded
         return {"model": loaded}
 
-    def reload(self) -> None:
-        with self._lock:
-            artifacts = LoadedArtifacts(guidelines=self.default_guidelines())
-            modeling_dir = self.project_root / "modeling"
-            artifacts_dir = modeling_dir / "artifacts"
-
-            immune_path = self._first_existing(
+    def _candidates(self) -> Dict[str, Tuple[Path, ...]]:
+        modeling_dir = self.project_root / "modeling"
+        artifacts_dir = modeling_dir / "artifacts"
+        return {
+            "immune": (
                 artifacts_dir / "divs_immune_model_v7.joblib",
                 artifacts_dir / "divs_immune_model_v7.pkl",
                 modeling_dir / "divs_immune_model_v7.joblib",
                 modeling_dir / "divs_immune_model_v7.pkl",
-            )
-            albumin_path = self._first_existing(
+            ),
+            "albumin": (
                 artifacts_dir / "albumin_predictor_improved.joblib",
                 artifacts_dir / "albumin_predictor_improved.pkl",
                 modeling_dir / "albumin_predictor_improved.joblib",
                 modeling_dir / "albumin_predictor_improved.pkl",
-            )
-            guideline_path = self._first_existing(
+            ),
+            "guidelines": (
                 artifacts_dir / "integrated_guidelines_v3.json",
                 modeling_dir / "integrated_guidelines_v3.json",
-            )
-
-            artifacts.paths = {
-                "immune": str(immune_path) if immune_path else None,
-                "albumin": str(albumin_path) if albumin_path else None,
-                "guidelines": str(guideline_path) if guideline_path else None,
-            }
+            ),
+        }
 
-            if immune_path:
+    def stat_signature(self) -> Tuple[Tuple[str, int, int], ...]:
+        signature = []
+        for options in self._candidates().values():
+            for path in options:
                 try:
-                    artifacts.immune_bundle = self._load_joblib_bundle(immune_path)
-                except Exception as exc:  # pragma: no cover
-                    artifacts.errors["immune"] = f"{exc}"
-            else:
-                artifacts.errors["immune"] = "immune artifact not found"
+                    stat = path.stat()
+                except OSError:
+                    continue
+                signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
 
-            if albumin_path:
-                try:
-                    artifacts.albumin_bundle = self._load_joblib_bundle(albumin_path)
-                except Exception as exc:  # pragma: no cover
-                    artifacts.errors["albumin"] = f"{exc}"
-            else:
-                artifacts.errors["albumin"] = "albumin artifact not found"
+    @staticmethod
+    def _stat_key(path: Path) -> str:
+        stat = path.stat()
+        return f"{STAT_KEY_PREFIX}{stat.st_size}:{stat.st_mtime_ns}"
 
-            if guideline_path:
-                try:
-                    with guideline_path.open("r", encoding="utf-8") as file:
-                        loaded = json.load(file)
-                    if isinstance(loaded, dict):
-                        artifacts.guidelines.update(loaded)
-                    else:
-                        artifacts.errors["guidelines"] = "guideline JSON must be an object"
-                except Exception as exc:  # pragma: no cover
-                    artifacts.errors["guidelines"] = f"{exc}"
-            else:
-                artifacts.errors["guidelines"] = "guideline file not found; default values loaded"
-
-            self.artifacts = artifacts
+    @staticmethod
+    def _content_hash(path: Path) -> str:
+        digest = hashlib.sha256()
+        with path.open("rb") as file:
+            for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _load_one(self, kind: str, path: Optional[Path]) -> Tuple[Any, Optional[str]]:
+        if kind == "guidelines":
+            defaults = self.compiled_default_guidelines()
+            if not path:
+                return defaults, "guideline file not found; default values loaded"
+            try:
+                with path.open("r", encoding="utf-8") as file:
+                    loaded = json.load(file)
+                if not isinstance(loaded, dict):
+                    return defaults, "guideline JSON must be an object"
+                guidelines, problems = compile_guidelines({**self.default_guidelines(), **loaded})
+                if problems:
+                    return defaults, f"invalid guidelines ({'; '.join(problems)}); default values loaded"
+                return guidelines, None
+            except Exception as exc:  # pragma: no cover
+                return defaults, f"{exc}"
+
+        if not path:
+            return None, f"{kind} artifact not found"
+        try:
+            return self._load_joblib_bundle(path), None
+        except Exception as exc:  # pragma: no cover
+            return None, f"{exc}"
+
+    def _load_artifacts(
+        self, generation: int, previous: Optional[LoadedArtifacts] = None
+    ) -> Tuple[LoadedArtifacts, List[str]]:
+        # With a previous snapshot, artifacts whose path and content hash are
+        # unchanged are carried over instead of being deserialized again.
+        # Without one, files are keyed by size and mtime: a cold start reads
+        # each artifact once, and only a refresh that sees a file's stat move
+        # reads it again to hash its content.
+        values: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        paths: Dict[str, Optional[str]] = {}
+        hashes: Dict[str, Optional[str]] = {}
+        stat_keys: Dict[str, Optional[str]] = {}
+        load_seconds: Dict[str, float] = {}
+        changed: List[str] = []
+
+        for kind, options in self._candidates().items():
+            path = self._first_existing(*options)
+            paths[kind] = str(path) if path else None
+            readable = True
+            try:
+                stat_keys[kind] = self._stat_key(path) if path else None
+                if (
+                    previous is not None
+                    and previous.paths.get(kind) == paths[kind]
+                    and previous.stat_keys.get(kind) == stat_keys[kind]
+                ):
+                    hashes[kind] = previous.hashes.get(kind)
+                elif previous is not None and path is not None:
+                    hashes[kind] = self._content_hash(path)
+                else:
+                    hashes[kind] = stat_keys[kind]
+            except OSError:
+                hashes[kind] = stat_keys[kind] = None
+                readable = False
+
+            if (
+                previous is not None
+                and readable
+                and previous.paths.get(kind) == paths[kind]
+                and previous.hashes.get(kind) == hashes[kind]
+            ):
+                values[kind] = getattr(previous, ARTIFACT_FIELDS[kind])
+                if kind in previous.errors:
+                    errors[kind] = previous.errors[kind]
+                load_seconds[kind] = previous.load_seconds.get(kind, 0.0)
+                continue
+
+            started = time.perf_counter()
+            values[kind], error = self._load_one(kind, path)
+            load_seconds[kind] = round(time.perf_counter() - started, 6)
+            if error is not None:
+                if previous is not None and path is not None and kind not in previous.errors:
+                    # A file that exists but no longer loads is usually still being
+                    # written; the live snapshot stays and the next change retries.
+                    raise ArtifactLoadError(f"{kind} artifact {path} did not load: {error}")
+                errors[kind] = error
+            changed.append(kind)
+
+        immune_bundle = values["immune"]
+        albumin_bundle = values["albumin"]
+        if previous is not None and "immune" not in changed:
+            immune_pipeline, immune_native = previous.immune_pipeline, previous.immune_native
+        else:
+            immune_pipeline = ImmuneFeaturePipeline((immune_bundle or {}).get("feature_names"))
+            immune_native = native_model((immune_bundle or {}).get("model"))
+        if previous is not None and "albumin" not in changed:
+            albumin_pipeline, albumin_compiled = previous.albumin_pipeline, previous.albumin_compiled
+            if "albumin_compiled" in previous.errors:
+                errors["albumin_compiled"] = previous.errors["albumin_compiled"]
+        else:
+            albumin_pipeline = AlbuminFeaturePipeline((albumin_bundle or {}).get("feature_names"))
+            albumin_compiled = self._compile_albumin((albumin_bundle or {}).get("model"), albumin_pipeline, errors)
+
+        artifacts = LoadedArtifacts(
+            generation=generation,
+            immune_generation=(
+                previous.immune_generation if previous is not None and "immune" not in changed else generation
+            ),
+            loaded_at=time.time(),
+            immune_bundle=immune_bundle,
+            albumin_bundle=albumin_bundle,
+            guidelines=values["guidelines"],
+            errors=errors,
+            paths=paths,
+            hashes=hashes,
+            stat_keys=stat_keys,
+            load_seconds=load_seconds,
+            changed=tuple(changed),
+            immune_pipeline=immune_pipeline,
+            albumin_pipeline=albumin_pipeline,
+            immune_native=immune_native,
+            albumin_compiled=albumin_compiled,
+        )
+        return artifacts, changed
+
+    def load_immune(self, content_hash: bool = False) -> LoadedArtifacts:
+        # Immune-only snapshot for processes that never simulate nutrition (the
+        # inference workers): no albumin load, tree compilation or parity check.
+        # The key is built the way the parent built its own (see _load_artifacts).
+        path = self._first_existing(*self._candidates()["immune"])
+        started = time.perf_counter()
+        stat_key = self._stat_key(path) if path else None
+        immune_hash = self._content_hash(path) if path and content_hash else stat_key
+        bundle, error = self._load_one("immune", path)
+        return LoadedArtifacts(
+            loaded_at=time.time(),
+            immune_bundle=bundle,
+            errors={"immune": error} if error is not None else {},
+            paths={"immune": str(path) if path else None},
+            hashes={"immune": immune_hash},
+            stat_keys={"immune": stat_key},
+            load_seconds={"immune": round(time.perf_counter() - started, 6)},
+            changed=("immune",),
+            immune_pipeline=ImmuneFeaturePipeline((bundle or {}).get("feature_names")),
+            immune_native=native_model((bundle or {}).get("model")),
+        )
+
+    def _compile_albumin(
+        self, model: Any, pipeline: AlbuminFeaturePipeline, errors: Dict[str, str]
+    ) -> Optional[CompiledTrees]:
+        # The flat arrays only replace the estimator after reproducing its
+        # predictions on generated rows; anything else keeps model.predict.
+        if model is None or not self.compile_trees:
+            return None
+        compiled = compile_trees(model)
+        if compiled is None:
+            return None
+        if compiled.n_features != len(pipeline.feature_names):
+            errors["albumin_compiled"] = f"{compiled.n_features} features, pipeline has {len(pipeline.feature_names)}"
+            return None
+        reason = check_parity(compiled, model)
+        if reason is not None:
+            errors["albumin_compiled"] = reason
+            return None
+        return compiled
+
+    def register_warmup(self, warmup: Callable[[LoadedArtifacts], None]) -> None:
+        self._warmups.append(warmup)
+
+    def _warm_up(self, artifacts: LoadedArtifacts) -> None:
+        for warmup in self._warmups:
+            try:
+                warmup(artifacts)
+            except Exception as exc:
+                artifacts.errors[f"warmup:{getattr(warmup, '__qualname__', warmup)}"] = f"{exc}"
+
+    def reload(self) -> LoadedArtifacts:
+        # The lock only serializes reloaders; readers keep using the current
+        # snapshot until the new one is loaded, warmed up and swapped in.
+        with self._lock:
+            current = self._artifacts
+            artifacts, _ = self._load_artifacts((current.generation if current else 0) + 1)
+            if current is not None and current.paths.get("immune") == artifacts.paths.get("immune"):
+                if current.stat_keys.get("immune") == artifacts.stat_keys.get("immune"):
+                    # Same file, so keep the key it already has (maybe a content hash).
+                    hashes = {**artifacts.hashes, "immune": current.hashes.get("immune")}
+                    artifacts = replace(artifacts, hashes=hashes, immune_generation=current.immune_generation)
+            self._warm_up(artifacts)
+            self._artifacts = artifacts
+        return artifacts
+
+    def refresh(self) -> Optional[LoadedArtifacts]:
+        # Incremental reload: only artifacts whose content hash changed are
+        # loaded again, and no new generation is published if none did.
+        with self._lock:
+            current = self._artifacts
+            if current is None:
+                return None
+            artifacts, changed = self._load_artifacts(current.generation + 1, previous=current)
+            if not changed:
+                return None
+            self._warm_up(artifacts)
+            self._artifacts = artifacts
+        return artifacts
+
+    def _reload_quietly(self, incremental: bool = False) -> None:
+        try:
+            self.refresh() if incremental else self.reload()
+            self.last_reload_error = None
+        except Exception as exc:  # pragma: no cover
+            self.last_reload_error = f"{exc}"
+
+    @property
+    def reloading(self) -> bool:
+        return self._reload_thread is not None and self._reload_thread.is_alive()
+
+    def reload_in_background(self, incremental: bool = False) -> bool:
+        with self._thread_lock:
+            if self.reloading:
+                return False
+            self._reload_thread = Thread(
+                target=self._reload_quietly, args=(incremental,), name="model-reload", daemon=True
+            )
+            self._reload_thread.start()
+            return True
 
     def status(self) -> Dict[str, Any]:
+        # Reporting must not trigger the lazy load.
+        artifacts = self._artifacts or LoadedArtifacts()
         return {
             "project_root": str(self.project_root),
+            "initialized": self.loaded,
+            "mmap_mode": self.mmap_mode,
+            "generation": artifacts.generation,
+            "immune_generation": artifacts.immune_generation,
+            "loaded_at": artifacts.loaded_at,
+            "reloading": self.reloading,
+            "last_reload_error": self.last_reload_error,
             "loaded": {
-                "immune_model": bool(self.artifacts.immune_bundle),
-                "albumin_model": bool(self.artifacts.albumin_bundle),
+                "immune_model": bool(artifacts.immune_bundle),
+                "albumin_model": bool(artifacts.albumin_bundle),
+            },
+            "native": {
+                "immune_model": artifacts.immune_native.kind if artifacts.immune_native else None,
+                "albumin_model": artifacts.albumin_compiled.kind if artifacts.albumin_compiled else None,
             },
-            "paths": self.artifacts.paths,
-            "errors": self.artifacts.errors,
+            "paths": artifacts.paths,
+            "hashes": artifacts.hashes,
+            "load_seconds": artifacts.load_seconds,
+            "changed": list(artifacts.changed),
+            "errors": artifacts.errors,
         }
 
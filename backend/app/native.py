@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class NativeModel:
+    kind: str
+    predict_positive: Callable[[np.ndarray], np.ndarray]
+
+
+def _xgboost_model(model: Any) -> Optional[NativeModel]:
+    if not hasattr(model, "get_booster") or getattr(model, "objective", None) != "binary:logistic":
+        return None
+    booster = model.get_booster()
+    best_iteration = getattr(model, "best_iteration", None)
+    iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+    missing = model.missing if model.missing is not None else np.nan
+
+    def predict_positive(matrix: np.ndarray) -> np.ndarray:
+        # XGBoost evaluates in float32 either way; passing it directly skips the
+        # wrapper's DataFrame conversion and feature-name validation.
+        data = np.ascontiguousarray(matrix, dtype=np.float32)
+        predicted = booster.inplace_predict(
+            data, iteration_range=iteration_range, missing=missing, validate_features=False
+        )
+        return np.asarray(predicted, dtype=np.float64)
+
+    return NativeModel(kind="xgboost", predict_positive=predict_positive)
+
+
+def _lightgbm_model(model: Any) -> Optional[NativeModel]:
+    if getattr(model, "n_classes_", None) != 2 or getattr(model, "objective_", None) != "binary":
+        return None
+    booster = model.booster_
+
+    def predict_positive(matrix: np.ndarray) -> np.ndarray:
+        # LightGBM compares against float64 thresholds, so keep float64 to stay
+        # identical to predict_proba on a DataFrame.
+        data = np.ascontiguousarray(matrix, dtype=np.float64)
+        return np.asarray(booster.predict(data), dtype=np.float64)
+
+    return NativeModel(kind="lightgbm", predict_positive=predict_positive)
+
+
+def native_model(model: Any) -> Optional[NativeModel]:
+    package = type(model).__module__.split(".", 1)[0]
+    try:
+        if package == "xgboost":
+            return _xgboost_model(model)
+        if package == "lightgbm":
+            return _lightgbm_model(model)
+    except Exception:
+        return None
+    return None
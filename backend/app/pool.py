@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .model_registry import STAT_KEY_PREFIX, LoadedArtifacts, ModelRegistry
+from .predictors import ImmunePredictor
+
+
+class StaleArtifactsError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class ShardTask:
+    block: str
+    rows: int
+    columns: int
+    start: int
+    stop: int
+    # The parent's generation and immune artifact hash travel with every shard;
+    # a worker holding other content refreshes before scoring.
+    generation: int
+    immune_hash: Optional[str]
+
+
+@dataclass
+class PoolStats:
+    batches: int = 0
+    shards: int = 0
+    rows: int = 0
+    fallbacks: int = 0
+    worker_reloads: int = 0
+    restarts: int = 0
+    total_s: float = 0.0
+
+
+_worker_predictor: Optional[ImmunePredictor] = None
+_worker_artifacts: Optional[LoadedArtifacts] = None
+
+
+def _load_worker_artifacts(immune_hash: Optional[str] = None) -> LoadedArtifacts:
+    # Workers only score the immune model, so they load that artifact alone and
+    # run the parent's warm-up on it before taking shards. The file is hashed
+    # only when the parent's key is a content hash.
+    global _worker_artifacts
+    if _worker_predictor is None:
+        raise StaleArtifactsError("worker registry is not initialized")
+    content_hash = immune_hash is not None and not immune_hash.startswith(STAT_KEY_PREFIX)
+    artifacts = _worker_predictor.registry.load_immune(content_hash)
+    _worker_predictor.warm_up(artifacts)
+    _worker_artifacts = artifacts
+    return artifacts
+
+
+def _init_worker(project_root: str, mmap_mode: Optional[str]) -> None:
+    global _worker_predictor
+    _worker_predictor = ImmunePredictor(ModelRegistry(Path(project_root), mmap_mode=mmap_mode, compile_trees=False))
+    try:
+        _load_worker_artifacts()
+    except Exception:
+        # An initializer error would break the whole pool; the first shard
+        # loads again and reports the failure for its batch instead.
+        pass
+
+
+def _worker_snapshot(task: ShardTask) -> Tuple[LoadedArtifacts, bool]:
+    artifacts = _worker_artifacts
+    if artifacts is not None and artifacts.hashes.get("immune") == task.immune_hash:
+        return artifacts, False
+    artifacts = _load_worker_artifacts(task.immune_hash)
+    if artifacts.hashes.get("immune") != task.immune_hash:
+        raise StaleArtifactsError(f"worker cannot load generation {task.generation}'s immune model")
+    return artifacts, True
+
+
+def _score_shard(task: ShardTask) -> Tuple[int, int, bool]:
+    artifacts, reloaded = _worker_snapshot(task)
+    model = (artifacts.immune_bundle or {}).get("model")
+    if model is None:
+        raise StaleArtifactsError("worker has no immune model")
+    # Workers inherit the parent's resource tracker, so attaching registers the
+    # same segment again and the parent's unlink() stays the only cleanup.
+    block = SharedMemory(name=task.block)
+    try:
+        matrix = np.ndarray((task.rows, task.columns), dtype=np.float64, buffer=block.buf)
+        output = np.ndarray((task.rows,), dtype=np.float64, buffer=block.buf, offset=matrix.nbytes)
+        output[task.start : task.stop] = _worker_predictor.predict_probabilities(  # type: ignore[union-attr]
+            model, matrix[task.start : task.stop], artifacts.immune_pipeline, artifacts.immune_native
+        )
+        del matrix, output
+    finally:
+        block.close()
+    return os.getpid(), task.stop - task.start, reloaded
+
+
+class InferencePool:
+    def __init__(
+        self,
+        project_root: Path,
+        workers: int,
+        mmap_mode: Optional[str] = "r",
+        min_rows: int = 4096,
+        shard_rows: int = 2048,
+        start_method: str = "spawn",
+    ) -> None:
+        self.project_root = project_root
+        self.workers = max(workers, 1)
+        self.mmap_mode = mmap_mode
+        self.min_rows = max(min_rows, 1)
+        self.shard_rows = max(shard_rows, 1)
+        self.start_method = start_method
+        self.stats = PoolStats()
+        self.last_error: Optional[str] = None
+        self._pids: Dict[int, int] = {}
+        self._lock = Lock()
+        self._immune_hash: Optional[str] = None
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=get_context(self.start_method),
+            initializer=_init_worker,
+            initargs=(str(self.project_root), self.mmap_mode),
+        )
+
+    def _shards(self, rows: int) -> List[Tuple[int, int]]:
+        size = max(self.shard_rows, math.ceil(rows / self.workers))
+        return [(start, min(start + size, rows)) for start in range(0, rows, size)]
+
+    def predict_probabilities(self, matrix: np.ndarray, artifacts: LoadedArtifacts) -> Optional[np.ndarray]:
+        # Returns None when the pool cannot serve the batch; the caller then
+        # scores in-process, so a pool failure never fails the request.
+        started = time.perf_counter()
+        executor = self._executor
+        rows, columns = matrix.shape
+        block = SharedMemory(create=True, size=max((rows * columns + rows) * 8, 1))
+        shared = np.ndarray((rows, columns), dtype=np.float64, buffer=block.buf)
+        output = np.ndarray((rows,), dtype=np.float64, buffer=block.buf, offset=shared.nbytes)
+        try:
+            shared[:] = matrix
+            shards = self._shards(rows)
+            futures = [
+                executor.submit(
+                    _score_shard,
+                    ShardTask(
+                        block.name, rows, columns, start, stop, artifacts.generation, artifacts.hashes.get("immune")
+                    ),
+                )
+                for start, stop in shards
+            ]
+            results = [future.result() for future in futures]
+            probabilities = output.copy()
+        except BrokenProcessPool as exc:
+            self._record_failure(exc)
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = self._new_executor()
+                    self.stats.restarts += 1
+            executor.shutdown(wait=False, cancel_futures=True)
+            return None
+        except Exception as exc:
+            self._record_failure(exc)
+            return None
+        finally:
+            del shared, output
+            block.close()
+            block.unlink()
+
+        with self._lock:
+            stats = self.stats
+            stats.batches += 1
+            stats.shards += len(shards)
+            stats.rows += rows
+            stats.total_s += time.perf_counter() - started
+            for pid, shard_rows, reloaded in results:
+                self._pids[pid] = self._pids.get(pid, 0) + shard_rows
+                stats.worker_reloads += int(reloaded)
+        return probabilities
+
+    def warm_up(self, artifacts: LoadedArtifacts) -> None:
+        # Registered as a registry warm-up. Workers load and warm the immune
+        # artifact in their initializer, so a new artifact gets a new executor
+        # whose workers start on it; the old one finishes its shards and exits.
+        immune_hash = artifacts.hashes.get("immune")
+        with self._lock:
+            if immune_hash == self._immune_hash:
+                return
+            previous, self._executor = self._executor, self._new_executor()
+            self._immune_hash = immune_hash
+        previous.shutdown(wait=False)
+
+    def _record_failure(self, exc: BaseException) -> None:
+        with self._lock:
+            self.stats.fallbacks += 1
+            self.last_error = f"{type(exc).__name__}: {exc}"
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def status(self) -> Dict[str, Any]:
+        stats = self.stats
+        return {
+            "enabled": True,
+            "workers": self.workers,
+            "start_method": self.start_method,
+            "min_rows": self.min_rows,
+            "shard_rows": self.shard_rows,
+            "batches": stats.batches,
+            "shards": stats.shards,
+            "rows": stats.rows,
+            "rows_per_worker": {str(pid): rows for pid, rows in self._pids.items()},
+            "worker_reloads": stats.worker_reloads,
+            "fallbacks": stats.fallbacks,
+            "restarts": stats.restarts,
+            "mean_batch_ms": round(stats.total_s / stats.batches * 1000.0, 3) if stats.batches else 0.0,
+            "last_error": self.last_error,
+        }
@@ -1,12 +1,27 @@
 from __future__ import annotations
 
-import math
-from typing import Any, Dict, Optional
+import time
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
 
-from .model_registry import ModelRegistry
+from .cache import PredictionCache, row_keys
+from .encoding import immune_items
+from .features import (
+    ALBUMIN_COLUMN_INDEX,
+    AlbuminFeaturePipeline,
+    IMMUNE_COLUMN_INDEX,
+    IMMUNE_COLUMNS,
+    ImmuneFeaturePipeline,
+    environment_rr_from_columns,
+    nutrition_columns,
+)
+from .guidelines import Guidelines
+from .metrics import Metrics
+from .model_registry import LoadedArtifacts, ModelRegistry
+from .native import NativeModel
 from .schemas import (
     ImmuneFeatures,
     ImmunePredictResponse,
@@ -14,7 +29,14 @@ from .schemas import (
     NutritionPatient,
     NutritionResult,
     NutritionSimResponse,
+    NutritionTargets,
 )
+from .store import FALLBACK_MODEL_HASH, ResultStore, input_digests
+from .trees import CompiledTrees
+
+
+if TYPE_CHECKING:
+    from .pool import InferencePool
 
 
 def _clamp(value: float, minimum: float, maximum: float) -> float:
@@ -31,88 +53,293 @@ def _risk_level_from_divs(divs_score: float) -> str:
     return "low"
 
 
-class ImmunePredictor:
-    def __init__(self, registry: ModelRegistry) -> None:
-        self.registry = registry
+RISK_LEVELS = np.array(["critical", "high", "moderate", "low"])
+RISK_LEVEL_EDGES = np.array([30.0, 50.0, 70.0])
+ENV_RR_INDEX = IMMUNE_COLUMN_INDEX["ENV_RR"]
 
-    def _base_features(self, features: ImmuneFeatures) -> Dict[str, float]:
-        gender_value = 1.0 if features.gender in {"M", "남"} else 0.0
-        return {
-            "AGE": float(features.age),
-            "GENDER": gender_value,
-            "DEMENTIA_YN": float(features.dementia_yn),
-            "PARKINSON_YN": float(features.parkinson_yn),
-            "CHF_YN": float(features.chf_yn),
-            "CKD_YN": float(features.ckd_yn),
-            "COPD_YN": float(features.copd_yn),
-            "CANCER_YN": float(features.cancer_yn),
-            "STEROID_YN": float(features.steroid_yn),
-            "IMMUNOSUP_YN": float(features.immunosup_yn),
-            "ANTIPSYCHOTIC_YN": float(features.antipsychotic_yn),
-        }
 
-    def _with_derived_features(self, base: Dict[str, float]) -> Dict[str, float]:
-        enriched = dict(base)
-        age = base["AGE"]
-        frailty_index = float(
-            (age >= 75) and (base["DEMENTIA_YN"] == 1.0 or base["PARKINSON_YN"] == 1.0)
+EMPTY_SIMULATION_WARNING = "중재 계획 값이 없어 시뮬레이션 결과가 비어 있습니다."
+# Keys of NutritionSimResponse.results, in the order the rules run.
+NUTRITION_RESULTS = ("albumin", "hemoglobin", "vitamin_d", "fracture_risk", "cvd_risk", "vitamin_c")
+# List fields are joined into one text cell so CSV output stays flat.
+LIST_SEPARATOR = "; "
+
+OPTIMIZE_BATCH_SIZE = 256
+# Above this many rows the estimator's own compiled predict is faster than
+# level-by-level traversal in NumPy.
+COMPILED_MAX_ROWS = 512
+OPTIMIZE_COSTS = ("protein_g", "iron_mg", "vitamin_d_iu")
+
+WARMUP_RESIDENT = ImmuneFeatures(age=80)
+WARMUP_PATIENT = NutritionPatient(age=80)
+WARMUP_INTERVENTION = NutritionIntervention(protein_g=50.0, iron_mg=65.0, vitamin_c_mg=200.0)
+
+
+def _pareto_front(costs: np.ndarray, gain: np.ndarray, block: int = 256) -> np.ndarray:
+    # Minimize every cost column and maximize gain. After a lexicographic sort
+    # nothing is dominated by a later point, so each block is only compared
+    # with the front so far and with the points before it in the block.
+    order = np.lexsort((-gain, *costs.T[::-1]))
+    front = np.zeros(0, dtype=np.int64)
+    for start in range(0, len(order), block):
+        chunk = order[start : start + block]
+        rivals = np.concatenate([front, chunk])
+        dominated = np.all(costs[rivals][None, :, :] <= costs[chunk][:, None, :], axis=2) & (
+            gain[rivals][None, :] >= gain[chunk][:, None]
         )
-        severe_immune_low = float(
-            (base["CANCER_YN"] == 1.0)
-            and (base["STEROID_YN"] == 1.0 or base["IMMUNOSUP_YN"] == 1.0)
+        dominated[:, len(front) :] &= np.tri(len(chunk), k=-1, dtype=bool)
+        front = np.concatenate([front, chunk[~dominated.any(axis=1)]])
+    return front
+
+
+def _rounded(values: np.ndarray, ndigits: int) -> List[float]:
+    # rint(x * 10**n) / 10**n equals Python's round(x, n) unless the scaled
+    # product lands within float error of a .5 tie; only those rows are
+    # redone with round(), so results stay identical to the scalar path.
+    scale = 10.0**ndigits
+    scaled = np.asarray(values, dtype=np.float64) * scale
+    rounded = np.rint(scaled) / scale
+    with np.errstate(invalid="ignore"):
+        near_tie = np.abs(scaled - np.floor(scaled) - 0.5) <= np.maximum(np.abs(scaled), 1.0) * 1e-12
+    for index in np.flatnonzero(near_tie).tolist():
+        rounded[index] = round(float(values[index]), ndigits)
+    return rounded.tolist()
+
+
+def _given(values: np.ndarray) -> np.ndarray:
+    # Column form of the scalar `if intervention.x:` test: present and non-zero.
+    return ~np.isnan(values) & (values != 0)
+
+
+def _optional_list(values: np.ndarray) -> List[Optional[float]]:
+    return [None if value != value else value for value in values.tolist()]
+
+
+def _risk_levels_from_divs(divs_scores: np.ndarray) -> np.ndarray:
+    return RISK_LEVELS[np.digitize(divs_scores, RISK_LEVEL_EDGES)]
+
+
+@dataclass
+class ImmuneScores:
+    source: str
+    features: np.ndarray
+    risk_probability: np.ndarray
+    immunity_score: np.ndarray
+    divs_score: np.ndarray
+    risk_level: np.ndarray
+    generation: int = 0
+    # Rows answered from the result store instead of the model.
+    reused: int = 0
+
+    def __len__(self) -> int:
+        return int(self.divs_score.shape[0])
+
+    @property
+    def scored(self) -> int:
+        return len(self) - self.reused
+
+    def take(self, start: int, stop: int) -> ImmuneScores:
+        return replace(
+            self,
+            features=self.features[start:stop],
+            risk_probability=self.risk_probability[start:stop],
+            immunity_score=self.immunity_score[start:stop],
+            divs_score=self.divs_score[start:stop],
+            risk_level=self.risk_level[start:stop],
+            reused=0,
         )
-        disease_burden = (
-            base["CHF_YN"] + base["CKD_YN"] + base["COPD_YN"] + base["CANCER_YN"]
+
+    def records(self, resident_ids: Sequence[Optional[str]], include_features: bool = True) -> List[Dict[str, Any]]:
+        # ImmunePredictResponse fields as plain dicts, for encoders that take
+        # Python objects (pydantic, MessagePack).
+        risk_probability = _rounded(self.risk_probability, 4)
+        immunity_score = _rounded(self.immunity_score, 2)
+        divs_score = _rounded(self.divs_score, 2)
+        risk_level = self.risk_level.tolist()
+        rows = self.features.tolist() if include_features else None
+        return [
+            {
+                "resident_id": resident_ids[index],
+                "source": self.source,
+                "risk_probability": risk_probability[index],
+                "immunity_score": immunity_score[index],
+                "divs_score": divs_score[index],
+                "risk_level": risk_level[index],
+                "used_features": dict(zip(IMMUNE_COLUMNS, rows[index])) if rows is not None else {},
+                "model_generation": self.generation,
+            }
+            for index in range(len(divs_score))
+        ]
+
+    def responses(
+        self, resident_ids: Sequence[Optional[str]], include_features: bool = True
+    ) -> List[ImmunePredictResponse]:
+        return [ImmunePredictResponse(**record) for record in self.records(resident_ids, include_features)]
+
+    def json_items(self, resident_ids: Sequence[Optional[str]], include_features: bool = True) -> List[str]:
+        # Same values and rounding as responses(), encoded straight to JSON
+        # text without building a pydantic model per row.
+        return immune_items(
+            self.source,
+            resident_ids,
+            _rounded(self.risk_probability, 4),
+            _rounded(self.immunity_score, 2),
+            _rounded(self.divs_score, 2),
+            self.risk_level.tolist(),
+            self.features if include_features else None,
+            self.generation,
         )
-        if age < 65:
-            age_bin = 0.0
-        elif age < 75:
-            age_bin = 1.0
-        elif age < 85:
-            age_bin = 2.0
-        else:
-            age_bin = 3.0
 
-        enriched.update(
+    def frame(self, resident_ids: Sequence[Optional[str]], include_features: bool = False) -> pd.DataFrame:
+        frame = pd.DataFrame(
             {
-                "FRAILTY_INDEX": frailty_index,
-                "SEVERE_IMMUNE_LOW": severe_immune_low,
-                "DISEASE_BURDEN": disease_burden,
-                "AGE_BIN": age_bin,
-                "AGE_SQ": age**2,
-                "AGE_x_DISEASE": age * disease_burden,
-                "AGE_x_FRAILTY": age * frailty_index,
+                "resident_id": list(resident_ids),
+                "source": [self.source] * len(self),
+                "risk_probability": _rounded(self.risk_probability, 4),
+                "immunity_score": _rounded(self.immunity_score, 2),
+                "divs_score": _rounded(self.divs_score, 2),
+                "risk_level": self.risk_level.tolist(),
+                "model_generation": [self.generation] * len(self),
             }
         )
-        return enriched
-
-    def _environment_rr(self, features: ImmuneFeatures) -> float:
-        factors = [
-            features.temp_rr,
-            features.season_rr,
-            features.hum_rr,
-            features.outbreak_rr,
-            features.room_rr,
-            features.epi_rr,
-        ]
-        geometric_mean = float(math.prod(factors) ** (1.0 / len(factors)))
-        return _clamp(geometric_mean, 0.5, 2.5)
+        if include_features:
+            features = pd.DataFrame(self.features, columns=IMMUNE_COLUMNS, copy=False)
+            frame = pd.concat([frame, features], axis=1)
+        return frame
+
+
+def _immune_scores(
+    source: str,
+    features: np.ndarray,
+    risk_probability: np.ndarray,
+    environment_rr: np.ndarray,
+    generation: int,
+    reused: int = 0,
+) -> ImmuneScores:
+    risk_probability = np.clip(risk_probability.astype(np.float64), 0.0, 1.0)
+    immunity_score = np.clip((1.0 - risk_probability) * 100.0, 0.0, 100.0)
+    divs_score = np.clip(immunity_score / environment_rr, 0.0, 100.0)
+    return ImmuneScores(
+        source=source,
+        features=features,
+        risk_probability=risk_probability,
+        immunity_score=immunity_score,
+        divs_score=divs_score,
+        risk_level=_risk_levels_from_divs(divs_score),
+        generation=generation,
+        reused=reused,
+    )
+
+
+@dataclass
+class AlbuminScores:
+    current: np.ndarray
+    expected: np.ndarray
+    change: np.ndarray
+    generation: int = 0
+
+
+class ImmunePredictor:
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        cache: Optional[PredictionCache] = None,
+        pool: Optional[InferencePool] = None,
+        metrics: Optional[Metrics] = None,
+        store: Optional[ResultStore] = None,
+    ) -> None:
+        self.registry = registry
+        self.cache = cache
+        self.pool = pool
+        self.store = store
+        # Stage timing is inlined as `if metrics is not None` checks rather than
+        # context managers so that disabled metrics cost nothing measurable.
+        self.metrics = metrics
+
+    def predict_probabilities(
+        self,
+        model: Any,
+        matrix: np.ndarray,
+        pipeline: ImmuneFeaturePipeline,
+        native: Optional[NativeModel] = None,
+    ) -> np.ndarray:
+        if native is not None:
+            return native.predict_positive(pipeline.model_input(matrix))
 
-    def _predict_probability_with_model(
-        self, model: Any, row: Dict[str, float], feature_names: Optional[list[str]]
-    ) -> float:
-        ordered_names = feature_names or list(row.keys())
-        payload = {name: float(row.get(name, 0.0)) for name in ordered_names}
-        frame = pd.DataFrame([payload], columns=ordered_names)
+        metrics = self.metrics
+        started = time.perf_counter() if metrics is not None else 0.0
+        frame = pd.DataFrame(pipeline.model_input(matrix), columns=pipeline.feature_names)
+        if metrics is not None:
+            metrics.lap("immune", "frame", started)
 
         if hasattr(model, "predict_proba"):
-            proba = model.predict_proba(frame)
-            return float(proba[0][1])
+            return np.asarray(model.predict_proba(frame), dtype=np.float64)[:, 1]
         if hasattr(model, "decision_function"):
-            decision = float(model.decision_function(frame)[0])
-            return float(1.0 / (1.0 + np.exp(-decision)))
-        prediction = float(model.predict(frame)[0])
-        return _clamp(prediction, 0.0, 1.0)
+            decision = np.asarray(model.decision_function(frame), dtype=np.float64)
+            return 1.0 / (1.0 + np.exp(-decision))
+        prediction = np.asarray(model.predict(frame), dtype=np.float64)
+        return np.clip(prediction, 0.0, 1.0)
+
+    def _compute_probabilities(self, model: Any, matrix: np.ndarray, artifacts: LoadedArtifacts) -> np.ndarray:
+        # Large batches are sharded across the worker processes; small ones (and
+        # any batch the pool fails on) are scored in-process.
+        if self.pool is not None and matrix.shape[0] >= self.pool.min_rows:
+            probabilities = self.pool.predict_probabilities(matrix, artifacts)
+            if probabilities is not None:
+                return probabilities
+        return self.predict_probabilities(model, matrix, artifacts.immune_pipeline, artifacts.immune_native)
+
+    def _model_probabilities(
+        self, model: Any, matrix: np.ndarray, artifacts: LoadedArtifacts
+    ) -> np.ndarray:
+        pipeline = artifacts.immune_pipeline
+        if self.cache is None:
+            return self._compute_probabilities(model, matrix, artifacts)
+
+        keys = row_keys(pipeline.model_input(matrix))
+        probabilities, missing = self.cache.get_many(artifacts.immune_generation, keys)
+        if missing:
+            # Identical rows within the batch are sent to the model only once.
+            first_index: Dict[bytes, int] = {}
+            for index in missing:
+                first_index.setdefault(keys[index], index)
+            unique = np.fromiter(first_index.values(), dtype=np.intp, count=len(first_index))
+            computed = np.asarray(self._compute_probabilities(model, matrix[unique], artifacts), dtype=np.float64)
+            lookup = dict(zip(first_index, computed.tolist()))
+            probabilities[missing] = [lookup[keys[index]] for index in missing]
+            self.cache.put_many(artifacts.immune_generation, list(first_index), computed)
+        return probabilities
+
+    def _stored_probabilities(
+        self,
+        store: ResultStore,
+        model: Any,
+        inputs: np.ndarray,
+        matrix: np.ndarray,
+        artifacts: LoadedArtifacts,
+        resident_ids: Sequence[Optional[str]],
+    ) -> Tuple[np.ndarray, int]:
+        # Residents whose features and model are unchanged since their last
+        # scoring get the stored probability; only the rest reach the model
+        # (or, with no immune artifact loaded, the fallback formula).
+        model_hash = (artifacts.hashes.get("immune") or "") if model is not None else FALLBACK_MODEL_HASH
+        digests = input_digests(inputs)
+        probabilities = store.lookup(artifacts.immune_generation, model_hash, resident_ids, digests)
+        fresh = np.flatnonzero(np.isnan(probabilities))
+        if fresh.size:
+            if model is None:
+                computed = self._fallback_probabilities(matrix[fresh])
+            else:
+                computed = np.asarray(self._model_probabilities(model, matrix[fresh], artifacts), dtype=np.float64)
+            probabilities[fresh] = computed
+            store.save(
+                artifacts.immune_generation,
+                model_hash,
+                [resident_ids[index] for index in fresh.tolist()],
+                [digests[index] for index in fresh.tolist()],
+                computed,
+            )
+        return probabilities, len(probabilities) - int(fresh.size)
 
     def _fallback_probability(self, row: Dict[str, float]) -> float:
         age = row["AGE"]
@@ -129,34 +356,192 @@ class ImmunePredictor:
         )
         return _clamp(float(risk), 0.05, 0.95)
 
-    def predict(self, resident_id: Optional[str], features: ImmuneFeatures) -> ImmunePredictResponse:
-        base = self._base_features(features)
-        full = self._with_derived_features(base)
-        environment_rr = self._environment_rr(features)
+    def _fallback_probabilities(self, matrix: np.ndarray) -> np.ndarray:
+        column = IMMUNE_COLUMN_INDEX
+        risk = (
+            0.12
+            + np.maximum(matrix[:, column["AGE"]] - 65.0, 0.0) * 0.007
+            + matrix[:, column["DISEASE_BURDEN"]] * 0.08
+            + matrix[:, column["FRAILTY_INDEX"]] * 0.06
+            + matrix[:, column["SEVERE_IMMUNE_LOW"]] * 0.08
+            + matrix[:, column["STEROID_YN"]] * 0.04
+            + matrix[:, column["IMMUNOSUP_YN"]] * 0.06
+            + matrix[:, column["ANTIPSYCHOTIC_YN"]] * 0.02
+        )
+        return np.clip(risk, 0.05, 0.95)
+
+    def input_matrix_from_columns(self, columns: Mapping[str, np.ndarray]) -> np.ndarray:
+        return ImmuneFeaturePipeline.inputs_from_columns(columns)
+
+    def score_inputs(
+        self,
+        inputs: np.ndarray,
+        artifacts: Optional[LoadedArtifacts] = None,
+        resident_ids: Optional[Sequence[Optional[str]]] = None,
+    ) -> ImmuneScores:
+        artifacts = artifacts or self.registry.artifacts
+        metrics = self.metrics
+        started = time.perf_counter() if metrics is not None else 0.0
+        pipeline = artifacts.immune_pipeline
+        matrix = pipeline.transform(inputs)
+        if metrics is not None:
+            started = metrics.lap("immune", "features", started)
 
-        bundle = self.registry.artifacts.immune_bundle or {}
+        bundle = artifacts.immune_bundle or {}
+        model = bundle.get("model")
+        source = "fallback"
+        reused = 0
+
+        if model is not None and matrix.shape[0]:
+            try:
+                if self.store is not None and resident_ids is not None:
+                    risk_probability, reused = self._stored_probabilities(
+                        self.store, model, inputs, matrix, artifacts, resident_ids
+                    )
+                else:
+                    risk_probability = self._model_probabilities(model, matrix, artifacts)
+                source = "model"
+            except Exception as exc:
+                if metrics is not None:
+                    metrics.count_error("immune", exc)
+                risk_probability = self._fallback_probabilities(matrix)
+        elif model is None and self.store is not None and resident_ids is not None and matrix.shape[0]:
+            # Stored too, so /api/immune/environment also works without an artifact.
+            risk_probability, reused = self._stored_probabilities(
+                self.store, None, inputs, matrix, artifacts, resident_ids
+            )
+        else:
+            risk_probability = self._fallback_probabilities(matrix)
+        if metrics is not None:
+            metrics.lap("immune", "model", started)
+            metrics.count_source("immune", source, matrix.shape[0])
+
+        return _immune_scores(source, matrix, risk_probability, matrix[:, ENV_RR_INDEX], artifacts.generation, reused)
+
+    def rescore_environment(
+        self, resident_ids: Sequence[str], rr_factors: np.ndarray, artifacts: Optional[LoadedArtifacts] = None
+    ) -> Tuple[ImmuneScores, List[str], List[str]]:
+        # Environment RR factors only divide the immunity score, so residents
+        # with a stored probability are rescored without the model. Returns
+        # the scores, the residents they belong to, and the residents with
+        # nothing stored for the current model (to be sent to a batch).
+        if self.store is None:
+            raise RuntimeError("environment rescoring needs the result store")
+        artifacts = artifacts or self.registry.artifacts
+        metrics = self.metrics
+        started = time.perf_counter() if metrics is not None else 0.0
+        if (artifacts.immune_bundle or {}).get("model") is None:
+            source, model_hash = "fallback", FALLBACK_MODEL_HASH
+        else:
+            source, model_hash = "model", artifacts.hashes.get("immune") or ""
+        probabilities = self.store.probabilities(artifacts.immune_generation, model_hash, resident_ids)
+        found = ~np.isnan(probabilities)
+        found_ids = [resident_id for resident_id, hit in zip(resident_ids, found.tolist()) if hit]
+        missing = [resident_id for resident_id, hit in zip(resident_ids, found.tolist()) if not hit]
+        environment_rr = environment_rr_from_columns(np.asarray(rr_factors, dtype=np.float64).reshape(1, -1))
+        # No feature rows are stored, so responses carry no used_features.
+        scores = _immune_scores(
+            source,
+            np.empty((len(found_ids), 0)),
+            probabilities[found],
+            environment_rr,
+            artifacts.generation,
+            reused=len(found_ids),
+        )
+        if metrics is not None:
+            metrics.lap("immune", "rules", started)
+            metrics.count_source("immune", "store", len(found_ids))
+        return scores, found_ids, missing
+
+    def score_batch(
+        self, features: Sequence[ImmuneFeatures], resident_ids: Optional[Sequence[Optional[str]]] = None
+    ) -> ImmuneScores:
+        metrics = self.metrics
+        started = time.perf_counter() if metrics is not None else 0.0
+        inputs = ImmuneFeaturePipeline.inputs(features)
+        if metrics is not None:
+            metrics.lap("immune", "inputs", started)
+        return self.score_inputs(inputs, resident_ids=resident_ids)
+
+    def batch_responses(
+        self, scores: ImmuneScores, resident_ids: Sequence[Optional[str]], include_features: bool = True
+    ) -> List[ImmunePredictResponse]:
+        metrics = self.metrics
+        started = time.perf_counter() if metrics is not None else 0.0
+        responses = scores.responses(resident_ids, include_features)
+        if metrics is not None:
+            metrics.lap("immune", "responses", started)
+        return responses
+
+    def batch_json(
+        self, scores: ImmuneScores, resident_ids: Sequence[Optional[str]], include_features: bool = True
+    ) -> List[str]:
+        metrics = self.metrics
+        started = time.perf_counter() if metrics is not None else 0.0
+        encoded = scores.json_items(resident_ids, include_features)
+        if metrics is not None:
+            metrics.lap("immune", "responses", started)
+        return encoded
+
+    def predict_batch(
+        self,
+        items: Sequence[Tuple[Optional[str], ImmuneFeatures]],
+        include_features: bool = True,
+    ) -> List[ImmunePredictResponse]:
+        resident_ids = [resident_id for resident_id, _ in items]
+        scores = self.score_batch([features for _, features in items], resident_ids)
+        return self.batch_responses(scores, resident_ids, include_features)
+
+    def predict_batch_json(
+        self,
+        items: Sequence[Tuple[Optional[str], ImmuneFeatures]],
+        include_features: bool = True,
+    ) -> List[str]:
+        resident_ids = [resident_id for resident_id, _ in items]
+        scores = self.score_batch([features for _, features in items], resident_ids)
+        return self.batch_json(scores, resident_ids, include_features)
+
+    def predict(
+        self,
+        resident_id: Optional[str],
+        features: ImmuneFeatures,
+        artifacts: Optional[LoadedArtifacts] = None,
+    ) -> ImmunePredictResponse:
+        artifacts = artifacts or self.registry.artifacts
+        metrics = self.metrics
+        started = time.perf_counter() if metrics is not None else 0.0
+        pipeline = artifacts.immune_pipeline
+        # The batch transform on one row, so both paths share one feature definition.
+        row = pipeline.transform(ImmuneFeaturePipeline.inputs([features]))[0]
+        used = dict(zip(IMMUNE_COLUMNS, row.tolist()))
+        environment_rr = used["ENV_RR"]
+        if metrics is not None:
+            started = metrics.lap("immune", "features", started)
+
+        bundle = artifacts.immune_bundle or {}
         model = bundle.get("model")
-        feature_names = bundle.get("feature_names")
         source = "fallback"
 
         if model is not None:
             try:
-                risk_probability = self._predict_probability_with_model(model, full, feature_names)
+                risk_probability = float(self._model_probabilities(model, row.reshape(1, -1), artifacts)[0])
                 source = "model"
-            except Exception:
-                risk_probability = self._fallback_probability(full)
+            except Exception as exc:
+                if metrics is not None:
+                    metrics.count_error("immune", exc)
+                risk_probability = self._fallback_probability(used)
         else:
-            risk_probability = self._fallback_probability(full)
+            risk_probability = self._fallback_probability(used)
+        if metrics is not None:
+            started = metrics.lap("immune", "model", started)
+            metrics.count_source("immune", source, 1)
 
         risk_probability = _clamp(float(risk_probability), 0.0, 1.0)
         immunity_score = _clamp((1.0 - risk_probability) * 100.0, 0.0, 100.0)
         divs_score = _clamp(immunity_score / environment_rr, 0.0, 100.0)
         risk_level = _risk_level_from_divs(divs_score)
 
-        used = dict(full)
-        used["ENV_RR"] = environment_rr
-
-        return ImmunePredictResponse(
+        response = ImmunePredictResponse(
             resident_id=resident_id,
             source=source,  # type: ignore[arg-type]
             risk_probability=round(risk_probability, 4),
@@ -164,12 +549,21 @@ class ImmunePredictor:
             divs_score=round(divs_score, 2),
             risk_level=risk_level,  # type: ignore[arg-type]
             used_features=used,
+            model_generation=artifacts.generation,
         )
+        if metrics is not None:
+            metrics.lap("immune", "responses", started)
+        return response
+
+    def warm_up(self, artifacts: LoadedArtifacts) -> None:
+        self.predict(None, WARMUP_RESIDENT, artifacts)
+        self.score_inputs(ImmuneFeaturePipeline.inputs([WARMUP_RESIDENT] * 2), artifacts)
 
 
 class NutritionPredictor:
-    def __init__(self, registry: ModelRegistry) -> None:
+    def __init__(self, registry: ModelRegistry, metrics: Optional[Metrics] = None) -> None:
         self.registry = registry
+        self.metrics = metrics
 
     @staticmethod
     def _result(
@@ -196,261 +590,657 @@ class NutritionPredictor:
             model_type=model_type,
         )
 
-    def _prepare_albumin_features(
-        self, patient: NutritionPatient, intervention: NutritionIntervention
-    ) -> Dict[str, float]:
-        defaults = {
-            "hemoglobin": 13.0,
-            "bun": 20.0,
-            "creatinine": 1.0,
-            "glucose": 100.0,
-            "sodium": 140.0,
-            "potassium": 4.0,
-            "chloride": 105.0,
-            "bicarbonate": 24.0,
-            "wbc": 8.0,
-            "platelet": 250.0,
-        }
-
-        age = float(patient.age)
-        sex_m = 1.0 if patient.sex == "M" else 0.0
-        glucose = float(patient.glucose if patient.glucose is not None else defaults["glucose"])
-        ckd = 1.0 if patient.ckd_stage >= 3 else 0.0
-        diabetes = 1.0 if glucose >= 126.0 else 0.0
-        initial_albumin = float(patient.albumin if patient.albumin is not None else 3.5)
-        protein_intake = float(intervention.protein_g if intervention.protein_g is not None else 50.0)
-        cci = ckd + diabetes
-
-        features: Dict[str, float] = {
-            # Legacy lab-driven features (if model expects them)
-            "age": age,
-            "sex_M": sex_m,
-        }
-
-        for name, default in defaults.items():
-            value = getattr(patient, name)
-            features[name] = float(value if value is not None else default)
-
-        features["bun_creatinine_ratio"] = features["bun"] / max(features["creatinine"], 0.1)
+    def _albumin_scores(
+        self,
+        model: Any,
+        pipeline: AlbuminFeaturePipeline,
+        matrix: np.ndarray,
+        duration_weeks: np.ndarray,
+        generation: int,
+        rows: Optional[np.ndarray] = None,
+        compiled: Optional[CompiledTrees] = None,
+    ) -> Optional[AlbuminScores]:
+        metrics = self.metrics
+        started = time.perf_counter() if metrics is not None else 0.0
+        predicted: Optional[np.ndarray] = None
+        source = "estimator"
+        try:
+            model_input = pipeline.model_input(matrix)
+            if not matrix.shape[0]:
+                predicted = np.zeros(0)
+            elif compiled is not None and matrix.shape[0] <= COMPILED_MAX_ROWS:
+                try:
+                    predicted, source = compiled.predict(model_input), "compiled"
+                except ValueError:
+                    # Inputs the arrays cannot evaluate exactly (NaN for sklearn).
+                    predicted = None
+            if predicted is None:
+                predicted = np.asarray(model.predict(model_input), dtype=np.float64)
+        except Exception as exc:
+            if metrics is not None:
+                metrics.count_error("albumin", exc)
+            return None
+        if metrics is not None:
+            metrics.lap("nutrition", "model", started)
+            metrics.count_source("albumin", source, matrix.shape[0])
 
-        # Albumin-change model features (uppercase)
-        features.update(
-            {
-                "AGE": age,
-                "GENDER": sex_m,
-                "CKD": ckd,
-                "DIABETES": diabetes,
-                "CCI": cci,
-                "INITIAL_ALBUMIN": initial_albumin,
-                "PROTEIN_INTAKE": protein_intake,
-            }
+        current = matrix[:, ALBUMIN_COLUMN_INDEX["INITIAL_ALBUMIN"]]
+        if rows is not None:
+            predicted, current = predicted[rows], current[rows]
+        duration_factor = np.clip(np.asarray(duration_weeks, dtype=np.float64) / 4.0, 0.25, 2.0)
+        adjustment = predicted * duration_factor
+        return AlbuminScores(
+            current=current,
+            expected=current + adjustment,
+            change=adjustment,
+            generation=generation,
         )
 
-        # Derived features (match notebook)
-        weight_proxy = age * 0.5 + 50.0
-        features["protein_per_kg"] = protein_intake / weight_proxy
-        features["high_protein"] = 1.0 if protein_intake > 60.0 else 0.0
-        features["low_protein"] = 1.0 if protein_intake < 40.0 else 0.0
-        features["low_baseline_albumin"] = 1.0 if initial_albumin < 3.5 else 0.0
-        features["very_low_baseline"] = 1.0 if initial_albumin < 3.0 else 0.0
-        features["CKD_protein"] = ckd * protein_intake
-        features["DIABETES_protein"] = diabetes * protein_intake
-        features["baseline_protein"] = initial_albumin * protein_intake
-        features["CKD_baseline"] = ckd * initial_albumin
-        features["elderly"] = 1.0 if age > 75.0 else 0.0
-        features["AGE_CKD"] = age * ckd
-        features["high_risk"] = 1.0 if (ckd == 1.0 or diabetes == 1.0 or initial_albumin < 3.0) else 0.0
-        features["comorbidity_count"] = cci
-        features["protein_squared"] = protein_intake ** 2
-        features["protein_log"] = float(np.log1p(protein_intake))
-        features["albumin_squared"] = initial_albumin ** 2
-        features["albumin_log"] = float(np.log(max(initial_albumin, 0.1)))
-
-        # Lowercase/alternate aliases for compatibility
-        features["cci"] = features["CCI"]
-        features["ckd_protein"] = features["CKD_protein"]
-        features["diabetes_protein"] = features["DIABETES_protein"]
-        features["ckd_baseline"] = features["CKD_baseline"]
-        features["age_ckd"] = features["AGE_CKD"]
-        return features
-
-    def _simulate_albumin(
-        self, patient: NutritionPatient, intervention: NutritionIntervention
-    ) -> Optional[NutritionResult]:
-        bundle = self.registry.artifacts.albumin_bundle or {}
+    def predict_albumin_columns(
+        self, columns: Mapping[str, np.ndarray], artifacts: Optional[LoadedArtifacts] = None
+    ) -> Optional[AlbuminScores]:
+        artifacts = artifacts or self.registry.artifacts
+        bundle = artifacts.albumin_bundle or {}
         model = bundle.get("model")
         if model is None:
             return None
 
-        features = self._prepare_albumin_features(patient, intervention)
-        feature_names = bundle.get("feature_names") or list(features.keys())
+        pipeline = artifacts.albumin_pipeline
+        metrics = self.metrics
+        started = time.perf_counter() if metrics is not None else 0.0
+        matrix = pipeline.transform(columns)
+        if metrics is not None:
+            metrics.lap("nutrition", "features", started)
+        return self._albumin_scores(
+            model,
+            pipeline,
+            matrix,
+            columns["duration_weeks"],
+            artifacts.generation,
+            compiled=artifacts.albumin_compiled,
+        )
 
-        try:
-            ordered = [float(features.get(name, 0.0)) for name in feature_names]
-            predicted = float(model.predict(np.array(ordered).reshape(1, -1))[0])
-        except Exception:
-            return None
+    def _albumin_results(
+        self, columns: Mapping[str, np.ndarray], albumin: Optional[AlbuminScores]
+    ) -> List[Optional[NutritionResult]]:
+        rows = len(columns["age"])
+        if albumin is None:
+            return [None] * rows
 
-        current = patient.albumin if patient.albumin is not None else 3.5
-        protein_g = intervention.protein_g if intervention.protein_g is not None else 50.0
-        duration_factor = max(min(float(intervention.duration_weeks) / 4.0, 2.0), 0.25)
-        adjustment = predicted * duration_factor
-        expected = current + adjustment
-        warnings = ["CKD: 고단백 주의"] if patient.ckd_stage >= 3 else []
-
-        return self._result(
-            "Albumin",
-            f"ML 예측: 단백질 {protein_g}g/day, {intervention.duration_weeks}주",
-            current_value=current,
-            expected_value=expected,
-            expected_change=adjustment,
-            warnings=warnings,
-            monitoring_recommendations=["4주 후 알부민 재검사", "신기능 모니터링"],
-            model_type="ml",
+        protein_g = np.where(np.isnan(columns["protein_g"]), 50.0, columns["protein_g"]).tolist()
+        weeks = columns["duration_weeks"].astype(np.int64).tolist()
+        ckd = (columns["ckd_stage"] >= 3).tolist()
+        current = albumin.current.tolist()
+        expected = albumin.expected.tolist()
+        change = albumin.change.tolist()
+        return [
+            self._result(
+                "Albumin",
+                f"ML 예측: 단백질 {protein_g[index]}g/day, {weeks[index]}주",
+                current_value=current[index],
+                expected_value=expected[index],
+                expected_change=change[index],
+                warnings=["CKD: 고단백 주의"] if ckd[index] else [],
+                monitoring_recommendations=["4주 후 알부민 재검사", "신기능 모니터링"],
+                model_type="ml",
+            )
+            for index in range(rows)
+        ]
+
+    @staticmethod
+    def _iron_effect(
+        columns: Mapping[str, np.ndarray], gl: Guidelines
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        ckd = columns["ckd_stage"] >= 3
+        inflamed = columns["chronic_inflammation"] | (columns["crp"] > 5)
+        factor = np.ones(len(ckd))
+        factor = np.where(ckd, factor * gl.iron.ckd_absorption_factor, factor)
+        factor = np.where(inflamed, factor * gl.iron.inflammation_factor, factor)
+        expected_change = (
+            gl.iron.baseline_hgb_increase
+            * factor
+            * (columns["iron_mg"] / 100.0)
+            * (columns["duration_weeks"] / 4.0)
         )
+        return ckd, inflamed, expected_change
 
-    def simulate(self, patient: NutritionPatient, intervention: NutritionIntervention) -> NutritionSimResponse:
-        gl = self.registry.artifacts.guidelines
-        results: Dict[str, NutritionResult] = {}
-        albumin_result = self._simulate_albumin(patient, intervention)
+    def _iron_results(
+        self, columns: Mapping[str, np.ndarray], gl: Guidelines
+    ) -> List[Optional[NutritionResult]]:
+        iron_mg = columns["iron_mg"]
+        active = _given(iron_mg)
+        if not active.any():
+            return [None] * len(iron_mg)
 
-        if albumin_result:
-            results["albumin"] = albumin_result
+        ckd, inflamed, expected_change = self._iron_effect(columns, gl)
+        hemoglobin = columns["hemoglobin"]
+        current = _optional_list(hemoglobin)
+        expected = _optional_list(hemoglobin + expected_change)
+        change = expected_change.tolist()
+        doses = iron_mg.tolist()
+        weeks = columns["duration_weeks"].astype(np.int64).tolist()
+        ckd_rows, inflamed_rows = ckd.tolist(), inflamed.tolist()
 
-        if intervention.iron_mg:
-            factor = 1.0
-            warnings: list[str] = []
-            if patient.ckd_stage >= 3:
-                factor *= float(gl["iron"]["ckd_absorption_factor"])
+        results: List[Optional[NutritionResult]] = [None] * len(iron_mg)
+        for index in np.flatnonzero(active).tolist():
+            warnings = []
+            if ckd_rows[index]:
                 warnings.append("CKD: 흡수율 ↓30%")
-            if patient.chronic_inflammation or (patient.crp is not None and patient.crp > 5):
-                factor *= float(gl["iron"]["inflammation_factor"])
+            if inflamed_rows[index]:
                 warnings.append("염증: 효과 감소")
-
-            expected_change = (
-                float(gl["iron"]["baseline_hgb_increase"])
-                * factor
-                * (float(intervention.iron_mg) / 100.0)
-                * (float(intervention.duration_weeks) / 4.0)
-            )
-            expected_value = (
-                patient.hemoglobin + expected_change if patient.hemoglobin is not None else None
-            )
-            results["hemoglobin"] = self._result(
+            results[index] = self._result(
                 "Hemoglobin",
-                f"철분 {intervention.iron_mg}mg/day, {intervention.duration_weeks}주 → Hgb +{expected_change:.1f} g/dL",
-                current_value=patient.hemoglobin,
-                expected_value=expected_value,
-                expected_change=expected_change,
+                f"철분 {doses[index]}mg/day, {weeks[index]}주 → Hgb +{change[index]:.1f} g/dL",
+                current_value=current[index],
+                expected_value=expected[index],
+                expected_change=change[index],
                 warnings=warnings,
                 monitoring_recommendations=["4주 후 CBC", "Ferritin/TSAT 추적"],
             )
+        return results
 
-        if intervention.vitamin_d_iu:
-            time_factor = min(float(intervention.duration_weeks) / 12.0, 1.0)
-            increase = (
-                float(intervention.vitamin_d_iu) / 1000.0
-            ) * float(gl["vitamin_d"]["increase_per_1000iu"]) * time_factor
-            expected_value = patient.vitamin_d + increase if patient.vitamin_d is not None else None
-            warnings = []
-            if float(intervention.vitamin_d_iu) > float(gl["vitamin_d"]["upper_limit_iu"]):
-                warnings.append(
-                    f"UL 초과: {intervention.vitamin_d_iu} > {gl['vitamin_d']['upper_limit_iu']} IU/day"
-                )
-            results["vitamin_d"] = self._result(
+    @staticmethod
+    def _vitamin_d_effect(columns: Mapping[str, np.ndarray], gl: Guidelines) -> np.ndarray:
+        time_factor = np.minimum(columns["duration_weeks"] / 12.0, 1.0)
+        return (columns["vitamin_d_iu"] / 1000.0) * gl.vitamin_d.increase_per_1000iu * time_factor
+
+    def _vitamin_d_results(
+        self, columns: Mapping[str, np.ndarray], gl: Guidelines
+    ) -> List[Optional[NutritionResult]]:
+        vitamin_d_iu = columns["vitamin_d_iu"]
+        active = _given(vitamin_d_iu)
+        if not active.any():
+            return [None] * len(vitamin_d_iu)
+
+        upper_limit = gl.vitamin_d.upper_limit_label
+        increase = self._vitamin_d_effect(columns, gl)
+        over_limit = (vitamin_d_iu > gl.vitamin_d.upper_limit_iu).tolist()
+        current = _optional_list(columns["vitamin_d"])
+        expected = _optional_list(columns["vitamin_d"] + increase)
+        change = increase.tolist()
+        doses = vitamin_d_iu.tolist()
+        weeks = columns["duration_weeks"].astype(np.int64).tolist()
+
+        results: List[Optional[NutritionResult]] = [None] * len(vitamin_d_iu)
+        for index in np.flatnonzero(active).tolist():
+            results[index] = self._result(
                 "Vitamin D",
-                f"비타민 D {intervention.vitamin_d_iu} IU/day, {intervention.duration_weeks}주 → +{increase:.1f} ng/mL",
-                current_value=patient.vitamin_d,
-                expected_value=expected_value,
-                expected_change=increase,
-                warnings=warnings,
+                f"비타민 D {doses[index]} IU/day, {weeks[index]}주 → +{change[index]:.1f} ng/mL",
+                current_value=current[index],
+                expected_value=expected[index],
+                expected_change=change[index],
+                warnings=[f"UL 초과: {doses[index]} > {upper_limit} IU/day"] if over_limit[index] else [],
                 monitoring_recommendations=["3개월 후 25(OH)D", "칼슘 모니터링"],
             )
+        return results
 
-        if intervention.calcium_mg:
-            baseline_risk = 0.20 if patient.fracture_risk_high else 0.10
-            vitd_ok = bool(intervention.vitamin_d_iu and intervention.vitamin_d_iu >= 800)
-            reduction = float(gl["calcium"]["fracture_risk_reduction"]) if vitd_ok else 0.0
-            expected = baseline_risk * (1.0 - reduction)
+    @staticmethod
+    def _calcium_effect(
+        columns: Mapping[str, np.ndarray], gl: Guidelines
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        baseline_risk = np.where(columns["fracture_risk_high"], 0.20, 0.10)
+        vitd_ok = columns["vitamin_d_iu"] >= 800
+        reduction = np.where(vitd_ok, gl.calcium.fracture_risk_reduction, 0.0)
+        return baseline_risk, vitd_ok, baseline_risk * (1.0 - reduction)
+
+    def _calcium_results(
+        self, columns: Mapping[str, np.ndarray], gl: Guidelines
+    ) -> List[Optional[NutritionResult]]:
+        calcium_mg = columns["calcium_mg"]
+        active = _given(calcium_mg)
+        if not active.any():
+            return [None] * len(calcium_mg)
+
+        baseline_risk, vitd_ok, expected = self._calcium_effect(columns, gl)
+        change = (-(baseline_risk - expected)).tolist()
+        baseline, expected_values = baseline_risk.tolist(), expected.tolist()
+        doses = calcium_mg.tolist()
+        vitamin_d_doses = _optional_list(columns["vitamin_d_iu"])
+        vitd_rows = vitd_ok.tolist()
+
+        results: List[Optional[NutritionResult]] = [None] * len(calcium_mg)
+        for index in np.flatnonzero(active).tolist():
             interpretation = (
-                f"칼슘 {intervention.calcium_mg}mg + VitD {intervention.vitamin_d_iu} IU → 골절 위험 -15%"
-                if vitd_ok
-                else f"칼슘 {intervention.calcium_mg}mg (VitD 병용 권장)"
+                f"칼슘 {doses[index]}mg + VitD {vitamin_d_doses[index]} IU → 골절 위험 -15%"
+                if vitd_rows[index]
+                else f"칼슘 {doses[index]}mg (VitD 병용 권장)"
             )
-            results["fracture_risk"] = self._result(
+            results[index] = self._result(
                 "Fracture Risk",
                 interpretation,
-                current_value=baseline_risk,
-                expected_value=expected,
-                expected_change=-(baseline_risk - expected),
+                current_value=baseline[index],
+                expected_value=expected_values[index],
+                expected_change=change[index],
                 monitoring_recommendations=["DEXA 골밀도", "낙상 위험 평가"],
             )
+        return results
 
-        if intervention.omega3_epa_dha_g:
-            baseline_cvd = 0.15 if patient.age >= 70 else 0.10
-            dose = float(intervention.omega3_epa_dha_g)
-            reduction = float(gl["omega3"]["cvd_risk_reduction"]) if dose >= 1.0 else 0.0
-            expected_cvd = baseline_cvd * (1.0 - reduction)
+    @staticmethod
+    def _omega3_effect(
+        columns: Mapping[str, np.ndarray], gl: Guidelines
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        baseline_cvd = np.where(columns["age"] >= 70, 0.15, 0.10)
+        sufficient = columns["omega3_epa_dha_g"] >= 1.0
+        reduction = np.where(sufficient, gl.omega3.cvd_risk_reduction, 0.0)
+        return baseline_cvd, sufficient, baseline_cvd * (1.0 - reduction)
+
+    def _omega3_results(
+        self, columns: Mapping[str, np.ndarray], gl: Guidelines
+    ) -> List[Optional[NutritionResult]]:
+        dose = columns["omega3_epa_dha_g"]
+        active = _given(dose)
+        if not active.any():
+            return [None] * len(dose)
+
+        baseline_cvd, sufficient, expected = self._omega3_effect(columns, gl)
+        change = (-(baseline_cvd - expected)).tolist()
+        baseline, expected_values = baseline_cvd.tolist(), expected.tolist()
+        doses = dose.tolist()
+        sufficient_rows = sufficient.tolist()
+
+        results: List[Optional[NutritionResult]] = [None] * len(dose)
+        for index in np.flatnonzero(active).tolist():
             interpretation = (
-                f"오메가-3 {dose}g/day → CVD 위험 -8%"
-                if dose >= 1.0
-                else f"오메가-3 {dose}g/day (1.0g 이상 권장)"
+                f"오메가-3 {doses[index]}g/day → CVD 위험 -8%"
+                if sufficient_rows[index]
+                else f"오메가-3 {doses[index]}g/day (1.0g 이상 권장)"
             )
-            results["cvd_risk"] = self._result(
+            results[index] = self._result(
                 "CVD Risk",
                 interpretation,
-                current_value=baseline_cvd,
-                expected_value=expected_cvd,
-                expected_change=-(baseline_cvd - expected_cvd),
+                current_value=baseline[index],
+                expected_value=expected_values[index],
+                expected_change=change[index],
                 monitoring_recommendations=["지질 프로필", "출혈 경향 (항응고제 복용 시)"],
             )
+        return results
+
+    @staticmethod
+    def _vitamin_c_flags(
+        columns: Mapping[str, np.ndarray], gl: Guidelines
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        dose = columns["vitamin_c_mg"]
+        vit_c = gl.vitamin_c
+        band = np.searchsorted(vit_c.band_edges, dose, side="right")
+        smoker_low = columns["smoker"] & (dose < 150)
+        immune_low = columns["immune_compromised"] & (dose < 200)
+        male_high = (columns["sex"] == "M") & (dose >= vit_c.kidney_stone_threshold_male)
+        return band, smoker_low, immune_low, male_high
 
-        if intervention.vitamin_c_mg:
-            vit_c = gl["vitamin_c"]
-            dose = float(intervention.vitamin_c_mg)
+    def _vitamin_c_results(
+        self, columns: Mapping[str, np.ndarray], gl: Guidelines
+    ) -> List[Optional[NutritionResult]]:
+        dose = columns["vitamin_c_mg"]
+        active = _given(dose)
+        if not active.any():
+            return [None] * len(dose)
+
+        band, smoker_low, immune_low, male_high = (
+            flags.tolist() for flags in self._vitamin_c_flags(columns, gl)
+        )
+        stone_history = columns["kidney_stone_history"].tolist()
+        hemochromatosis = columns["hemochromatosis"].tolist()
+        iron_deficient = (columns["ferritin"] < 30).tolist()
+        doses = dose.tolist()
+
+        results: List[Optional[NutritionResult]] = [None] * len(dose)
+        for index in np.flatnonzero(active).tolist():
+            value = doses[index]
             warnings: list[str] = []
             contraindications: list[str] = []
             monitoring: list[str] = []
-            optimal_low, optimal_high = vit_c["optimal_range"]
-
-            if dose < vit_c["rni"]:
-                interp = f"{dose}mg/day - 권장섭취량 미달 (결핍 위험)"
-            elif dose < optimal_low:
-                interp = f"{dose}mg/day - 권장섭취량 충족"
-            elif dose <= optimal_high:
-                interp = f"{dose}mg/day - 최적 범위 (항산화, 면역 지원)"
-            elif dose <= vit_c["upper_limit"]:
-                interp = f"{dose}mg/day - 고용량이나 안전 범위"
+
+            if band[index] == 0:
+                interp = f"{value}mg/day - 권장섭취량 미달 (결핍 위험)"
+            elif band[index] == 1:
+                interp = f"{value}mg/day - 권장섭취량 충족"
+            elif band[index] == 2:
+                interp = f"{value}mg/day - 최적 범위 (항산화, 면역 지원)"
+            elif band[index] == 3:
+                interp = f"{value}mg/day - 고용량이나 안전 범위"
                 warnings.append("1000mg↑ 시 분할 복용 권장")
             else:
-                interp = f"{dose}mg/day - UL 초과 (설사, 위장 불편)"
-                warnings.append(f"UL {vit_c['upper_limit']}mg 초과")
+                interp = f"{value}mg/day - UL 초과 (설사, 위장 불편)"
+                warnings.append(f"UL {gl.vitamin_c.upper_limit_label}mg 초과")
 
-            if patient.smoker and dose < 150:
+            if smoker_low[index]:
                 warnings.append("흡연자 → +50-100mg 권장 (150-200mg/day)")
-            if patient.immune_compromised and dose < 200:
+            if immune_low[index]:
                 warnings.append("면역저하 → 200-500mg/day 권장")
-            if patient.sex == "M" and dose >= vit_c["kidney_stone_risk_threshold_male"]:
-                if patient.kidney_stone_history:
+            if male_high[index]:
+                if stone_history[index]:
                     contraindications.append("신결석 병력 남성: ≥1000mg 금기 (위험 2배↑)")
                 else:
                     warnings.append("남성 ≥1000mg: 신결석 위험↑")
-            if patient.hemochromatosis:
+            if hemochromatosis[index]:
                 contraindications.append("혈색소침착증: VitC가 철분 흡수↑")
-            if patient.ferritin is not None and patient.ferritin < 30:
+            if iron_deficient[index]:
                 monitoring.append("철결핍 빈혈: VitC+철분 병용 시 흡수 67%↑")
 
-            results["vitamin_c"] = self._result(
+            results[index] = self._result(
                 "Vitamin C Status",
                 interp,
                 warnings=warnings,
                 contraindications=contraindications,
                 monitoring_recommendations=monitoring,
             )
+        return results
 
-        source = "ml+rule" if albumin_result else "rule-based"
-        warnings = []
-        if not results:
-            warnings.append("중재 계획 값이 없어 시뮬레이션 결과가 비어 있습니다.")
+    def _constraint_flags(
+        self, columns: Mapping[str, np.ndarray], gl: Guidelines
+    ) -> Dict[str, np.ndarray]:
+        # The regimen-dependent conditions behind the CKD, upper-limit and
+        # kidney-stone warnings and the contraindications simulate() reports.
+        iron_given = _given(columns["iron_mg"])
+        vitamin_d_given = _given(columns["vitamin_d_iu"])
+        vitamin_c_given = _given(columns["vitamin_c_mg"])
+        band, _, _, male_high = self._vitamin_c_flags(columns, gl)
+        return {
+            "ckd": iron_given & (columns["ckd_stage"] >= 3),
+            "upper_limit": (
+                vitamin_d_given & (columns["vitamin_d_iu"] > gl.vitamin_d.upper_limit_iu)
+            )
+            | (vitamin_c_given & (band == 4)),
+            "kidney_stone": vitamin_c_given & male_high,
+            "contraindication": vitamin_c_given & columns["hemochromatosis"],
+        }
+
+    def simulate_columns(
+        self, columns: Mapping[str, np.ndarray], artifacts: Optional[LoadedArtifacts] = None
+    ) -> List[NutritionSimResponse]:
+        # Every guideline rule is evaluated column-wise over the whole batch and
+        # the albumin model runs once; per-patient responses are built last.
+        artifacts = artifacts or self.registry.artifacts
+        gl = artifacts.guidelines
+        albumin = self.predict_albumin_columns(columns, artifacts)
+        metrics = self.metrics
+        started = time.perf_counter() if metrics is not None else 0.0
+        rules = (
+            ("albumin", self._albumin_results(columns, albumin)),
+            ("hemoglobin", self._iron_results(columns, gl)),
+            ("vitamin_d", self._vitamin_d_results(columns, gl)),
+            ("fracture_risk", self._calcium_results(columns, gl)),
+            ("cvd_risk", self._omega3_results(columns, gl)),
+            ("vitamin_c", self._vitamin_c_results(columns, gl)),
+        )
+        source = "ml+rule" if albumin else "rule-based"
+        if metrics is not None:
+            started = metrics.lap("nutrition", "rules", started)
+            metrics.count_source("nutrition", source, len(columns["age"]))
+
+        responses = []
+        for index in range(len(columns["age"])):
+            results = {name: outcome[index] for name, outcome in rules if outcome[index] is not None}
+            responses.append(
+                NutritionSimResponse(
+                    source=source,  # type: ignore[arg-type]
+                    results=results,
+                    warnings=[] if results else [EMPTY_SIMULATION_WARNING],
+                    model_generation=artifacts.generation,
+                )
+            )
+        if metrics is not None:
+            metrics.lap("nutrition", "responses", started)
+        return responses
+
+    @staticmethod
+    def responses_frame(
+        responses: Sequence[NutritionSimResponse], resident_ids: Sequence[Optional[str]]
+    ) -> pd.DataFrame:
+        # One row per response and one column per result field, named
+        # <result>_<field>; results a patient did not get are left empty.
+        data: Dict[str, List[Any]] = {
+            "resident_id": list(resident_ids),
+            "source": [response.source for response in responses],
+            "warnings": [LIST_SEPARATOR.join(response.warnings) for response in responses],
+            "model_generation": [response.model_generation for response in responses],
+        }
+        for name in NUTRITION_RESULTS:
+            results = [response.results.get(name) for response in responses]
+            for field, column in (
+                ("current_value", "current"),
+                ("expected_value", "expected"),
+                ("expected_change", "change"),
+                ("interpretation", "interpretation"),
+                ("model_type", "model_type"),
+            ):
+                data[f"{name}_{column}"] = [getattr(result, field) if result else None for result in results]
+            for field in ("warnings", "contraindications", "monitoring_recommendations"):
+                data[f"{name}_{field}"] = [
+                    LIST_SEPARATOR.join(getattr(result, field)) if result else None for result in results
+                ]
+        return pd.DataFrame(data)
+
+    def simulate_batch(
+        self,
+        pairs: Sequence[Tuple[NutritionPatient, NutritionIntervention]],
+        artifacts: Optional[LoadedArtifacts] = None,
+    ) -> List[NutritionSimResponse]:
+        metrics = self.metrics
+        started = time.perf_counter() if metrics is not None else 0.0
+        columns = nutrition_columns([patient for patient, _ in pairs], [intervention for _, intervention in pairs])
+        if metrics is not None:
+            metrics.lap("nutrition", "inputs", started)
+        return self.simulate_columns(columns, artifacts)
+
+    def simulate(
+        self,
+        patient: NutritionPatient,
+        intervention: NutritionIntervention,
+        artifacts: Optional[LoadedArtifacts] = None,
+    ) -> NutritionSimResponse:
+        return self.simulate_batch([(patient, intervention)], artifacts)[0]
+
+    @staticmethod
+    def _grid_columns(
+        patient: NutritionPatient, intervention: NutritionIntervention, grid: Mapping[str, Sequence[float]]
+    ) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        mesh = np.meshgrid(*[np.asarray(values, dtype=np.float64) for values in grid.values()], indexing="ij")
+        points = int(mesh[0].size)
+        base = nutrition_columns([patient], [intervention])
+        columns = {name: np.repeat(values, points) for name, values in base.items()}
+        for name, values in zip(grid, mesh):
+            columns[name] = values.reshape(-1)
+        return base, columns
+
+    def sweep(
+        self,
+        patient: NutritionPatient,
+        intervention: NutritionIntervention,
+        grid: Mapping[str, Sequence[float]],
+        artifacts: Optional[LoadedArtifacts] = None,
+    ) -> Dict[str, Any]:
+        artifacts = artifacts or self.registry.artifacts
+        gl = artifacts.guidelines
+        parameters = list(grid)
+        base, columns = self._grid_columns(patient, intervention, grid)
+        points = len(columns["age"])
+
+        albumin: Optional[AlbuminScores] = None
+        model = (artifacts.albumin_bundle or {}).get("model")
+        if model is not None:
+            # Patient features are computed once; only the protein columns vary,
+            # and each distinct protein intake goes through the model once.
+            pipeline = artifacts.albumin_pipeline
+            row = pipeline.transform(base)[0]
+            protein = np.where(np.isnan(columns["protein_g"]), 50.0, columns["protein_g"])
+            unique, inverse = np.unique(protein, return_inverse=True)
+            albumin = self._albumin_scores(
+                model,
+                pipeline,
+                pipeline.vary_protein(row, unique),
+                columns["duration_weeks"],
+                artifacts.generation,
+                rows=inverse.reshape(-1),
+                compiled=artifacts.albumin_compiled,
+            )
+
+        _, _, hemoglobin_change = self._iron_effect(columns, gl)
+        vitamin_d_change = self._vitamin_d_effect(columns, gl)
+        fracture_baseline, _, fracture_risk = self._calcium_effect(columns, gl)
+        cvd_baseline, _, cvd_risk = self._omega3_effect(columns, gl)
+        iron_given = _given(columns["iron_mg"])
+        vitamin_d_given = _given(columns["vitamin_d_iu"])
+        missing = np.full(points, np.nan)
+        outputs = {
+            "albumin_expected": albumin.expected if albumin else missing,
+            "albumin_change": albumin.change if albumin else missing,
+            "hemoglobin_expected": np.where(iron_given, columns["hemoglobin"] + hemoglobin_change, np.nan),
+            "hemoglobin_change": np.where(iron_given, hemoglobin_change, np.nan),
+            "vitamin_d_expected": np.where(vitamin_d_given, columns["vitamin_d"] + vitamin_d_change, np.nan),
+            "vitamin_d_change": np.where(vitamin_d_given, vitamin_d_change, np.nan),
+            "fracture_risk": np.where(_given(columns["calcium_mg"]), fracture_risk, np.nan),
+            "cvd_risk": np.where(_given(columns["omega3_epa_dha_g"]), cvd_risk, np.nan),
+        }
+
+        table = [
+            columns[name].astype(np.int64).tolist() if name == "duration_weeks" else columns[name].tolist()
+            for name in parameters
+        ]
+        table.extend(_optional_list(values) for values in outputs.values())
+        return {
+            "source": "ml+rule" if albumin else "rule-based",
+            "model_generation": artifacts.generation,
+            "parameters": parameters,
+            "baseline": {
+                "albumin": float(albumin.current[0]) if albumin and points else None,
+                "hemoglobin": patient.hemoglobin,
+                "vitamin_d": patient.vitamin_d,
+                "fracture_risk": float(fracture_baseline[0]) if points else None,
+                "cvd_risk": float(cvd_baseline[0]) if points else None,
+            },
+            "columns": parameters + list(outputs),
+            "rows": [list(row) for row in zip(*table)],
+        }
+
+    def optimize(
+        self,
+        patient: NutritionPatient,
+        intervention: NutritionIntervention,
+        grid: Mapping[str, Sequence[float]],
+        targets: NutritionTargets,
+        max_evaluations: int = 1000,
+        max_seconds: float = 2.0,
+        artifacts: Optional[LoadedArtifacts] = None,
+    ) -> Dict[str, Any]:
+        artifacts = artifacts or self.registry.artifacts
+        started = time.perf_counter()
+        gl = artifacts.guidelines
+        parameters = list(grid)
+        base, columns = self._grid_columns(patient, intervention, {name: np.unique(grid[name]) for name in grid})
+        points = len(columns["age"])
+
+        # Rule constraints and the closed-form targets are checked for every
+        # candidate before the model sees any of them.
+        candidates = np.ones(points, dtype=bool)
+        pruned: Dict[str, int] = {}
+        for name, flagged in self._constraint_flags(columns, gl).items():
+            pruned[name] = int((candidates & flagged).sum())
+            candidates &= ~flagged
+
+        _, _, hemoglobin_change = self._iron_effect(columns, gl)
+        hemoglobin = np.where(
+            _given(columns["iron_mg"]), columns["hemoglobin"] + hemoglobin_change, columns["hemoglobin"]
+        )
+        vitamin_d = np.where(
+            _given(columns["vitamin_d_iu"]),
+            columns["vitamin_d"] + self._vitamin_d_effect(columns, gl),
+            columns["vitamin_d"],
+        )
+        meets = candidates.copy()
+        if targets.hemoglobin_min is not None:
+            meets &= hemoglobin >= targets.hemoglobin_min
+        if targets.vitamin_d_min is not None:
+            meets &= vitamin_d >= targets.vitamin_d_min
+        pruned["targets"] = int((candidates & ~meets).sum())
+
+        albumin_expected = np.full(points, np.nan)
+        albumin_change = np.full(points, np.nan)
+        model = (artifacts.albumin_bundle or {}).get("model")
+        pending = np.zeros(0)
+        evaluated = batches = 0
+        model_seconds = 0.0
+        model_failed = False
+        if model is not None and meets.any():
+            # Albumin depends only on the protein intake, so the model scores each
+            # distinct intake once, smallest first, in batches until the budget ends.
+            pipeline = artifacts.albumin_pipeline
+            row = pipeline.transform(base)[0]
+            protein = np.where(np.isnan(columns["protein_g"]), 50.0, columns["protein_g"])
+            pending = np.unique(protein[meets])
+            weeks = float(base["duration_weeks"][0])
+            while evaluated < len(pending):
+                if evaluated >= max_evaluations or time.perf_counter() - started >= max_seconds:
+                    break
+                batch = pending[evaluated : evaluated + min(OPTIMIZE_BATCH_SIZE, max_evaluations - evaluated)]
+                batch_started = time.perf_counter()
+                scores = self._albumin_scores(
+                    model,
+                    pipeline,
+                    pipeline.vary_protein(row, batch),
+                    np.full(len(batch), weeks),
+                    artifacts.generation,
+                    compiled=artifacts.albumin_compiled,
+                )
+                model_seconds += time.perf_counter() - batch_started
+                if scores is None:
+                    model_failed = True
+                    break
+                position = np.minimum(np.searchsorted(batch, protein), len(batch) - 1)
+                scored = meets & (batch[position] == protein)
+                albumin_expected[scored] = scores.expected[position[scored]]
+                albumin_change[scored] = scores.change[position[scored]]
+                evaluated += len(batch)
+                batches += 1
+
+        feasible = meets
+        if model is not None and not model_failed:
+            feasible = feasible & ~np.isnan(albumin_expected)
+        if targets.albumin_min is not None:
+            reached = feasible & (albumin_expected >= targets.albumin_min)
+            pruned["albumin_target"] = int((feasible & ~reached).sum())
+            feasible = reached
+
+        # Smallest doses first; a larger dose only stays on the front if it buys
+        # a higher expected albumin.
+        selected = np.flatnonzero(feasible)
+        costs = np.column_stack([np.nan_to_num(columns[name][selected]) for name in OPTIMIZE_COSTS])
+        gain = np.nan_to_num(albumin_expected[selected], nan=-np.inf)
+        front = selected[_pareto_front(costs, gain)]
+
+        outputs = {
+            "albumin_expected": albumin_expected,
+            "albumin_change": albumin_change,
+            "hemoglobin_expected": hemoglobin,
+            "vitamin_d_expected": vitamin_d,
+        }
+        entries = []
+        for index in front.tolist():
+            entry: Dict[str, Any] = {name: columns[name][index].item() for name in parameters}
+            entry["duration_weeks"] = int(columns["duration_weeks"][index])
+            for name, values in outputs.items():
+                entry[name] = None if np.isnan(values[index]) else values[index].item()
+            entries.append(entry)
+
+        return {
+            "source": "ml+rule" if model is not None and not model_failed else "rule-based",
+            "model_generation": artifacts.generation,
+            "parameters": parameters,
+            "targets": targets.model_dump(),
+            "recommended": entries[0] if entries else None,
+            "front": entries,
+            "stats": {
+                "candidates": points,
+                "pruned": pruned,
+                "feasible": int(feasible.sum()),
+                "model_evaluations": evaluated,
+                "model_batches": batches,
+                "unevaluated": int(len(pending) - evaluated),
+                "budget_exhausted": evaluated < len(pending) and not model_failed,
+                "model_ms": round(model_seconds * 1000.0, 3),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 3),
+            },
+        }
 
-        return NutritionSimResponse(source=source, results=results, warnings=warnings)  # type: ignore[arg-type]
+    def warm_up(self, artifacts: LoadedArtifacts) -> None:
+        self.simulate(WARMUP_PATIENT, WARMUP_INTERVENTION, artifacts)
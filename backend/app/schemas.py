@@ -1,13 +1,28 @@
 from __future__ import annotations
 
+import math
 from typing import Dict, List, Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, create_model, model_validator
 
 
 RiskLevel = Literal["critical", "high", "moderate", "low"]
 ImmuneSource = Literal["model", "fallback"]
+CohortGroup = Literal["room", "ward"]
 NutritionSource = Literal["ml+rule", "rule-based"]
+SweepParameter = Literal[
+    "protein_g",
+    "iron_mg",
+    "vitamin_d_iu",
+    "calcium_mg",
+    "omega3_epa_dha_g",
+    "vitamin_c_mg",
+    "duration_weeks",
+]
+
+OptimizeParameter = Literal["protein_g", "iron_mg", "vitamin_d_iu"]
+
+MAX_SWEEP_POINTS = 20000
 
 
 class ImmuneFeatures(BaseModel):
@@ -39,6 +54,44 @@ class ImmunePredictBatchRequest(BaseModel):
     items: List[ImmunePredictRequest] = Field(default_factory=list)
 
 
+# The six RR factors on their own, built from ImmuneFeatures' fields so the
+# bounds and defaults are declared once and the field order there is kept.
+ImmuneEnvironment = create_model(
+    "ImmuneEnvironment",
+    **{
+        name: (info.annotation, info)
+        for name, info in ImmuneFeatures.model_fields.items()
+        if name.endswith("_rr")
+    },
+)
+
+
+class ImmuneEnvironmentRequest(BaseModel):
+    resident_ids: List[str] = Field(default_factory=list)
+    environment: ImmuneEnvironment = Field(default_factory=ImmuneEnvironment)
+
+
+class ImmuneCohortItem(BaseModel):
+    resident_id: str
+    room: Optional[str] = None
+    ward: Optional[str] = None
+    features: ImmuneFeatures
+
+
+class ImmuneCohortRequest(BaseModel):
+    cohort: str = Field("default", min_length=1, max_length=64)
+    group_by: CohortGroup = "room"
+    top_k: int = Field(5, ge=0, le=100)
+    percentiles: List[float] = Field(default_factory=lambda: [10.0, 50.0, 90.0], max_length=10)
+    items: List[ImmuneCohortItem] = Field(default_factory=list)
+
+    @model_validator(mode="after")
+    def _check_percentiles(self) -> "ImmuneCohortRequest":
+        if any(not 0.0 <= value <= 100.0 for value in self.percentiles):
+            raise ValueError("percentiles must lie between 0 and 100")
+        return self
+
+
 class ImmunePredictResponse(BaseModel):
     resident_id: Optional[str] = None
     source: ImmuneSource
@@ -47,6 +100,7 @@ class ImmunePredictResponse(BaseModel):
     divs_score: float
     risk_level: RiskLevel
     used_features: Dict[str, float] = Field(default_factory=dict)
+    model_generation: Optional[int] = None
 
 
 class NutritionPatient(BaseModel):
@@ -93,6 +147,104 @@ class NutritionSimRequest(BaseModel):
     intervention: NutritionIntervention
 
 
+class NutritionSimBatchRequest(BaseModel):
+    items: List[NutritionSimRequest] = Field(default_factory=list)
+
+
+class SweepAxis(BaseModel):
+    values: Optional[List[float]] = None
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    step: Optional[float] = Field(None, gt=0)
+
+    @model_validator(mode="after")
+    def _check_axis(self) -> "SweepAxis":
+        if self.values is not None:
+            if not self.values:
+                raise ValueError("values must not be empty")
+            if not all(math.isfinite(value) for value in self.values):
+                raise ValueError("values must be finite")
+        elif self.start is None or self.stop is None or self.step is None:
+            raise ValueError("give either values or start, stop and step")
+        elif not all(math.isfinite(value) for value in (self.start, self.stop, self.step)):
+            raise ValueError("start, stop and step must be finite")
+        elif self.stop < self.start:
+            raise ValueError("stop must not be below start")
+        elif (self.stop - self.start) / self.step >= MAX_SWEEP_POINTS:
+            # Checked as a float: a huge span over a tiny step overflows int().
+            raise ValueError(f"axis has more than {MAX_SWEEP_POINTS} points")
+        return self
+
+    def size(self) -> int:
+        if self.values is not None:
+            return len(self.values)
+        steps = min((self.stop - self.start) / self.step, MAX_SWEEP_POINTS)  # type: ignore[operator]
+        return int(math.floor(steps + 1e-9)) + 1
+
+    def points(self) -> List[float]:
+        if self.values is not None:
+            return list(self.values)
+        return [round(self.start + self.step * index, 10) for index in range(self.size())]  # type: ignore[operator]
+
+
+class NutritionSweepRequest(BaseModel):
+    patient: NutritionPatient
+    intervention: NutritionIntervention = Field(default_factory=NutritionIntervention)
+    grid: Dict[SweepParameter, SweepAxis]
+
+    @model_validator(mode="after")
+    def _check_grid(self) -> "NutritionSweepRequest":
+        if not self.grid:
+            raise ValueError("grid must vary at least one intervention parameter")
+        size = math.prod(axis.size() for axis in self.grid.values())
+        if size > MAX_SWEEP_POINTS:
+            raise ValueError(f"grid has {size} points; at most {MAX_SWEEP_POINTS} are allowed")
+        duration = self.grid.get("duration_weeks")
+        if duration is not None and any(
+            value != int(value) or not 1 <= value <= 52 for value in duration.points()
+        ):
+            raise ValueError("duration_weeks values must be whole weeks between 1 and 52")
+        if any(
+            value < 0 for name, axis in self.grid.items() if name != "duration_weeks" for value in axis.points()
+        ):
+            raise ValueError("grid values must not be negative")
+        return self
+
+
+class NutritionTargets(BaseModel):
+    albumin_min: Optional[float] = Field(3.5, gt=0)
+    hemoglobin_min: Optional[float] = Field(None, gt=0)
+    vitamin_d_min: Optional[float] = Field(None, gt=0)
+
+
+def _default_optimize_grid() -> Dict[str, SweepAxis]:
+    return {
+        "protein_g": SweepAxis(start=20, stop=120, step=5),
+        "iron_mg": SweepAxis(values=[0, 30, 65, 100, 130, 200]),
+        "vitamin_d_iu": SweepAxis(values=[0, 400, 800, 1000, 2000, 4000]),
+    }
+
+
+class NutritionOptimizeRequest(BaseModel):
+    patient: NutritionPatient
+    intervention: NutritionIntervention = Field(default_factory=NutritionIntervention)
+    targets: NutritionTargets = Field(default_factory=NutritionTargets)
+    grid: Dict[OptimizeParameter, SweepAxis] = Field(default_factory=_default_optimize_grid)
+    max_evaluations: int = Field(1000, ge=1, le=MAX_SWEEP_POINTS)
+    max_seconds: float = Field(2.0, gt=0, le=30)
+
+    @model_validator(mode="after")
+    def _check_grid(self) -> "NutritionOptimizeRequest":
+        if not self.grid:
+            raise ValueError("grid must search at least one intervention parameter")
+        size = math.prod(axis.size() for axis in self.grid.values())
+        if size > MAX_SWEEP_POINTS:
+            raise ValueError(f"grid has {size} points; at most {MAX_SWEEP_POINTS} are allowed")
+        if any(value < 0 for axis in self.grid.values() for value in axis.points()):
+            raise ValueError("grid values must not be negative")
+        return self
+
+
 class NutritionResult(BaseModel):
     parameter: str
     current_value: Optional[float] = None
@@ -109,4 +261,5 @@ class NutritionSimResponse(BaseModel):
     source: NutritionSource
     results: Dict[str, NutritionResult] = Field(default_factory=dict)
     warnings: List[str] = Field(default_factory=list)
+    model_generation: Optional[int] = None
 
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .cache import row_keys
+from .features import IMMUNE_BASE_COLUMNS
+
+
+# SQLite's default bound-parameter limit is 999 on older builds.
+LOOKUP_CHUNK = 900
+# model_hash of rows scored by the fallback formula when no immune artifact is
+# loaded; artifact keys are hex SHA-256 digests or "stat:" keys, so it cannot collide.
+FALLBACK_MODEL_HASH = "fallback"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS immune_results (
+    resident_id TEXT PRIMARY KEY,
+    input_hash BLOB NOT NULL,
+    model_hash TEXT NOT NULL,
+    risk_probability REAL NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+@dataclass
+class StoreStats:
+    lookups: int = 0
+    reused: int = 0
+    scored: int = 0
+    # Environment rescoring reads stored rows without scoring the misses, so
+    # it is counted apart and reused + scored always equals lookups.
+    environment_lookups: int = 0
+    environment_reused: int = 0
+    writes: int = 0
+    invalidations: int = 0
+    errors: int = 0
+
+
+def input_digests(inputs: np.ndarray) -> List[bytes]:
+    # One digest per ImmuneFeatures row over the clinical columns only: the RR
+    # factors never reach the model (they only divide the score into
+    # divs_score), so an environment change keeps the stored probability valid.
+    clinical = inputs[:, : len(IMMUNE_BASE_COLUMNS)]
+    return [hashlib.blake2b(key, digest_size=16).digest() for key in row_keys(clinical)]
+
+
+class ResultStore:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.stats = StoreStats()
+        self.last_error: Optional[str] = None
+        self._generation = 0
+        self._lock = Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # One connection shared by the threadpool; the lock serializes use.
+        self._connection = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(_SCHEMA)
+
+    def _accepts(self, generation: int) -> bool:
+        # Rows carry the immune artifact hash and lookups filter on it, so a new
+        # immune model needs no wipe: its residents are rescored and their rows
+        # overwritten in place (one row per resident bounds the table). Requests
+        # still running on an older immune generation neither read nor write,
+        # so they cannot overwrite rows already rescored by the new model.
+        if generation > self._generation:
+            if self._generation:
+                self.stats.invalidations += 1
+            self._generation = generation
+        return generation == self._generation
+
+    def _failed(self, exc: sqlite3.Error) -> None:
+        self.stats.errors += 1
+        self.last_error = f"{type(exc).__name__}: {exc}"
+
+    def _fetch(
+        self, generation: int, model_hash: str, resident_ids: Sequence[Optional[str]]
+    ) -> Optional[Dict[str, Any]]:
+        # resident_id -> (input hash, probability); None when this generation
+        # may not read the store or SQLite failed.
+        wanted = sorted({resident_id for resident_id in resident_ids if resident_id is not None})
+        with self._lock:
+            try:
+                if not self._accepts(generation):
+                    return None
+                stored: Dict[str, Any] = {}
+                for start in range(0, len(wanted), LOOKUP_CHUNK):
+                    chunk = wanted[start : start + LOOKUP_CHUNK]
+                    rows = self._connection.execute(
+                        "SELECT resident_id, input_hash, risk_probability FROM immune_results "
+                        f"WHERE model_hash = ? AND resident_id IN ({','.join('?' * len(chunk))})",
+                        (model_hash, *chunk),
+                    )
+                    stored.update((resident_id, (digest, value)) for resident_id, digest, value in rows)
+            except sqlite3.Error as exc:
+                self._failed(exc)
+                return None
+        return stored
+
+    def lookup(
+        self,
+        generation: int,
+        model_hash: str,
+        resident_ids: Sequence[Optional[str]],
+        digests: Sequence[bytes],
+    ) -> np.ndarray:
+        # NaN marks rows that must be scored: no resident id, no stored row, or
+        # a stored row for other features or another model.
+        values = np.full(len(resident_ids), np.nan)
+        stored = self._fetch(generation, model_hash, resident_ids)
+        if stored is not None:
+            for index, (resident_id, digest) in enumerate(zip(resident_ids, digests)):
+                entry = stored.get(resident_id) if resident_id is not None else None
+                if entry is not None and entry[0] == digest:
+                    values[index] = entry[1]
+        reused = int(np.count_nonzero(~np.isnan(values)))
+        with self._lock:
+            self.stats.lookups += len(resident_ids)
+            self.stats.reused += reused
+            self.stats.scored += len(resident_ids) - reused
+        return values
+
+    def probabilities(self, generation: int, model_hash: str, resident_ids: Sequence[str]) -> np.ndarray:
+        # Latest stored probability per resident whatever their features were;
+        # NaN where nothing is stored for this model.
+        values = np.full(len(resident_ids), np.nan)
+        stored = self._fetch(generation, model_hash, resident_ids)
+        if stored is not None:
+            for index, resident_id in enumerate(resident_ids):
+                entry = stored.get(resident_id)
+                if entry is not None:
+                    values[index] = entry[1]
+        with self._lock:
+            self.stats.environment_lookups += len(resident_ids)
+            self.stats.environment_reused += int(np.count_nonzero(~np.isnan(values)))
+        return values
+
+    def save(
+        self,
+        generation: int,
+        model_hash: str,
+        resident_ids: Sequence[Optional[str]],
+        digests: Sequence[bytes],
+        values: np.ndarray,
+    ) -> None:
+        now = time.time()
+        rows = [
+            (resident_id, digest, model_hash, value, now)
+            for resident_id, digest, value in zip(resident_ids, digests, values.tolist())
+            if resident_id is not None and np.isfinite(value)
+        ]
+        if not rows:
+            return
+        with self._lock:
+            try:
+                if not self._accepts(generation):
+                    return
+                # One transaction per batch; autocommit would sync every row.
+                self._connection.execute("BEGIN")
+                self._connection.executemany(
+                    "INSERT INTO immune_results VALUES (?, ?, ?, ?, ?) ON CONFLICT(resident_id) DO UPDATE SET "
+                    "input_hash = excluded.input_hash, model_hash = excluded.model_hash, "
+                    "risk_probability = excluded.risk_probability, updated_at = excluded.updated_at",
+                    rows,
+                )
+                self._connection.execute("COMMIT")
+                self.stats.writes += len(rows)
+            except sqlite3.Error as exc:
+                if self._connection.in_transaction:
+                    self._connection.execute("ROLLBACK")
+                self._failed(exc)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def status(self) -> Dict[str, Any]:
+        stats = self.stats
+        with self._lock:
+            try:
+                (rows,) = self._connection.execute("SELECT COUNT(*) FROM immune_results").fetchone()
+            except sqlite3.Error:
+                rows = None
+        return {
+            "enabled": True,
+            "path": str(self.path),
+            "generation": self._generation,
+            "rows": rows,
+            "lookups": stats.lookups,
+            "reused": stats.reused,
+            "scored": stats.scored,
+            "reuse_rate": round(stats.reused / stats.lookups, 4) if stats.lookups else 0.0,
+            "environment_lookups": stats.environment_lookups,
+            "environment_reused": stats.environment_reused,
+            "writes": stats.writes,
+            "invalidations": stats.invalidations,
+            "errors": stats.errors,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+# Rows per traversal block: the (trees x rows) node matrix of a block stays
+# cache-sized, and larger batches are evaluated block by block.
+BLOCK_ROWS = 512
+PARITY_ROWS = 512
+PARITY_TOLERANCE = 1e-9
+
+
+@dataclass(frozen=True)
+class CompiledTrees:
+    # Every tree of the ensemble laid out in one set of flat node arrays, with
+    # the two children of a split stored next to each other (right = left + 1).
+    # Leaves point at themselves with an infinite threshold, so a fixed number
+    # of levels moves every row to its leaf without per-tree control flow.
+    kind: str
+    feature: np.ndarray
+    threshold: np.ndarray
+    left: np.ndarray
+    nan_left: np.ndarray
+    value: np.ndarray
+    roots: np.ndarray
+    depth: int
+    n_features: int
+    # Prediction = base + scale * sum of leaf values (summed tree by tree, in
+    # order, as the library does), divided by the tree count when averaging.
+    base: float = 0.0
+    scale: float = 1.0
+    average: bool = False
+    # sklearn compares float32 inputs; XGBoost also accumulates in float32
+    # and sends a row left on `value < threshold` instead of `<=`.
+    float32_inputs: bool = False
+    float32_sum: bool = False
+    strict: bool = False
+    # LightGBM clamps inputs to +-1e300 before comparing.
+    input_limit: Optional[float] = None
+    # sklearn trees given NaN follow rules the arrays do not encode.
+    allow_nan: bool = True
+
+    @property
+    def n_nodes(self) -> int:
+        return int(self.feature.shape[0])
+
+    def leaves(self, matrix: np.ndarray) -> np.ndarray:
+        rows = matrix.shape[0]
+        flat = matrix.ravel()
+        offsets = np.arange(rows) * matrix.shape[1]
+        node = np.repeat(self.roots[:, None], rows, axis=1)
+        has_nan = bool(np.isnan(flat).any())
+        for _ in range(self.depth):
+            values = flat.take(offsets + self.feature.take(node))
+            threshold = self.threshold.take(node)
+            go_right = values >= threshold if self.strict else values > threshold
+            if has_nan:
+                go_right |= np.isnan(values) & ~self.nan_left.take(node)
+            node = self.left.take(node) + go_right
+        return node
+
+    def _predict_block(self, matrix: np.ndarray) -> np.ndarray:
+        leaf_values = self.value.take(self.leaves(matrix))
+        if self.float32_sum:
+            start = np.full((1, matrix.shape[0]), self.base, dtype=np.float32)
+            terms = np.concatenate([start, leaf_values.astype(np.float32)])
+            return np.cumsum(terms, axis=0, dtype=np.float32)[-1].astype(np.float64)
+        if self.scale != 1.0:
+            leaf_values = self.scale * leaf_values
+        # cumsum adds strictly in tree order; sum() would use pairwise
+        # summation and differ from the libraries in the last bits.
+        start = np.full((1, matrix.shape[0]), self.base, dtype=np.float64)
+        total = np.cumsum(np.concatenate([start, leaf_values]), axis=0)[-1]
+        if self.average:
+            total = total / len(self.roots)
+        return total
+
+    def predict(self, matrix: np.ndarray) -> np.ndarray:
+        data = np.asarray(matrix, dtype=np.float64)
+        if data.ndim != 2 or data.shape[1] != self.n_features:
+            raise ValueError(f"expected {self.n_features} features, got shape {data.shape}")
+        if self.float32_inputs:
+            data = data.astype(np.float32).astype(np.float64)
+        if self.input_limit is not None:
+            data = np.clip(data, -self.input_limit, self.input_limit)
+        if not self.allow_nan and np.isnan(data).any():
+            raise ValueError("compiled trees do not handle missing values")
+        data = np.ascontiguousarray(data)
+        if data.shape[0] <= BLOCK_ROWS:
+            return self._predict_block(data)
+        return np.concatenate(
+            [self._predict_block(data[start : start + BLOCK_ROWS]) for start in range(0, data.shape[0], BLOCK_ROWS)]
+        )
+
+
+@dataclass
+class _Tree:
+    # One tree in the library's own node numbering; children are -1 at leaves.
+    feature: List[int]
+    threshold: List[float]
+    nan_left: List[bool]
+    value: List[float]
+    left: List[int]
+    right: List[int]
+
+
+class _Builder:
+    def __init__(self) -> None:
+        self.feature: List[int] = []
+        self.threshold: List[float] = []
+        self.left: List[int] = []
+        self.nan_left: List[bool] = []
+        self.value: List[float] = []
+        self.roots: List[int] = []
+        self.depth = 0
+
+    def _slot(self) -> int:
+        self.feature.append(0)
+        self.threshold.append(np.inf)
+        self.left.append(-1)
+        self.nan_left.append(True)
+        self.value.append(0.0)
+        return len(self.feature) - 1
+
+    def add_tree(self, tree: _Tree, root: int = 0) -> None:
+        # Breadth-first, allocating both children of a split as one pair.
+        position = {root: self._slot()}
+        self.roots.append(position[root])
+        level = [root]
+        depth = 0
+        while level:
+            following = []
+            for node in level:
+                index = position[node]
+                if tree.left[node] == -1:
+                    self.left[index] = index
+                    self.value[index] = tree.value[node]
+                    continue
+                self.feature[index] = tree.feature[node]
+                self.threshold[index] = tree.threshold[node]
+                self.nan_left[index] = tree.nan_left[node]
+                position[tree.left[node]] = self.left[index] = self._slot()
+                position[tree.right[node]] = self._slot()
+                following += [tree.left[node], tree.right[node]]
+            if following:
+                depth += 1
+            level = following
+        self.depth = max(self.depth, depth)
+
+    def build(self, kind: str, n_features: int, **options: Any) -> CompiledTrees:
+        return CompiledTrees(
+            kind=kind,
+            feature=np.asarray(self.feature, dtype=np.intp),
+            threshold=np.asarray(self.threshold, dtype=np.float64),
+            left=np.asarray(self.left, dtype=np.intp),
+            nan_left=np.asarray(self.nan_left, dtype=bool),
+            value=np.asarray(self.value, dtype=np.float64),
+            roots=np.asarray(self.roots, dtype=np.intp),
+            depth=self.depth,
+            n_features=n_features,
+            **options,
+        )
+
+
+def _sklearn_tree(tree: Any) -> _Tree:
+    return _Tree(
+        feature=tree.feature.tolist(),
+        threshold=tree.threshold.tolist(),
+        nan_left=[False] * tree.node_count,
+        value=tree.value[:, 0, 0].tolist(),
+        left=tree.children_left.tolist(),
+        right=tree.children_right.tolist(),
+    )
+
+
+def _sklearn_model(model: Any) -> Optional[CompiledTrees]:
+    from sklearn.dummy import DummyRegressor
+    from sklearn.ensemble import ExtraTreesRegressor, GradientBoostingRegressor, RandomForestRegressor
+    from sklearn.tree import DecisionTreeRegressor, ExtraTreeRegressor
+
+    builder = _Builder()
+    options: Dict[str, Any] = {"float32_inputs": True, "allow_nan": False}
+    if isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+        if model.n_outputs_ != 1:
+            return None
+        for estimator in model.estimators_:
+            builder.add_tree(_sklearn_tree(estimator.tree_))
+        options["average"] = True
+        kind = "sklearn-forest"
+    elif isinstance(model, (DecisionTreeRegressor, ExtraTreeRegressor)):
+        if model.n_outputs_ != 1:
+            return None
+        builder.add_tree(_sklearn_tree(model.tree_))
+        kind = "sklearn-tree"
+    elif isinstance(model, GradientBoostingRegressor):
+        if model.init_ == "zero":
+            base = 0.0
+        elif isinstance(model.init_, DummyRegressor):
+            base = float(np.asarray(model.init_.constant_, dtype=np.float64).ravel()[0])
+        else:
+            return None
+        for stage in model.estimators_[:, 0]:
+            builder.add_tree(_sklearn_tree(stage.tree_))
+        options.update(base=base, scale=float(model.learning_rate))
+        kind = "sklearn-gbm"
+    else:
+        return None
+    return builder.build(kind, int(model.n_features_in_), **options)
+
+
+def _xgboost_model(model: Any) -> Optional[CompiledTrees]:
+    if getattr(model, "objective", None) != "reg:squarederror" or getattr(model, "best_iteration", None) is not None:
+        return None
+    document = json.loads(model.get_booster().save_raw(raw_format="json"))
+    learner = document["learner"]
+    booster = learner["gradient_booster"]
+    if booster.get("name") != "gbtree":
+        return None
+    builder = _Builder()
+    for tree in booster["model"]["trees"]:
+        # Thresholds and leaf values are float32 in XGBoost.
+        conditions = np.asarray(tree["split_conditions"], dtype=np.float32).astype(np.float64).tolist()
+        builder.add_tree(
+            _Tree(
+                feature=tree["split_indices"],
+                threshold=conditions,
+                nan_left=[bool(flag) for flag in tree["default_left"]],
+                value=conditions,
+                left=tree["left_children"],
+                right=tree["right_children"],
+            )
+        )
+    base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+    return builder.build(
+        "xgboost",
+        int(learner["learner_model_param"]["num_feature"]),
+        base=float(np.float32(base_score)),
+        float32_inputs=True,
+        float32_sum=True,
+        strict=True,
+    )
+
+
+def _lightgbm_tree(root: Dict[str, Any]) -> _Tree:
+    tree = _Tree([], [], [], [], [], [])
+
+    def visit(node: Dict[str, Any]) -> int:
+        index = len(tree.feature)
+        for values in (tree.feature, tree.threshold, tree.nan_left, tree.value, tree.left, tree.right):
+            values.append(-1 if values is tree.left or values is tree.right else 0)
+        if "leaf_value" in node:
+            tree.value[index] = float(node["leaf_value"])
+            return index
+        if node.get("decision_type") != "<=" or node.get("missing_type") == "Zero":
+            raise ValueError("unsupported LightGBM split")
+        threshold = float(node["threshold"])
+        tree.feature[index] = int(node["split_feature"])
+        tree.threshold[index] = threshold
+        # With no missing type LightGBM reads NaN as 0.0.
+        tree.nan_left[index] = bool(node["default_left"]) if node.get("missing_type") == "NaN" else 0.0 <= threshold
+        tree.left[index] = visit(node["left_child"])
+        tree.right[index] = visit(node["right_child"])
+        return index
+
+    visit(root)
+    return tree
+
+
+def _lightgbm_model(model: Any) -> Optional[CompiledTrees]:
+    if getattr(model, "objective_", None) not in {"regression", "regression_l1", "huber", "quantile"}:
+        return None
+    document = model.booster_.dump_model()
+    if document.get("num_tree_per_iteration", 1) != 1:
+        return None
+    builder = _Builder()
+    try:
+        for tree in document["tree_info"]:
+            builder.add_tree(_lightgbm_tree(tree["tree_structure"]))
+    except (KeyError, ValueError):
+        return None
+    return builder.build(
+        "lightgbm",
+        int(document["max_feature_idx"]) + 1,
+        average=bool(document.get("average_output", False)),
+        input_limit=1e300,
+    )
+
+
+def compile_trees(model: Any) -> Optional[CompiledTrees]:
+    package = type(model).__module__.split(".", 1)[0]
+    try:
+        if package == "sklearn":
+            return _sklearn_model(model)
+        if package == "xgboost":
+            return _xgboost_model(model)
+        if package == "lightgbm":
+            return _lightgbm_model(model)
+    except Exception:
+        return None
+    return None
+
+
+def parity_rows(compiled: CompiledTrees, rows: int = PARITY_ROWS, seed: int = 0) -> np.ndarray:
+    # Generated inputs that land on, just below and just above the split
+    # thresholds the trees actually use, so every comparison edge (including
+    # the float32 rounding of the inputs) is exercised, not only typical rows.
+    rng = np.random.default_rng(seed)
+    matrix = np.zeros((rows, compiled.n_features), dtype=np.float64)
+    splits = compiled.left != np.arange(compiled.n_nodes)
+    for feature in range(compiled.n_features):
+        thresholds = np.unique(compiled.threshold[splits & (compiled.feature == feature)])
+        if thresholds.size == 0:
+            continue
+        candidates = np.concatenate(
+            [thresholds, np.nextafter(thresholds, -np.inf), np.nextafter(thresholds, np.inf), thresholds + 0.5]
+        )
+        matrix[:, feature] = rng.choice(candidates, size=rows)
+    return matrix
+
+
+def check_parity(compiled: CompiledTrees, model: Any, rows: int = PARITY_ROWS) -> Optional[str]:
+    # None when the compiled trees reproduce model.predict on the generated
+    # rows, otherwise the reason they cannot replace it.
+    matrix = parity_rows(compiled, rows)
+    try:
+        expected = np.asarray(model.predict(matrix), dtype=np.float64).ravel()
+        actual = compiled.predict(matrix)
+    except Exception as exc:
+        return f"{type(exc).__name__}: {exc}"
+    if expected.shape != actual.shape:
+        return f"shape {actual.shape} differs from {expected.shape}"
+    difference = float(np.max(np.abs(expected - actual))) if expected.size else 0.0
+    if not difference <= PARITY_TOLERANCE * max(1.0, float(np.max(np.abs(expected)))):
+        return f"max difference {difference:.3g} from {type(model).__name__}.predict"
+    return None
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import time
+from threading import Event, Thread
+from typing import Any, Dict, Optional, Tuple
+
+from .model_registry import ModelRegistry
+
+
+class ArtifactWatcher:
+    def __init__(self, registry: ModelRegistry, interval_s: float = 5.0) -> None:
+        self.registry = registry
+        self.interval_s = max(interval_s, 0.1)
+        self.checks = 0
+        self.reloads = 0
+        self.last_change_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._applied: Optional[Tuple[Tuple[str, int, int], ...]] = None
+        self._pending: Optional[Tuple[Tuple[str, int, int], ...]] = None
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="artifact-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_s + 1.0)
+        self._thread = None
+
+    def check(self) -> bool:
+        # Stat polling is the cheap trigger; the registry then compares content
+        # hashes, so a touched-but-identical file does not publish a new snapshot.
+        self.checks += 1
+        try:
+            refreshed = self.registry.refresh()
+            self.last_error = None
+        except Exception as exc:
+            self.last_error = f"{exc}"
+            return False
+        if refreshed is None:
+            return False
+        self.reloads += 1
+        self.last_change_at = time.time()
+        return True
+
+    def poll(self) -> bool:
+        # A change is only acted on once the signature holds for a whole
+        # interval, so a file still being copied in is not loaded half-written.
+        current = self.registry.stat_signature()
+        if self._applied is None:
+            self._applied = self._pending = current
+            return False
+        if current != self._pending:
+            self._pending = current
+            return False
+        if current == self._applied:
+            return False
+        self._applied = current
+        return self.check()
+
+    def _run(self) -> None:
+        self.poll()
+        while not self._stop.wait(self.interval_s):
+            self.poll()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "running": self.running,
+            "interval_s": self.interval_s,
+            "checks": self.checks,
+            "reloads": self.reloads,
+            "last_change_at": self.last_change_at,
+            "last_error": self.last_error,
+        }
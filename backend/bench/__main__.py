@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import argparse
+import os
+import platform
+import sys
+import time
+import warnings
+from pathlib import Path
+from typing import List, Optional
+
+# Repeated identical requests would otherwise be answered from the prediction
+# cache and the benchmark would time cache lookups, not the model.
+os.environ.setdefault("IMMUNE_CACHE_SIZE", "0")
+# Version-skew warnings from unpickling the shipped artifacts would repeat on every reload.
+warnings.filterwarnings("ignore", module="sklearn")
+
+import numpy as np  # noqa: E402
+import sklearn  # noqa: E402
+
+from .runner import Budget, Report, compare, format_comparison, format_table, load_report, save_report  # noqa: E402
+from .scenarios import Workload, models_loaded, run_direct, run_http, run_registry  # noqa: E402
+
+
+DEFAULT_PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_SIZES = "10,100,1000,5000"
+
+
+def _sizes(value: str) -> List[int]:
+    return sorted({int(part) for part in value.split(",") if part.strip()})
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Model backend benchmarks")
+    parser.add_argument("--project-root", type=Path, default=DEFAULT_PROJECT_ROOT)
+    parser.add_argument("--sizes", type=_sizes, default=_sizes(DEFAULT_SIZES), help="batch sizes, comma separated")
+    parser.add_argument("--suites", default="direct,http,registry", help="any of direct, http, registry")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-seconds", type=float, default=1.0, help="time budget per scenario")
+    parser.add_argument("--min-iterations", type=int, default=5)
+    parser.add_argument("--max-iterations", type=int, default=200)
+    parser.add_argument("--output", type=Path, help="write this run's results as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare against a JSON file written by --output")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before a scenario fails")
+    args = parser.parse_args(argv)
+
+    suites = {name.strip() for name in args.suites.split(",") if name.strip()}
+    budget = Budget(args.min_iterations, args.max_iterations, args.max_seconds)
+    report = Report(
+        meta={
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "project_root": str(args.project_root),
+            "models": models_loaded(args.project_root),
+            "sizes": args.sizes,
+            "seed": args.seed,
+        }
+    )
+
+    workload = Workload(max(args.sizes + [1]), args.seed)
+    if "direct" in suites:
+        run_direct(report, workload, args.project_root, args.sizes, budget)
+    if "http" in suites:
+        run_http(report, workload, args.project_root, args.sizes, budget)
+    if "registry" in suites:
+        run_registry(report, args.project_root, budget)
+
+    print(format_table(report.results))
+    for key, reason in report.skipped.items():
+        print(f"skipped {key}: {reason}")
+    if args.output is not None:
+        save_report(report, args.output)
+        print(f"wrote {args.output}")
+
+    if args.baseline is None:
+        return 0
+    baseline = load_report(args.baseline)
+    print()
+    for key in ("project_root", "models", "cpu_count", "python"):
+        if baseline.get("meta", {}).get(key) != report.meta[key]:
+            print(f"note: baseline {key} {baseline.get('meta', {}).get(key)!r} differs from {report.meta[key]!r}")
+    rows = compare(report, baseline, args.threshold)
+    print(format_comparison(rows, args.threshold))
+    return 1 if any(row["regressed"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
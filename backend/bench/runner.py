@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import gc
+import json
+import os
+import platform
+import resource
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class Measurement:
+    name: str
+    path: str
+    batch_size: int
+    iterations: int
+    rows_per_s: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    alloc_peak_kb: float
+    alloc_retained_kb: float
+    rss_mb: float
+    source: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}[{self.path},n={self.batch_size}]"
+
+
+@dataclass
+class Budget:
+    min_iterations: int = 5
+    max_iterations: int = 200
+    max_seconds: float = 1.0
+    warmup: int = 2
+
+
+@dataclass
+class Report:
+    meta: Dict[str, Any] = field(default_factory=dict)
+    results: List[Measurement] = field(default_factory=list)
+    skipped: Dict[str, str] = field(default_factory=dict)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "meta": self.meta,
+            "results": {result.key: asdict(result) for result in self.results},
+            "skipped": self.skipped,
+        }
+
+
+def rss_mb() -> float:
+    # Current resident set from /proc where available, otherwise the peak.
+    try:
+        with open("/proc/self/statm") as handle:
+            pages = int(handle.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if platform.system() == "Darwin" else peak / 2**10
+
+
+def _allocations(call: Callable[[], Any]) -> Tuple[float, float]:
+    # Traced separately from the timed loop: tracemalloc slows allocation-heavy
+    # code several-fold and would distort the latencies.
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = call()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return (peak - before) / 1024.0, (after - before) / 1024.0
+
+
+def measure(
+    name: str,
+    path: str,
+    batch_size: int,
+    call: Callable[[], Any],
+    budget: Budget,
+    source: Optional[str] = None,
+) -> Measurement:
+    for _ in range(budget.warmup):
+        call()
+
+    samples: List[float] = []
+    gc.collect()
+    started = time.perf_counter()
+    while len(samples) < budget.min_iterations or (
+        len(samples) < budget.max_iterations and time.perf_counter() - started < budget.max_seconds
+    ):
+        begin = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - begin)
+
+    latencies = np.asarray(samples) * 1000.0
+    alloc_peak_kb, alloc_retained_kb = _allocations(call)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return Measurement(
+        name=name,
+        path=path,
+        batch_size=batch_size,
+        iterations=len(samples),
+        rows_per_s=round(batch_size * len(samples) / float(np.sum(latencies) / 1000.0), 1),
+        p50_ms=round(float(p50), 4),
+        p95_ms=round(float(p95), 4),
+        p99_ms=round(float(p99), 4),
+        mean_ms=round(float(latencies.mean()), 4),
+        alloc_peak_kb=round(alloc_peak_kb, 1),
+        alloc_retained_kb=round(alloc_retained_kb, 1),
+        rss_mb=round(rss_mb(), 1),
+        source=source,
+    )
+
+
+def load_report(path: Path) -> Dict[str, Any]:
+    with path.open(encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def save_report(report: Report, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as handle:
+        json.dump(report.to_json(), handle, indent=2, ensure_ascii=False)
+        handle.write("\n")
+
+
+def compare(report: Report, baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    # A scenario regresses when its median latency grows, or its throughput
+    # drops, by more than `threshold` relative to the baseline run.
+    previous = baseline.get("results", {})
+    rows = []
+    for result in report.results:
+        old = previous.get(result.key)
+        if old is None:
+            continue
+        p50_ratio = result.p50_ms / old["p50_ms"] if old["p50_ms"] else float("inf")
+        throughput_ratio = result.rows_per_s / old["rows_per_s"] if old["rows_per_s"] else float("inf")
+        rows.append(
+            {
+                "key": result.key,
+                "p50_ms": (old["p50_ms"], result.p50_ms),
+                "rows_per_s": (old["rows_per_s"], result.rows_per_s),
+                "p50_ratio": round(p50_ratio, 3),
+                "throughput_ratio": round(throughput_ratio, 3),
+                "regressed": p50_ratio > 1.0 + threshold or throughput_ratio < 1.0 - threshold,
+            }
+        )
+    return rows
+
+
+def format_table(results: List[Measurement]) -> str:
+    header = (
+        f"{'scenario':58} {'iters':>6} {'rows/s':>12} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}"
+        f" {'alloc KB':>10} {'rss MB':>8}"
+    )
+    lines = [header, "-" * len(header)]
+    for result in results:
+        lines.append(
+            f"{result.key:58} {result.iterations:>6} {result.rows_per_s:>12,.0f} {result.p50_ms:>10.3f}"
+            f" {result.p95_ms:>10.3f} {result.p99_ms:>10.3f} {result.alloc_peak_kb:>10,.0f} {result.rss_mb:>8.1f}"
+        )
+    return "\n".join(lines)
+
+
+def format_comparison(rows: List[Dict[str, Any]], threshold: float) -> str:
+    lines = [f"{'scenario':58} {'p50 old -> new':>24} {'x':>7} {'rows/s x':>9}"]
+    for row in rows:
+        old, new = row["p50_ms"]
+        flag = "  REGRESSION" if row["regressed"] else ""
+        lines.append(
+            f"{row['key']:58} {old:>10.3f} -> {new:<10.3f} {row['p50_ratio']:>7.2f} {row['throughput_ratio']:>9.2f}{flag}"
+        )
+    regressed = sum(row["regressed"] for row in rows)
+    lines.append(f"{regressed} of {len(rows)} scenarios regressed by more than {threshold:.0%}")
+    return "\n".join(lines)
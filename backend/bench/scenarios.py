@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import itertools
+import json
+import tempfile
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+from fastapi.testclient import TestClient
+
+from app.model_registry import ModelRegistry
+from app.predictors import ImmunePredictor, NutritionPredictor
+
+from .runner import Budget, Report, measure
+from .synthetic import immune_frame, immune_inputs, immune_payloads, nutrition_frame, nutrition_inputs, nutrition_payloads
+
+
+JSON_HEADERS = {"content-type": "application/json"}
+
+
+class Workload:
+    def __init__(self, rows: int, seed: int) -> None:
+        immune = immune_frame(rows, seed)
+        nutrition = nutrition_frame(rows, seed)
+        self.immune_inputs = immune_inputs(immune)
+        self.immune_payloads = immune_payloads(immune)
+        self.nutrition_inputs = nutrition_inputs(nutrition)
+        self.nutrition_payloads = nutrition_payloads(nutrition)
+
+
+def _cycle(values: Sequence[Any]) -> Iterator[Any]:
+    return itertools.cycle(values)
+
+
+def _body(payload: Any) -> bytes:
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def _poster(client: TestClient, url: str, bodies: Iterator[bytes]) -> Callable[[], Any]:
+    def call() -> Any:
+        response = client.post(url, content=next(bodies), headers=JSON_HEADERS)
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} answered {response.status_code}: {response.text[:200]}")
+        return response
+
+    return call
+
+
+def _modes(project_root: Path, empty_root: Path) -> List[Tuple[str, str, Path]]:
+    # (immune path, nutrition path, artifact root): the empty root has no
+    # artifacts, so both predictors take their fallback / rule-only paths.
+    return [("model", "ml+rule", project_root), ("fallback", "rule-based", empty_root)]
+
+
+def _suite(
+    report: Report,
+    group: str,
+    path: str,
+    source: str,
+    single: Tuple[str, Callable[[], Any]],
+    batch: Tuple[str, Callable[[int], Callable[[], Any]]],
+    sizes: Sequence[int],
+    budget: Budget,
+) -> None:
+    # The probe's source tells which path the artifacts actually select; a
+    # model path without its artifact is reported as skipped, not timed.
+    if source != path:
+        report.skipped[f"{group}[{path}]"] = f"artifacts under this root give the {source} path"
+        return
+    name, call = single
+    report.results.append(measure(f"{group}.{name}", path, 1, call, budget, source))
+    name, make_call = batch
+    for size in sizes:
+        report.results.append(measure(f"{group}.{name}", path, size, make_call(size), budget, source))
+
+
+def run_direct(
+    report: Report, workload: Workload, project_root: Path, sizes: Sequence[int], budget: Budget
+) -> None:
+    with tempfile.TemporaryDirectory() as empty:
+        for immune_path, nutrition_path, root in _modes(project_root, Path(empty)):
+            registry = ModelRegistry(root)
+            immune = ImmunePredictor(registry)
+            nutrition = NutritionPredictor(registry)
+            registry.register_warmup(immune.warm_up)
+            registry.register_warmup(nutrition.warm_up)
+            registry.ensure_loaded()
+
+            residents = _cycle(workload.immune_inputs)
+            _suite(
+                report,
+                "direct.immune",
+                immune_path,
+                immune.predict(*workload.immune_inputs[0]).source,
+                ("predict", lambda: immune.predict(*next(residents))),
+                ("predict_batch", lambda size: partial(immune.predict_batch, workload.immune_inputs[:size])),
+                sizes,
+                budget,
+            )
+            patients = _cycle(workload.nutrition_inputs)
+            _suite(
+                report,
+                "direct.nutrition",
+                nutrition_path,
+                nutrition.simulate(*workload.nutrition_inputs[0]).source,
+                ("simulate", lambda: nutrition.simulate(*next(patients))),
+                ("simulate_batch", lambda size: partial(nutrition.simulate_batch, workload.nutrition_inputs[:size])),
+                sizes,
+                budget,
+            )
+
+
+def run_http(
+    report: Report, workload: Workload, project_root: Path, sizes: Sequence[int], budget: Budget
+) -> None:
+    from app import main
+
+    immune_bodies = [_body(item) for item in workload.immune_payloads]
+    nutrition_bodies = [_body(item) for item in workload.nutrition_payloads]
+
+    def batches(url: str, payloads: Sequence[Any]) -> Callable[[int], Callable[[], Any]]:
+        return lambda size: _poster(client, url, itertools.repeat(_body({"items": payloads[:size]})))
+
+    with tempfile.TemporaryDirectory() as empty, TestClient(main.app) as client:
+        try:
+            for immune_path, nutrition_path, root in _modes(project_root, Path(empty)):
+                main.registry.project_root = root
+                main.registry.reload()
+
+                probe = client.post("/api/immune/predict", content=immune_bodies[0], headers=JSON_HEADERS)
+                _suite(
+                    report,
+                    "http.immune",
+                    immune_path,
+                    probe.json()["source"],
+                    ("predict", _poster(client, "/api/immune/predict", _cycle(immune_bodies))),
+                    ("predict_batch", batches("/api/immune/predict/batch", workload.immune_payloads)),
+                    sizes,
+                    budget,
+                )
+                probe = client.post("/api/nutrition/simulate", content=nutrition_bodies[0], headers=JSON_HEADERS)
+                _suite(
+                    report,
+                    "http.nutrition",
+                    nutrition_path,
+                    probe.json()["source"],
+                    ("simulate", _poster(client, "/api/nutrition/simulate", _cycle(nutrition_bodies))),
+                    ("simulate_batch", batches("/api/nutrition/simulate/batch", workload.nutrition_payloads)),
+                    sizes,
+                    budget,
+                )
+        finally:
+            main.registry.project_root = project_root
+
+
+def run_registry(report: Report, project_root: Path, budget: Budget) -> None:
+    registry = ModelRegistry(project_root)
+    registry.register_warmup(ImmunePredictor(registry).warm_up)
+    registry.register_warmup(NutritionPredictor(registry).warm_up)
+    registry.ensure_loaded()
+    # Every reload re-reads the artifacts; refresh() only stats them (hashing
+    # files whose size or mtime moved) and publishes nothing when none changed.
+    report.results.append(measure("registry.reload", "full", 1, registry.reload, budget))
+    report.results.append(measure("registry.refresh", "unchanged", 1, registry.refresh, budget))
+
+
+def models_loaded(project_root: Path) -> Dict[str, bool]:
+    registry = ModelRegistry(project_root)
+    registry.ensure_loaded()
+    return registry.status()["loaded"]
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.schemas import ImmuneFeatures, NutritionIntervention, NutritionPatient
+
+
+MODELING_DIR = Path(__file__).resolve().parents[2] / "modeling"
+IMMUNE_SAMPLE = MODELING_DIR / "sample_immune.csv"
+NUTRITION_SAMPLE = MODELING_DIR / "sample_nutrition.csv"
+
+# Rough prevalence in a long-term care population; enough to exercise every
+# branch of the feature pipeline and the fallback score.
+IMMUNE_FLAG_RATES = {
+    "dementia_yn": 0.45,
+    "parkinson_yn": 0.08,
+    "chf_yn": 0.15,
+    "ckd_yn": 0.2,
+    "copd_yn": 0.12,
+    "cancer_yn": 0.1,
+    "steroid_yn": 0.05,
+    "immunosup_yn": 0.04,
+    "antipsychotic_yn": 0.25,
+}
+IMMUNE_RR_COLUMNS = ("temp_rr", "season_rr", "hum_rr", "outbreak_rr", "room_rr", "epi_rr")
+
+def sample_columns(path: Path) -> List[str]:
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def _names(rng: np.random.Generator, rows: int) -> np.ndarray:
+    family = np.array(["김", "이", "박", "최", "정", "강", "윤", "장"], dtype=object)
+    given = np.array(["미경", "영자", "순자", "정희", "철수", "영수", "옥순", "만복"], dtype=object)
+    return family[rng.integers(0, len(family), rows)] + given[rng.integers(0, len(given), rows)]
+
+
+def _ages(rng: np.random.Generator, rows: int) -> np.ndarray:
+    return np.clip(np.rint(rng.normal(83.0, 7.0, rows)), 60, 104).astype(np.int64)
+
+
+def immune_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(
+        {
+            "resident_id": [f"r-{index:06d}" for index in range(rows)],
+            "name": _names(rng, rows),
+            "room": [f"{floor}{number:02d}호" for floor, number in zip(rng.integers(1, 6, rows), rng.integers(1, 21, rows))],
+            "age": _ages(rng, rows),
+            "gender": rng.choice(np.array(["여", "남", "F", "M"], dtype=object), rows, p=[0.5, 0.2, 0.2, 0.1]),
+        }
+    )
+    for name, rate in IMMUNE_FLAG_RATES.items():
+        frame[name] = (rng.random(rows) < rate).astype(np.int64)
+    for name in IMMUNE_RR_COLUMNS:
+        # Most residents sit at the neutral 1.0; a minority carry an elevated factor.
+        elevated = rng.random(rows) < 0.3
+        frame[name] = np.where(elevated, np.round(rng.uniform(1.05, 1.8, rows), 2), 1.0)
+    return frame[sample_columns(IMMUNE_SAMPLE)]
+
+
+def nutrition_frame(rows: int, seed: int = 0, extended: bool = True) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(
+        {
+            "resident_id": [f"r-{index:06d}" for index in range(rows)],
+            "name": _names(rng, rows),
+            "age": _ages(rng, rows),
+            "sex": rng.choice(np.array(["F", "M"], dtype=object), rows, p=[0.7, 0.3]),
+            "albumin": np.round(np.clip(rng.normal(3.4, 0.4, rows), 2.0, 4.8), 1),
+            "ckd_stage": rng.choice(np.arange(6), rows, p=[0.45, 0.2, 0.15, 0.12, 0.06, 0.02]),
+            "glucose": np.rint(np.clip(rng.normal(110.0, 25.0, rows), 60, 300)),
+            "protein_g": rng.choice(np.arange(40, 95, 5), rows).astype(np.float64),
+            "duration_weeks": rng.choice(np.array([4, 8, 12]), rows),
+        }
+    )
+    frame = frame[sample_columns(NUTRITION_SAMPLE)]
+    if not extended:
+        return frame
+
+    def sometimes(values: np.ndarray, rate: float) -> np.ndarray:
+        return np.where(rng.random(rows) < rate, values, np.nan)
+
+    # Labs and supplements beyond the sample file's header, so the ml+rule path
+    # evaluates every guideline rule rather than only albumin.
+    frame["hemoglobin"] = np.round(np.clip(rng.normal(11.8, 1.5, rows), 7.0, 16.0), 1)
+    frame["ferritin"] = np.rint(np.clip(rng.lognormal(4.0, 0.8, rows), 5, 800))
+    frame["vitamin_d"] = np.round(np.clip(rng.normal(22.0, 8.0, rows), 4.0, 80.0), 1)
+    frame["crp"] = np.round(np.clip(rng.lognormal(0.5, 1.0, rows), 0.1, 80.0), 1)
+    frame["smoker"] = rng.random(rows) < 0.1
+    frame["iron_mg"] = sometimes(rng.choice(np.array([30.0, 65.0, 100.0]), rows), 0.4)
+    frame["vitamin_d_iu"] = sometimes(rng.choice(np.array([800.0, 1000.0, 2000.0, 5000.0]), rows), 0.6)
+    frame["calcium_mg"] = sometimes(rng.choice(np.array([500.0, 1000.0]), rows), 0.4)
+    frame["omega3_epa_dha_g"] = sometimes(rng.choice(np.array([1.0, 2.0]), rows), 0.3)
+    frame["vitamin_c_mg"] = sometimes(rng.choice(np.array([100.0, 500.0, 1000.0, 2500.0]), rows), 0.3)
+    return frame
+
+
+def _record(row: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    # JSON payload values: NaN means "not given", numpy scalars become Python ones.
+    values = {}
+    for name in fields:
+        value = row.get(name)
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            continue
+        values[name] = value.item() if isinstance(value, np.generic) else value
+    return values
+
+
+def immune_payloads(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    return [
+        {"resident_id": row["resident_id"], "features": _record(row, ImmuneFeatures.model_fields)}
+        for row in frame.to_dict("records")
+    ]
+
+
+def nutrition_payloads(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    return [
+        {
+            "patient": _record(row, NutritionPatient.model_fields),
+            "intervention": _record(row, NutritionIntervention.model_fields),
+        }
+        for row in frame.to_dict("records")
+    ]
+
+
+def immune_inputs(frame: pd.DataFrame) -> List[Tuple[Optional[str], ImmuneFeatures]]:
+    return [(item["resident_id"], ImmuneFeatures(**item["features"])) for item in immune_payloads(frame)]
+
+
+def nutrition_inputs(frame: pd.DataFrame) -> List[Tuple[NutritionPatient, NutritionIntervention]]:
+    return [
+        (NutritionPatient(**item["patient"]), NutritionIntervention(**item["intervention"]))
+        for item in nutrition_payloads(frame)
+    ]
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Iterator
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+# Tests compare model outputs across endpoints; cached rows would hide differences.
+os.environ.setdefault("IMMUNE_CACHE_SIZE", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import main  # noqa: E402
+from app.features import IMMUNE_FEATURE_COLUMNS  # noqa: E402
+from app.model_registry import ModelRegistry  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client() -> Iterator[TestClient]:
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def model_root(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    # The repo ships no immune artifact, so train a small one under a
+    # throwaway project root laid out like the real one.
+    from sklearn.ensemble import GradientBoostingClassifier
+
+    rng = np.random.default_rng(0)
+    rows = 2000
+    frame = pd.DataFrame(
+        rng.integers(0, 2, size=(rows, len(IMMUNE_FEATURE_COLUMNS))).astype(float), columns=IMMUNE_FEATURE_COLUMNS
+    )
+    frame["AGE"] = rng.integers(60, 100, rows).astype(float)
+    frame["AGE_SQ"] = frame["AGE"] ** 2
+    labels = (rng.random(rows) < 1.0 / (1.0 + np.exp(-(frame["AGE"] - 80.0) / 10.0 - frame["CHF_YN"]))).astype(int)
+    model = GradientBoostingClassifier(n_estimators=50, max_depth=3, random_state=0).fit(frame, labels)
+
+    root = tmp_path_factory.mktemp("project")
+    artifacts = root / "modeling" / "artifacts"
+    artifacts.mkdir(parents=True)
+    joblib.dump(
+        {"model": model, "feature_names": list(IMMUNE_FEATURE_COLUMNS)}, artifacts / "divs_immune_model_v7.joblib"
+    )
+    return root
+
+
+@pytest.fixture(params=["model", "fallback"])
+def immune_source(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> str:
+    # Points the app's immune predictor at the trained root or the shipped one.
+    if request.param == "model":
+        registry = ModelRegistry(request.getfixturevalue("model_root"))
+        monkeypatch.setattr(main.immune_predictor, "registry", registry)
+    return request.param
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# Values where a rule switches branch: CRP > 5, ferritin < 30, glucose >= 126,
+# albumin < 3.0 / 3.5, vitamin D >= 800 and UL 4000, omega-3 >= 1.0, the vitamin C
+# bands and male threshold, and the protein cut-offs.
+BOUNDARIES: Dict[str, Tuple[float, ...]] = {
+    "crp": (5.0,),
+    "ferritin": (30.0,),
+    "glucose": (126.0,),
+    "albumin": (3.0, 3.5),
+    "vitamin_d_iu": (800.0, 4000.0),
+    "omega3_epa_dha_g": (1.0,),
+    "vitamin_c_mg": (100.0, 150.0, 200.0, 500.0, 1000.0, 2000.0),
+    "protein_g": (40.0, 60.0),
+}
+IMMUNE_FLAGS = (
+    "dementia_yn",
+    "parkinson_yn",
+    "chf_yn",
+    "ckd_yn",
+    "copd_yn",
+    "cancer_yn",
+    "steroid_yn",
+    "immunosup_yn",
+    "antipsychotic_yn",
+)
+IMMUNE_RR = ("temp_rr", "season_rr", "hum_rr", "outbreak_rr", "room_rr", "epi_rr")
+
+
+def _value(rng: np.random.Generator, name: str, low: float, high: float, digits: int) -> float:
+    edges = BOUNDARIES.get(name)
+    if edges and rng.random() < 0.15:
+        return edges[int(rng.integers(len(edges)))]
+    return round(float(rng.uniform(low, high)), digits)
+
+
+def nutrition_patients(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    # Patients with random gaps in every optional lab and every CKD stage, each
+    # with a random subset of the interventions (including explicit zero doses).
+    rng = np.random.default_rng(seed)
+    labs = {
+        "hemoglobin": (8.0, 15.0),
+        "ferritin": (10.0, 400.0),
+        "tsat": (5.0, 45.0),
+        "albumin": (2.2, 4.8),
+        "vitamin_d": (5.0, 60.0),
+        "calcium": (7.5, 11.0),
+        "crp": (0.1, 20.0),
+        "bun": (5.0, 80.0),
+        "creatinine": (0.3, 6.0),
+        "glucose": (60.0, 250.0),
+        "sodium": (125.0, 150.0),
+        "potassium": (3.0, 6.0),
+        "chloride": (90.0, 115.0),
+        "bicarbonate": (15.0, 30.0),
+        "wbc": (2.0, 20.0),
+        "platelet": (50.0, 450.0),
+    }
+    doses = {
+        "iron_mg": (0.0, 200.0),
+        "vitamin_d_iu": (0.0, 6000.0),
+        "calcium_mg": (0.0, 2000.0),
+        "omega3_epa_dha_g": (0.0, 4.0),
+        "vitamin_c_mg": (0.0, 3000.0),
+        "protein_g": (0.0, 120.0),
+    }
+    flags = ("smoker", "immune_compromised", "chronic_inflammation", "kidney_stone_history", "hemochromatosis")
+    patients = []
+    for index in range(count):
+        patient: Dict[str, Any] = {
+            "age": int(rng.integers(50, 101)),
+            "sex": "M" if rng.random() < 0.5 else "F",
+            "ckd_stage": index % 6,
+        }
+        for name, (low, high) in labs.items():
+            patient[name] = None if rng.random() < 0.3 else _value(rng, name, low, high, 2)
+        for name in flags + ("hypercalcemia", "fracture_risk_high"):
+            patient[name] = bool(rng.random() < 0.2)
+        intervention: Dict[str, Any] = {"duration_weeks": int(rng.integers(1, 27))}
+        for name, (low, high) in doses.items():
+            draw = rng.random()
+            if draw < 0.4:
+                intervention[name] = None
+            elif draw < 0.45:
+                intervention[name] = 0.0
+            else:
+                intervention[name] = _value(rng, name, low, high, 1)
+        patients.append({"patient": patient, "intervention": intervention})
+    return patients
+
+
+def immune_residents(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    # Ages on and around the 65/75/85 bins, every flag combination in reach and
+    # environment factors that push the clamp at both ends.
+    rng = np.random.default_rng(seed)
+    residents = []
+    for index in range(count):
+        if rng.random() < 0.2:
+            age = float(rng.choice([64.0, 65.0, 74.5, 75.0, 85.0, 100.0]))
+        else:
+            age = round(float(rng.uniform(40.0, 110.0)), 1)
+        features: Dict[str, Any] = {"age": age, "gender": str(rng.choice(["M", "F", "남", "여"]))}
+        for name in IMMUNE_FLAGS:
+            features[name] = int(rng.random() < 0.3)
+        extreme = rng.random() < 0.1
+        for name in IMMUNE_RR:
+            features[name] = round(float(rng.uniform(0.1, 3.0) if extreme else rng.uniform(0.8, 1.6)), 2)
+        residents.append({"resident_id": f"r{index}", "features": features})
+    return residents
@@ -0,0 +1,325 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, Mapping, Optional
+
+import numpy as np
+
+from app.schemas import ImmuneFeatures, NutritionIntervention, NutritionPatient, NutritionResult
+
+# Per-resident reference implementations of the immune fallback and the nutrition
+# rules, written the way the service computed them one request at a time. The
+# column-wise engine in app.predictors must reproduce them exactly.
+
+ALBUMIN_LAB_DEFAULTS = {
+    "hemoglobin": 13.0,
+    "bun": 20.0,
+    "creatinine": 1.0,
+    "glucose": 100.0,
+    "sodium": 140.0,
+    "potassium": 4.0,
+    "chloride": 105.0,
+    "bicarbonate": 24.0,
+    "wbc": 8.0,
+    "platelet": 250.0,
+}
+
+
+def clamp(value: float, minimum: float, maximum: float) -> float:
+    return max(minimum, min(maximum, value))
+
+
+def risk_level(divs_score: float) -> str:
+    if divs_score < 30.0:
+        return "critical"
+    if divs_score < 50.0:
+        return "high"
+    if divs_score < 70.0:
+        return "moderate"
+    return "low"
+
+
+def immune_features(features: ImmuneFeatures) -> Dict[str, float]:
+    row = {
+        "AGE": float(features.age),
+        "GENDER": 1.0 if features.gender in {"M", "남"} else 0.0,
+        "DEMENTIA_YN": float(features.dementia_yn),
+        "PARKINSON_YN": float(features.parkinson_yn),
+        "CHF_YN": float(features.chf_yn),
+        "CKD_YN": float(features.ckd_yn),
+        "COPD_YN": float(features.copd_yn),
+        "CANCER_YN": float(features.cancer_yn),
+        "STEROID_YN": float(features.steroid_yn),
+        "IMMUNOSUP_YN": float(features.immunosup_yn),
+        "ANTIPSYCHOTIC_YN": float(features.antipsychotic_yn),
+    }
+    age = row["AGE"]
+    frailty_index = float((age >= 75) and (row["DEMENTIA_YN"] == 1.0 or row["PARKINSON_YN"] == 1.0))
+    disease_burden = row["CHF_YN"] + row["CKD_YN"] + row["COPD_YN"] + row["CANCER_YN"]
+    if age < 65:
+        age_bin = 0.0
+    elif age < 75:
+        age_bin = 1.0
+    elif age < 85:
+        age_bin = 2.0
+    else:
+        age_bin = 3.0
+    row.update(
+        {
+            "FRAILTY_INDEX": frailty_index,
+            "SEVERE_IMMUNE_LOW": float(
+                (row["CANCER_YN"] == 1.0) and (row["STEROID_YN"] == 1.0 or row["IMMUNOSUP_YN"] == 1.0)
+            ),
+            "DISEASE_BURDEN": disease_burden,
+            "AGE_BIN": age_bin,
+            "AGE_SQ": age**2,
+            "AGE_x_DISEASE": age * disease_burden,
+            "AGE_x_FRAILTY": age * frailty_index,
+        }
+    )
+    factors = [
+        features.temp_rr,
+        features.season_rr,
+        features.hum_rr,
+        features.outbreak_rr,
+        features.room_rr,
+        features.epi_rr,
+    ]
+    row["ENV_RR"] = clamp(float(math.prod(factors) ** (1.0 / len(factors))), 0.5, 2.5)
+    return row
+
+
+def fallback_probability(row: Mapping[str, float]) -> float:
+    risk = (
+        0.12
+        + max(row["AGE"] - 65.0, 0.0) * 0.007
+        + row["DISEASE_BURDEN"] * 0.08
+        + row["FRAILTY_INDEX"] * 0.06
+        + row["SEVERE_IMMUNE_LOW"] * 0.08
+        + row["STEROID_YN"] * 0.04
+        + row["IMMUNOSUP_YN"] * 0.06
+        + row["ANTIPSYCHOTIC_YN"] * 0.02
+    )
+    return clamp(float(risk), 0.05, 0.95)
+
+
+def immune_fallback(resident_id: Optional[str], features: ImmuneFeatures) -> Dict[str, Any]:
+    used = immune_features(features)
+    risk_probability = clamp(fallback_probability(used), 0.0, 1.0)
+    immunity_score = clamp((1.0 - risk_probability) * 100.0, 0.0, 100.0)
+    divs_score = clamp(immunity_score / used["ENV_RR"], 0.0, 100.0)
+    return {
+        "resident_id": resident_id,
+        "source": "fallback",
+        "risk_probability": round(risk_probability, 4),
+        "immunity_score": round(immunity_score, 2),
+        "divs_score": round(divs_score, 2),
+        "risk_level": risk_level(divs_score),
+        "used_features": used,
+    }
+
+
+def albumin_features(patient: NutritionPatient, intervention: NutritionIntervention) -> Dict[str, float]:
+    age = float(patient.age)
+    sex_m = 1.0 if patient.sex == "M" else 0.0
+    glucose = float(patient.glucose if patient.glucose is not None else ALBUMIN_LAB_DEFAULTS["glucose"])
+    ckd = 1.0 if patient.ckd_stage >= 3 else 0.0
+    diabetes = 1.0 if glucose >= 126.0 else 0.0
+    initial_albumin = float(patient.albumin if patient.albumin is not None else 3.5)
+    protein_intake = float(intervention.protein_g if intervention.protein_g is not None else 50.0)
+    cci = ckd + diabetes
+
+    features: Dict[str, float] = {"age": age, "sex_M": sex_m}
+    for name, default in ALBUMIN_LAB_DEFAULTS.items():
+        value = getattr(patient, name)
+        features[name] = float(value if value is not None else default)
+    features["bun_creatinine_ratio"] = features["bun"] / max(features["creatinine"], 0.1)
+    features.update(
+        {
+            "AGE": age,
+            "GENDER": sex_m,
+            "CKD": ckd,
+            "DIABETES": diabetes,
+            "CCI": cci,
+            "INITIAL_ALBUMIN": initial_albumin,
+            "PROTEIN_INTAKE": protein_intake,
+        }
+    )
+    weight_proxy = age * 0.5 + 50.0
+    features["protein_per_kg"] = protein_intake / weight_proxy
+    features["high_protein"] = 1.0 if protein_intake > 60.0 else 0.0
+    features["low_protein"] = 1.0 if protein_intake < 40.0 else 0.0
+    features["low_baseline_albumin"] = 1.0 if initial_albumin < 3.5 else 0.0
+    features["very_low_baseline"] = 1.0 if initial_albumin < 3.0 else 0.0
+    features["CKD_protein"] = ckd * protein_intake
+    features["DIABETES_protein"] = diabetes * protein_intake
+    features["baseline_protein"] = initial_albumin * protein_intake
+    features["CKD_baseline"] = ckd * initial_albumin
+    features["elderly"] = 1.0 if age > 75.0 else 0.0
+    features["AGE_CKD"] = age * ckd
+    features["high_risk"] = 1.0 if (ckd == 1.0 or diabetes == 1.0 or initial_albumin < 3.0) else 0.0
+    features["comorbidity_count"] = cci
+    features["protein_squared"] = protein_intake**2
+    features["protein_log"] = float(np.log1p(protein_intake))
+    features["albumin_squared"] = initial_albumin**2
+    features["albumin_log"] = float(np.log(max(initial_albumin, 0.1)))
+    features["cci"] = features["CCI"]
+    features["ckd_protein"] = features["CKD_protein"]
+    features["diabetes_protein"] = features["DIABETES_protein"]
+    features["ckd_baseline"] = features["CKD_baseline"]
+    features["age_ckd"] = features["AGE_CKD"]
+    return features
+
+
+def _result(parameter: str, interpretation: str, model_type: str = "rule-based", **values: Any) -> Dict[str, Any]:
+    result = NutritionResult(parameter=parameter, interpretation=interpretation, model_type=model_type, **values)
+    return result.model_dump()
+
+
+def nutrition_simulate(
+    patient: NutritionPatient,
+    intervention: NutritionIntervention,
+    gl: Mapping[str, Any],
+    albumin_prediction: Optional[float],
+) -> Dict[str, Any]:
+    # albumin_prediction is the model output for albumin_features(), or None
+    # when no albumin model is loaded.
+    results: Dict[str, Dict[str, Any]] = {}
+
+    if albumin_prediction is not None:
+        current = patient.albumin if patient.albumin is not None else 3.5
+        protein_g = intervention.protein_g if intervention.protein_g is not None else 50.0
+        duration_factor = max(min(float(intervention.duration_weeks) / 4.0, 2.0), 0.25)
+        adjustment = albumin_prediction * duration_factor
+        results["albumin"] = _result(
+            "Albumin",
+            f"ML 예측: 단백질 {protein_g}g/day, {intervention.duration_weeks}주",
+            model_type="ml",
+            current_value=current,
+            expected_value=current + adjustment,
+            expected_change=adjustment,
+            warnings=["CKD: 고단백 주의"] if patient.ckd_stage >= 3 else [],
+            monitoring_recommendations=["4주 후 알부민 재검사", "신기능 모니터링"],
+        )
+
+    if intervention.iron_mg:
+        factor = 1.0
+        warnings = []
+        if patient.ckd_stage >= 3:
+            factor *= float(gl["iron"]["ckd_absorption_factor"])
+            warnings.append("CKD: 흡수율 ↓30%")
+        if patient.chronic_inflammation or (patient.crp is not None and patient.crp > 5):
+            factor *= float(gl["iron"]["inflammation_factor"])
+            warnings.append("염증: 효과 감소")
+        change = (
+            float(gl["iron"]["baseline_hgb_increase"])
+            * factor
+            * (float(intervention.iron_mg) / 100.0)
+            * (float(intervention.duration_weeks) / 4.0)
+        )
+        results["hemoglobin"] = _result(
+            "Hemoglobin",
+            f"철분 {intervention.iron_mg}mg/day, {intervention.duration_weeks}주 → Hgb +{change:.1f} g/dL",
+            current_value=patient.hemoglobin,
+            expected_value=patient.hemoglobin + change if patient.hemoglobin is not None else None,
+            expected_change=change,
+            warnings=warnings,
+            monitoring_recommendations=["4주 후 CBC", "Ferritin/TSAT 추적"],
+        )
+
+    if intervention.vitamin_d_iu:
+        time_factor = min(float(intervention.duration_weeks) / 12.0, 1.0)
+        increase = (
+            (float(intervention.vitamin_d_iu) / 1000.0) * float(gl["vitamin_d"]["increase_per_1000iu"]) * time_factor
+        )
+        warnings = []
+        if float(intervention.vitamin_d_iu) > float(gl["vitamin_d"]["upper_limit_iu"]):
+            upper_limit = gl["vitamin_d"]["upper_limit_iu"]
+            warnings.append(f"UL 초과: {intervention.vitamin_d_iu} > {upper_limit} IU/day")
+        results["vitamin_d"] = _result(
+            "Vitamin D",
+            f"비타민 D {intervention.vitamin_d_iu} IU/day, {intervention.duration_weeks}주 → +{increase:.1f} ng/mL",
+            current_value=patient.vitamin_d,
+            expected_value=patient.vitamin_d + increase if patient.vitamin_d is not None else None,
+            expected_change=increase,
+            warnings=warnings,
+            monitoring_recommendations=["3개월 후 25(OH)D", "칼슘 모니터링"],
+        )
+
+    if intervention.calcium_mg:
+        baseline_risk = 0.20 if patient.fracture_risk_high else 0.10
+        vitd_ok = bool(intervention.vitamin_d_iu and intervention.vitamin_d_iu >= 800)
+        reduction = float(gl["calcium"]["fracture_risk_reduction"]) if vitd_ok else 0.0
+        expected = baseline_risk * (1.0 - reduction)
+        results["fracture_risk"] = _result(
+            "Fracture Risk",
+            f"칼슘 {intervention.calcium_mg}mg + VitD {intervention.vitamin_d_iu} IU → 골절 위험 -15%"
+            if vitd_ok
+            else f"칼슘 {intervention.calcium_mg}mg (VitD 병용 권장)",
+            current_value=baseline_risk,
+            expected_value=expected,
+            expected_change=-(baseline_risk - expected),
+            monitoring_recommendations=["DEXA 골밀도", "낙상 위험 평가"],
+        )
+
+    if intervention.omega3_epa_dha_g:
+        baseline_cvd = 0.15 if patient.age >= 70 else 0.10
+        dose = float(intervention.omega3_epa_dha_g)
+        reduction = float(gl["omega3"]["cvd_risk_reduction"]) if dose >= 1.0 else 0.0
+        expected = baseline_cvd * (1.0 - reduction)
+        results["cvd_risk"] = _result(
+            "CVD Risk",
+            f"오메가-3 {dose}g/day → CVD 위험 -8%"
+            if dose >= 1.0
+            else f"오메가-3 {dose}g/day (1.0g 이상 권장)",
+            current_value=baseline_cvd,
+            expected_value=expected,
+            expected_change=-(baseline_cvd - expected),
+            monitoring_recommendations=["지질 프로필", "출혈 경향 (항응고제 복용 시)"],
+        )
+
+    if intervention.vitamin_c_mg:
+        vit_c = gl["vitamin_c"]
+        dose = float(intervention.vitamin_c_mg)
+        warnings = []
+        contraindications = []
+        monitoring = []
+        optimal_low, optimal_high = vit_c["optimal_range"]
+        if dose < vit_c["rni"]:
+            interp = f"{dose}mg/day - 권장섭취량 미달 (결핍 위험)"
+        elif dose < optimal_low:
+            interp = f"{dose}mg/day - 권장섭취량 충족"
+        elif dose <= optimal_high:
+            interp = f"{dose}mg/day - 최적 범위 (항산화, 면역 지원)"
+        elif dose <= vit_c["upper_limit"]:
+            interp = f"{dose}mg/day - 고용량이나 안전 범위"
+            warnings.append("1000mg↑ 시 분할 복용 권장")
+        else:
+            interp = f"{dose}mg/day - UL 초과 (설사, 위장 불편)"
+            warnings.append(f"UL {vit_c['upper_limit']}mg 초과")
+        if patient.smoker and dose < 150:
+            warnings.append("흡연자 → +50-100mg 권장 (150-200mg/day)")
+        if patient.immune_compromised and dose < 200:
+            warnings.append("면역저하 → 200-500mg/day 권장")
+        if patient.sex == "M" and dose >= vit_c["kidney_stone_risk_threshold_male"]:
+            if patient.kidney_stone_history:
+                contraindications.append("신결석 병력 남성: ≥1000mg 금기 (위험 2배↑)")
+            else:
+                warnings.append("남성 ≥1000mg: 신결석 위험↑")
+        if patient.hemochromatosis:
+            contraindications.append("혈색소침착증: VitC가 철분 흡수↑")
+        if patient.ferritin is not None and patient.ferritin < 30:
+            monitoring.append("철결핍 빈혈: VitC+철분 병용 시 흡수 67%↑")
+        results["vitamin_c"] = _result(
+            "Vitamin C Status",
+            interp,
+            warnings=warnings,
+            contraindications=contraindications,
+            monitoring_recommendations=monitoring,
+        )
+
+    return {
+        "source": "ml+rule" if albumin_prediction is not None else "rule-based",
+        "results": results,
+        "warnings": [] if results else ["중재 계획 값이 없어 시뮬레이션 결과가 비어 있습니다."],
+    }
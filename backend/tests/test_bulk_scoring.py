@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import io
+import json
+
+import pandas as pd
+
+from app.predictors import LIST_SEPARATOR, NUTRITION_RESULTS
+
+from .patients import nutrition_patients
+
+
+def _upload(items) -> bytes:
+    rows = [
+        {"resident_id": f"r{index}", **item["patient"], **item["intervention"]} for index, item in enumerate(items)
+    ]
+    buffer = io.StringIO()
+    pd.DataFrame(rows).to_csv(buffer, index=False)
+    return buffer.getvalue().encode("utf-8")
+
+
+def test_nutrition_file_matches_simulate_row_by_row(client):
+    items = nutrition_patients(120)
+    response = client.post(
+        "/api/nutrition/simulate/file?format=ndjson", content=_upload(items), headers={"content-type": "text/csv"}
+    )
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == len(items)
+
+    for index, (item, row) in enumerate(zip(items, rows)):
+        expected = client.post("/api/nutrition/simulate", json=item).json()
+        assert row["resident_id"] == f"r{index}"
+        assert row["source"] == expected["source"]
+        assert row["model_generation"] == expected["model_generation"]
+        assert row["warnings"] == LIST_SEPARATOR.join(expected["warnings"])
+        for name in NUTRITION_RESULTS:
+            result = expected["results"].get(name)
+            if result is None:
+                assert all(row[key] is None for key in row if key.startswith(f"{name}_")), (index, name)
+                continue
+            assert row[f"{name}_current"] == result["current_value"], (index, name)
+            assert row[f"{name}_expected"] == result["expected_value"], (index, name)
+            assert row[f"{name}_change"] == result["expected_change"], (index, name)
+            assert row[f"{name}_interpretation"] == result["interpretation"], (index, name)
+            assert row[f"{name}_model_type"] == result["model_type"], (index, name)
+            for field in ("warnings", "contraindications", "monitoring_recommendations"):
+                assert row[f"{name}_{field}"] == LIST_SEPARATOR.join(result[field]), (index, name, field)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from threading import Thread
+
+from app.cohort import Cohort, CohortRegistry
+
+from .patients import immune_residents
+
+
+def _roster(name: str):
+    residents = immune_residents(12, seed=2)
+    items = [{**resident, "room": "101" if index == 0 else "102"} for index, resident in enumerate(residents)]
+    return {"cohort": name, "group_by": "room", "top_k": 3, "percentiles": [50], "items": items}
+
+
+def test_moving_the_last_resident_reports_the_empty_group(client):
+    roster = _roster("moves")
+    created = client.post("/api/immune/cohort", json=roster)
+    assert created.status_code == 200
+    assert [group["group"] for group in created.json()["groups"]] == ["101", "102"]
+
+    moved = {**roster["items"][0], "room": "102"}
+    response = client.post("/api/immune/cohort/moves/residents", json=moved)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["partial"] is True
+    empty, joined = body["groups"]
+    assert empty == {
+        "group": "101",
+        "residents": 0,
+        "risk_levels": {"critical": 0, "high": 0, "moderate": 0, "low": 0},
+        "divs_mean": None,
+        "divs_percentiles": {"p50": None},
+        "top_risk": [],
+    }
+    assert (joined["group"], joined["residents"]) == ("102", 12)
+
+    full = client.get("/api/immune/cohort/moves").json()
+    assert [group["group"] for group in full["groups"]] == ["102"]
+
+
+def _cohort(name: str = "east") -> Cohort:
+    return Cohort(name, "room", 3, [50.0])
+
+
+def test_replacing_a_cohort_waits_for_the_update_holding_it():
+    registry = CohortRegistry()
+    old, new = _cohort(), _cohort()
+    registry.put(old)
+    with registry.locked("east") as held:
+        assert held is old
+        replacing = Thread(target=registry.put, args=(new,))
+        replacing.start()
+        replacing.join(0.2)
+        assert replacing.is_alive()
+        assert registry.get("east") is old
+    replacing.join(5)
+    assert not replacing.is_alive()
+    assert old.retired and not new.retired
+    with registry.locked("east") as current:
+        assert current is new
+
+
+def test_update_waiting_on_a_replaced_cohort_moves_to_the_new_one(monkeypatch):
+    registry = CohortRegistry()
+    old, new = _cohort(), _cohort()
+    registry.put(old)
+    registry.put(new)
+    # The update looked the name up just before the replacement.
+    lookups = iter([old])
+    monkeypatch.setattr(registry, "get", lambda name: next(lookups, None) or CohortRegistry.get(registry, name))
+    with registry.locked("east") as current:
+        assert current is new
+    with registry.locked("west") as missing:
+        assert missing is None
+
+
+def test_evicted_cohorts_are_retired():
+    registry = CohortRegistry(max_cohorts=1)
+    first, second = _cohort("a"), _cohort("b")
+    registry.put(first)
+    registry.put(second)
+    assert first.retired and registry.get("a") is None
+
+
+def test_evicting_a_cohort_waits_for_the_update_holding_it():
+    registry = CohortRegistry(max_cohorts=1)
+    first, second = _cohort("a"), _cohort("b")
+    registry.put(first)
+    with registry.locked("a") as held:
+        assert held is first
+        evicting = Thread(target=registry.put, args=(second,))
+        evicting.start()
+        evicting.join(0.2)
+        assert evicting.is_alive()
+        assert not first.retired
+    evicting.join(5)
+    assert not evicting.is_alive()
+    assert first.retired and registry.get("b") is second
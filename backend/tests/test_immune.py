@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import json
+import shutil
+
+import joblib
+import numpy as np
+import pytest
+
+from app import main
+from app.encoding import immune_response, items_body, ndjson_lines
+from app.features import ImmuneFeaturePipeline
+from app.model_registry import ModelRegistry
+from app.predictors import ImmunePredictor, ImmuneScores
+from app.schemas import ImmuneFeatures
+from app.store import ResultStore
+
+from .patients import immune_residents
+
+
+def _dumps(value) -> str:
+    # What JSONResponse renders for an already serialized model.
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"))
+
+
+def test_batch_matches_repeated_single_predictions(client, immune_source):
+    residents = immune_residents(150, seed=7)
+    residents[0]["resident_id"] = None
+    batch = client.post("/api/immune/predict/batch", json={"items": residents})
+    assert batch.status_code == 200
+    items = batch.json()["items"]
+    assert len(items) == len(residents)
+
+    for resident, item in zip(residents, items):
+        single = client.post("/api/immune/predict", json=resident)
+        assert single.status_code == 200
+        assert item == single.json()
+        assert item["source"] == immune_source
+
+    lines = client.post(
+        "/api/immune/predict/batch", json={"items": residents}, headers={"accept": "application/x-ndjson"}
+    )
+    assert [json.loads(line) for line in lines.text.splitlines()] == items
+
+
+@pytest.mark.parametrize("path", ["/api/immune/predict", "/api/immune/predict/batch"])
+def test_fast_json_bytes_match_pydantic_rendering(client, immune_source, monkeypatch, path):
+    residents = immune_residents(60, seed=3)
+    residents[1]["resident_id"] = 'quote " back\\slash 한글'
+    body = residents[0] if path == "/api/immune/predict" else {"items": residents}
+
+    fast = client.post(path, json=body)
+    monkeypatch.setattr(main, "FAST_JSON_ENDPOINTS", frozenset())
+    slow = client.post(path, json=body)
+    assert fast.status_code == slow.status_code == 200
+    assert fast.headers["content-type"] == slow.headers["content-type"]
+    assert fast.content == slow.content
+
+
+def test_encoders_match_json_dumps():
+    residents = immune_residents(400, seed=11)
+    features = [ImmuneFeatures(**resident["features"]) for resident in residents]
+    ids = [resident["resident_id"] for resident in residents]
+    ids[:3] = [None, 'a"b\\c\n', "환자-1"]
+    scores = ImmunePredictor(ModelRegistry()).score_batch(features, ids)
+    # Signed zeros, tiny and huge values and integral floats each have their
+    # own repr; make sure all of them reach the encoder.
+    scores.features[:4, 0] = [-0.0, 5e-324, 1.7976931348623157e308, 100.0]
+
+    for include_features in (True, False):
+        responses = scores.responses(ids, include_features)
+        expected = [_dumps(response.model_dump(mode="json")) for response in responses]
+        assert scores.json_items(ids, include_features) == expected
+        assert [immune_response(response) for response in responses] == expected
+        payload = {"items": [response.model_dump(mode="json") for response in responses], "scored": 3, "reused": 1}
+        assert items_body(expected, {"scored": 3, "reused": 1}) == _dumps(payload).encode("utf-8")
+        assert ndjson_lines(expected) == "".join(line + "\n" for line in expected).encode("utf-8")
+
+    scores.features[0, 0] = np.nan
+    with pytest.raises(ValueError):
+        scores.json_items(ids)
+
+
+def _score(predictor: ImmunePredictor, features, ids, artifacts=None) -> ImmuneScores:
+    return predictor.score_inputs(ImmuneFeaturePipeline.inputs(features), artifacts, ids)
+
+
+def test_result_store_reuses_until_the_immune_model_changes(model_root, tmp_path):
+    root = tmp_path / "project"
+    shutil.copytree(model_root, root)
+    registry = ModelRegistry(root)
+    store = ResultStore(tmp_path / "results.sqlite")
+    predictor = ImmunePredictor(registry, store=store)
+    residents = immune_residents(200, seed=5)
+    features = [ImmuneFeatures(**resident["features"]) for resident in residents]
+    ids = [resident["resident_id"] for resident in residents]
+
+    first = _score(predictor, features, ids)
+    assert first.source == "model"
+    assert (first.reused, first.scored) == (0, 200)
+
+    again = _score(predictor, features, ids)
+    assert (again.reused, again.scored) == (200, 0)
+    assert again.risk_probability.tolist() == first.risk_probability.tolist()
+
+    # Environment factors never reach the model, so they keep the stored row;
+    # clinical changes do not.
+    changed = list(features)
+    changed[0] = features[0].model_copy(update={"temp_rr": 2.5})
+    changed[1] = features[1].model_copy(update={"age": features[1].age + 1.0, "chf_yn": 1 - features[1].chf_yn})
+    partial = _score(predictor, changed, ids)
+    assert (partial.reused, partial.scored) == (199, 1)
+
+    # A reload that leaves the immune artifact as it was keeps the stored rows
+    # (resident 1 was last stored with its changed features).
+    registry.reload()
+    assert _score(predictor, features, ids).reused == 199
+
+    previous = registry.artifacts
+    path = root / "modeling" / "artifacts" / "divs_immune_model_v7.joblib"
+    joblib.dump({**joblib.load(path), "version": 2}, path)
+    registry.refresh()
+    reloaded = _score(predictor, features, ids)
+    # Nothing was deleted: every row was rescored under the new hash in place.
+    assert store.status()["rows"] == 200
+    assert reloaded.generation == previous.generation + 1
+    assert (reloaded.reused, reloaded.scored) == (0, 200)
+    assert reloaded.risk_probability.tolist() == first.risk_probability.tolist()
+    assert store.status()["invalidations"] == 1
+    assert _score(predictor, features, ids).reused == 200
+
+    # Requests still running on the old snapshot neither read nor write.
+    writes = store.status()["writes"]
+    stale = _score(predictor, features, ids, previous)
+    assert (stale.reused, stale.generation) == (0, previous.generation)
+    assert store.status()["writes"] == writes
+    assert _score(predictor, features, ids).reused == 200
+    status = store.status()
+    assert status["lookups"] == status["reused"] + status["scored"] == 8 * 200
+    store.close()
+
+
+def test_fallback_scores_are_looked_up_before_they_are_written(tmp_path):
+    store = ResultStore(tmp_path / "results.sqlite")
+    predictor = ImmunePredictor(ModelRegistry(), store=store)
+    residents = immune_residents(120, seed=13)
+    features = [ImmuneFeatures(**resident["features"]) for resident in residents]
+    ids = [resident["resident_id"] for resident in residents]
+
+    first = _score(predictor, features, ids)
+    assert (first.source, first.reused, first.scored) == ("fallback", 0, 120)
+    again = _score(predictor, features, ids)
+    assert (again.reused, again.scored) == (120, 0)
+    assert again.risk_probability.tolist() == first.risk_probability.tolist()
+    assert store.status()["writes"] == 120
+    store.close()
+
+
+def test_environment_rescoring_matches_batch(client, immune_source, monkeypatch, tmp_path):
+    store = ResultStore(tmp_path / "results.sqlite")
+    monkeypatch.setattr(main, "result_store", store)
+    monkeypatch.setattr(main.immune_predictor, "store", store)
+    residents = immune_residents(80, seed=9)
+    assert client.post("/api/immune/predict/batch", json={"items": residents}).status_code == 200
+
+    environment = {"temp_rr": 1.0, "season_rr": 1.1, "hum_rr": 1.0, "outbreak_rr": 1.8, "room_rr": 1.2, "epi_rr": 1.0}
+    ids = [resident["resident_id"] for resident in residents] + ["unknown"]
+    rescored = client.post("/api/immune/environment", json={"resident_ids": ids, "environment": environment})
+    assert rescored.status_code == 200
+    assert rescored.json()["missing"] == ["unknown"]
+
+    for resident in residents:
+        resident["features"].update(environment)
+    batch = client.post("/api/immune/predict/batch?include_features=false", json={"items": residents})
+    assert rescored.json()["items"] == batch.json()["items"]
+    assert {item["source"] for item in rescored.json()["items"]} == {immune_source}
+    status = store.status()
+    assert (status["environment_lookups"], status["environment_reused"]) == (81, 80)
+    assert status["lookups"] == status["reused"] + status["scored"]
+    store.close()
+
+
+def test_environment_without_store_is_unavailable(client, monkeypatch):
+    monkeypatch.setattr(main, "result_store", None)
+    response = client.post("/api/immune/environment", json={"resident_ids": ["r0"]})
+    assert response.status_code == 503
+
+
+@pytest.mark.parametrize("value", [0.0, 3.5])
+def test_environment_factors_use_feature_bounds(client, value):
+    response = client.post("/api/immune/environment", json={"resident_ids": ["r0"], "environment": {"hum_rr": value}})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "environment", "hum_rr"]
+
+
+@pytest.mark.parametrize("accept", ["application/json", "application/x-ndjson"])
+def test_numeric_resident_ids_stay_identifiers(client, accept):
+    residents = immune_residents(3, seed=21)
+    columns = {name: [resident["features"][name] for resident in residents] for name in residents[0]["features"]}
+    columns["resident_id"] = [101, 102, None]
+    response = client.post("/api/immune/predict/columns", json=columns, headers={"accept": accept})
+    assert response.status_code == 200
+    if accept == "application/json":
+        items = response.json()["items"]
+    else:
+        items = [json.loads(line) for line in response.text.splitlines()]
+    assert [item["resident_id"] for item in items] == ["101", "102", None]
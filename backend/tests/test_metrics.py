@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from app import main
+from app.metrics import PROMETHEUS_MEDIA_TYPE, Metrics
+
+
+def test_disabled_metrics_are_unavailable(client, monkeypatch):
+    monkeypatch.setattr(main, "metrics", None)
+    response = client.get("/metrics")
+    assert response.status_code == 503
+
+
+def test_enabled_metrics_render(client, monkeypatch):
+    monkeypatch.setattr(main, "metrics", Metrics())
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == PROMETHEUS_MEDIA_TYPE
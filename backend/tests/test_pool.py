@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from app.features import ImmuneFeaturePipeline
+from app.model_registry import ModelRegistry
+from app.pool import InferencePool
+from app.predictors import ImmunePredictor
+from app.schemas import ImmuneFeatures
+
+from .patients import immune_residents
+
+
+def test_pool_matches_in_process_scoring(model_root):
+    registry = ModelRegistry(model_root)
+    pool = InferencePool(model_root, 2, min_rows=1, shard_rows=64)
+    registry.register_warmup(pool.warm_up)
+    try:
+        artifacts = registry.artifacts
+        features = [ImmuneFeatures(**resident["features"]) for resident in immune_residents(300, seed=18)]
+        matrix = artifacts.immune_pipeline.transform(ImmuneFeaturePipeline.inputs(features))
+        model = artifacts.immune_bundle["model"]
+
+        expected = ImmunePredictor(registry).predict_probabilities(
+            model, matrix, artifacts.immune_pipeline, artifacts.immune_native
+        )
+        pooled = pool.predict_probabilities(matrix, artifacts)
+        assert pool.last_error is None
+        assert pooled is not None and pooled.tolist() == expected.tolist()
+        # Workers loaded the artifact in their initializer, not on a shard.
+        status = pool.status()
+        assert (status["shards"], status["worker_reloads"], status["fallbacks"]) == (2, 0, 0)
+    finally:
+        pool.shutdown()
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import copy
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from app.features import IMMUNE_COLUMN_INDEX, IMMUNE_COLUMNS, ImmuneFeaturePipeline
+from app.model_registry import ModelRegistry
+from app.predictors import ImmunePredictor, NutritionPredictor, _risk_levels_from_divs
+from app.schemas import ImmuneFeatures, NutritionIntervention, NutritionPatient
+
+from . import scalar
+from .patients import immune_residents, nutrition_patients
+
+
+@pytest.fixture(scope="module")
+def registry():
+    # The shipped root: no immune artifact and the albumin forest.
+    loaded = ModelRegistry()
+    assert loaded.artifacts.immune_bundle is None
+    assert loaded.artifacts.albumin_bundle is not None
+    return loaded
+
+
+@pytest.fixture(scope="module")
+def artifacts(registry):
+    return replace(registry.artifacts, guidelines=ModelRegistry.compiled_default_guidelines())
+
+
+def _albumin_predictions(bundle, pairs):
+    # One sequential forest call gives every row the same tree-by-tree sum a
+    # single-row predict would.
+    model = copy.copy(bundle["model"])
+    model.n_jobs = 1
+    rows = [scalar.albumin_features(patient, intervention) for patient, intervention in pairs]
+    matrix = np.array([[row.get(name, 0.0) for name in bundle["feature_names"]] for row in rows])
+    return model.predict(matrix).tolist()
+
+
+def test_fallback_columns_match_scalar_functions(registry):
+    residents = immune_residents(3000)
+    features = [ImmuneFeatures(**resident["features"]) for resident in residents]
+    predictor = ImmunePredictor(registry)
+    matrix = registry.artifacts.immune_pipeline.transform(ImmuneFeaturePipeline.inputs(features))
+
+    rows = [scalar.immune_features(item) for item in features]
+    for name in IMMUNE_COLUMNS:
+        assert matrix[:, IMMUNE_COLUMN_INDEX[name]].tolist() == [row[name] for row in rows], name
+    assert predictor._fallback_probabilities(matrix).tolist() == [scalar.fallback_probability(row) for row in rows]
+
+    edges = np.array([0.0, 29.99, 30.0, 49.99, 50.0, 69.99, 70.0, 100.0])
+    assert _risk_levels_from_divs(edges).tolist() == [scalar.risk_level(value) for value in edges.tolist()]
+
+
+def test_fallback_batch_matches_scalar_predict(registry):
+    residents = immune_residents(3000, seed=1)
+    items = [(resident["resident_id"], ImmuneFeatures(**resident["features"])) for resident in residents]
+    responses = ImmunePredictor(registry).predict_batch(items)
+
+    for (resident_id, features), response in zip(items, responses):
+        expected = scalar.immune_fallback(resident_id, features)
+        assert response.model_dump(exclude={"model_generation"}) == expected, resident_id
+
+
+@pytest.mark.parametrize("with_albumin", [True, False], ids=["ml+rule", "rule-based"])
+@pytest.mark.parametrize("batch_size", [1, 100, 600])
+def test_nutrition_batch_matches_scalar_rules(registry, artifacts, with_albumin, batch_size):
+    # 600 rows exceed COMPILED_MAX_ROWS, so the last case scores through the estimator.
+    if not with_albumin:
+        artifacts = replace(artifacts, albumin_bundle=None, albumin_compiled=None)
+    items = nutrition_patients(600 if batch_size > 1 else 60, seed=batch_size)
+    pairs = [(NutritionPatient(**item["patient"]), NutritionIntervention(**item["intervention"])) for item in items]
+    assert {patient.ckd_stage for patient, _ in pairs} == set(range(6))
+
+    predictions = _albumin_predictions(artifacts.albumin_bundle, pairs) if with_albumin else [None] * len(pairs)
+    predictor = NutritionPredictor(registry)
+    responses = []
+    for start in range(0, len(pairs), batch_size):
+        responses.extend(predictor.simulate_batch(pairs[start : start + batch_size], artifacts))
+
+    gl = ModelRegistry.default_guidelines()
+    for index, ((patient, intervention), response) in enumerate(zip(pairs, responses)):
+        expected = scalar.nutrition_simulate(patient, intervention, gl, predictions[index])
+        assert response.model_dump(exclude={"model_generation"}) == expected, index
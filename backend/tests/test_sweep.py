@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import pytest
+
+from .patients import nutrition_patients
+
+
+@pytest.mark.parametrize("path", ["/api/nutrition/sweep", "/api/nutrition/optimize"])
+def test_grids_reject_negative_doses(client, path):
+    patient = nutrition_patients(1, seed=4)[0]["patient"]
+    grid = {"iron_mg": {"values": [0, -30]}}
+    response = client.post(path, json={"patient": patient, "grid": grid})
+    assert response.status_code == 422
+    assert "must not be negative" in response.json()["detail"][0]["msg"]
+
+    grid = {"iron_mg": {"start": 0, "stop": 60, "step": 30}}
+    assert client.post(path, json={"patient": patient, "grid": grid}).status_code == 200
+
+
+@pytest.mark.parametrize(
+    "axis",
+    [
+        {"start": 0, "stop": 1e308, "step": 1e-300},
+        {"start": -1e308, "stop": 1e308, "step": 1},
+        {"start": 0, "stop": 100, "step": 0.001},
+    ],
+)
+def test_oversized_axes_are_rejected(client, axis):
+    patient = nutrition_patients(1, seed=4)[0]["patient"]
+    response = client.post("/api/nutrition/sweep", json={"patient": patient, "grid": {"protein_g": axis}})
+    assert response.status_code == 422
+    assert "points" in response.json()["detail"][0]["msg"]
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import copy
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from app.features import AlbuminFeaturePipeline, nutrition_columns
+from app.model_registry import ModelRegistry
+from app.schemas import NutritionIntervention, NutritionPatient
+from app.trees import BLOCK_ROWS, check_parity, compile_trees
+
+from .patients import nutrition_patients
+
+
+@pytest.fixture(scope="module")
+def albumin():
+    bundle = ModelRegistry(compile_trees=False).artifacts.albumin_bundle
+    assert bundle is not None
+    # A sequential copy fixes the order the forest sums its trees in; with
+    # n_jobs=-1 threads may add them in any order and move the last ulp.
+    model = copy.copy(bundle["model"])
+    model.n_jobs = 1
+    return model, AlbuminFeaturePipeline(bundle.get("feature_names"))
+
+
+def _model_inputs(pipeline: AlbuminFeaturePipeline, count: int, seed: int) -> np.ndarray:
+    items = nutrition_patients(count, seed=seed)
+    columns = nutrition_columns(
+        [NutritionPatient(**item["patient"]) for item in items],
+        [NutritionIntervention(**item["intervention"]) for item in items],
+    )
+    return pipeline.model_input(pipeline.transform(columns))
+
+
+def test_compiled_albumin_forest_matches_predict(albumin):
+    model, pipeline = albumin
+    compiled = compile_trees(model)
+    assert compiled is not None
+    assert compiled.n_features == len(pipeline.feature_names)
+
+    inputs = _model_inputs(pipeline, 3 * BLOCK_ROWS + 7, seed=24)
+    expected = np.asarray(model.predict(inputs), dtype=np.float64)
+    assert compiled.predict(inputs).tolist() == expected.tolist()
+    assert compiled.predict(inputs[:1]).tolist() == expected[:1].tolist()
+
+
+def test_registry_serves_compiled_albumin_trees():
+    artifacts = ModelRegistry().artifacts
+    assert "albumin_compiled" not in artifacts.errors
+    assert artifacts.albumin_compiled is not None
+
+
+def test_parity_guard_rejects_mismatched_trees(albumin):
+    model, _ = albumin
+    compiled = compile_trees(model)
+    assert check_parity(compiled, model) is None
+    assert check_parity(replace(compiled, value=compiled.value + 1e-3), model) is not None
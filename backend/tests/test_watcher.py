@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import os
+import shutil
+
+import joblib
+
+from app.model_registry import STAT_KEY_PREFIX, ModelRegistry
+from app.watcher import ArtifactWatcher
+
+
+def test_watcher_waits_for_settled_and_loadable_artifacts(model_root, tmp_path):
+    root = tmp_path / "project"
+    shutil.copytree(model_root, root)
+    path = root / "modeling" / "artifacts" / "divs_immune_model_v7.joblib"
+    registry = ModelRegistry(root)
+    live = registry.artifacts
+    watcher = ArtifactWatcher(registry)
+    assert not watcher.poll()
+
+    # A half-copied file: skipped while it moves, refused once it settles.
+    data = path.read_bytes()
+    path.write_bytes(data[: len(data) // 2])
+    assert not watcher.poll()
+    assert watcher.checks == 0
+    assert not watcher.poll()
+    assert watcher.checks == 1
+    assert watcher.last_error is not None and "immune" in watcher.last_error
+    assert registry.artifacts is live
+
+    bundle = joblib.load(model_root / path.relative_to(root))
+    joblib.dump({**bundle, "version": 2}, path)
+    assert not watcher.poll()
+    assert watcher.poll()
+    assert watcher.last_error is None
+    assert registry.artifacts.generation == live.generation + 1
+    assert registry.artifacts.immune_bundle["version"] == 2
+
+
+def test_cold_start_keys_artifacts_without_reading_them(model_root, tmp_path, monkeypatch):
+    root = tmp_path / "project"
+    shutil.copytree(model_root, root)
+    path = root / "modeling" / "artifacts" / "divs_immune_model_v7.joblib"
+    content_hash = ModelRegistry._content_hash
+    hashed = []
+
+    def counting_hash(file):
+        hashed.append(file)
+        return content_hash(file)
+
+    monkeypatch.setattr(ModelRegistry, "_content_hash", staticmethod(counting_hash))
+    registry = ModelRegistry(root)
+    live = registry.artifacts
+    assert hashed == []
+    assert live.hashes["immune"].startswith(STAT_KEY_PREFIX)
+    assert registry.refresh() is None and hashed == []
+
+    # A touched file is hashed; it was keyed by stat, so it reloads once, and
+    # touching it again with the same content publishes nothing.
+    mtime = path.stat().st_mtime_ns
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+    refreshed = registry.refresh()
+    assert hashed == [path] and refreshed is not None
+    assert refreshed.hashes["immune"] == content_hash(path)
+    os.utime(path, ns=(mtime + 2 * 10**9, mtime + 2 * 10**9))
+    assert registry.refresh() is None
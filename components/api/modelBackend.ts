@@ -33,6 +33,7 @@ export type ImmunePredictResult = {
   divs_score: number;
   risk_level: ImmuneRiskLevel;
   used_features: Record<string, number>;
+  model_generation?: number | null;
 };
 
 export type NutritionPatientPayload = {
@@ -95,6 +96,78 @@ export type NutritionSimResponse = {
   source: 'ml+rule' | 'rule-based';
   results: Record<string, NutritionResult>;
   warnings: string[];
+  model_generation?: number | null;
+};
+
+export type NutritionSweepParameter =
+  | 'protein_g'
+  | 'iron_mg'
+  | 'vitamin_d_iu'
+  | 'calcium_mg'
+  | 'omega3_epa_dha_g'
+  | 'vitamin_c_mg'
+  | 'duration_weeks';
+
+export type NutritionSweepAxis =
+  | { values: number[] }
+  | { start: number; stop: number; step: number };
+
+export type NutritionSweepPayload = {
+  patient: NutritionPatientPayload;
+  intervention?: NutritionInterventionPayload;
+  grid: Partial<Record<NutritionSweepParameter, NutritionSweepAxis>>;
+};
+
+export type NutritionSweepResponse = {
+  source: 'ml+rule' | 'rule-based';
+  model_generation: number;
+  parameters: NutritionSweepParameter[];
+  baseline: Record<string, number | null>;
+  columns: string[];
+  rows: (number | null)[][];
+};
+
+export type NutritionOptimizeParameter = 'protein_g' | 'iron_mg' | 'vitamin_d_iu';
+
+export type NutritionOptimizePayload = {
+  patient: NutritionPatientPayload;
+  intervention?: NutritionInterventionPayload;
+  targets?: {
+    albumin_min?: number | null;
+    hemoglobin_min?: number | null;
+    vitamin_d_min?: number | null;
+  };
+  grid?: Partial<Record<NutritionOptimizeParameter, NutritionSweepAxis>>;
+  max_evaluations?: number;
+  max_seconds?: number;
+};
+
+export type NutritionOptimizePoint = Partial<Record<NutritionOptimizeParameter, number>> & {
+  duration_weeks: number;
+  albumin_expected: number | null;
+  albumin_change: number | null;
+  hemoglobin_expected: number | null;
+  vitamin_d_expected: number | null;
+};
+
+export type NutritionOptimizeResponse = {
+  source: 'ml+rule' | 'rule-based';
+  model_generation: number;
+  parameters: NutritionOptimizeParameter[];
+  targets: Record<string, number | null>;
+  recommended: NutritionOptimizePoint | null;
+  front: NutritionOptimizePoint[];
+  stats: {
+    candidates: number;
+    pruned: Record<string, number>;
+    feasible: number;
+    model_evaluations: number;
+    model_batches: number;
+    unevaluated: number;
+    budget_exhausted: boolean;
+    model_ms: number;
+    elapsed_ms: number;
+  };
 };
 
 const REQUEST_TIMEOUT_MS = 4500;
@@ -143,3 +216,29 @@ export const simulateNutritionPlan = async (
   return postJson<NutritionSimResponse>('/api/nutrition/simulate', payload);
 };
 
+export const simulateNutritionPlans = async (
+  items: NutritionSimPayload[]
+): Promise<NutritionSimResponse[]> => {
+  if (!items.length) {
+    return [];
+  }
+  const response = await postJson<{ items: NutritionSimResponse[] }>('/api/nutrition/simulate/batch', {
+    items,
+  });
+  if (!response || !Array.isArray(response.items)) {
+    return [];
+  }
+  return response.items;
+};
+
+export const sweepNutritionPlan = async (
+  payload: NutritionSweepPayload
+): Promise<NutritionSweepResponse | null> => {
+  return postJson<NutritionSweepResponse>('/api/nutrition/sweep', payload);
+};
+
+export const optimizeNutritionPlan = async (
+  payload: NutritionOptimizePayload
+): Promise<NutritionOptimizeResponse | null> => {
+  return postJson<NutritionOptimizeResponse>('/api/nutrition/optimize', payload);
+};